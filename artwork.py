@@ -0,0 +1,154 @@
+# artwork.py
+# Album and artist images for the dashboard, resolved a page at a time.
+#   - one sp.tracks / sp.artists call per 50 IDs instead of one request per row
+#   - results (including "no artwork") kept in a small SQLite file with a TTL,
+#     so they survive restarts and are shared by every dashboard process
+
+import logging
+import sqlite3
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50   # Spotify's limit for the several-tracks endpoint
+
+
+def _chunks(items: List[str], size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _album_image(track: dict) -> Optional[str]:
+    imgs = (track or {}).get('album', {}).get('images') or []
+    if not imgs:
+        return None
+    return imgs[1]['url'] if len(imgs) > 1 else imgs[0]['url']
+
+
+class ArtworkCache:
+    """Persistent key -> image URL map, one namespace per kind ('track', 'artist', 'artist_name')"""
+
+    def __init__(self, path: str = None, ttl_seconds: int = None):
+        self.path = path or config.ARTWORK_CACHE_PATH
+        self.ttl = config.ARTWORK_TTL_HOURS * 3600 if ttl_seconds is None else ttl_seconds
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')   # readers in other processes never block a writer
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS artwork (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    url TEXT,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (kind, key)
+                )
+            ''')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def lookup(self, kind: str, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Fresh cached entries only; keys missing from the result need fetching"""
+        keys = list(keys)
+        found = {}
+        cutoff = time.time() - self.ttl
+        with self._connect() as conn:
+            for chunk in _chunks(keys, 500):
+                marks = ','.join('?' * len(chunk))
+                rows = conn.execute(
+                    f'SELECT key, url FROM artwork WHERE kind = ? AND fetched_at >= ? AND key IN ({marks})',
+                    [kind, cutoff, *chunk]
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def store(self, kind: str, urls: Dict[str, Optional[str]]):
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO artwork (kind, key, url, fetched_at) VALUES (?, ?, ?, ?)',
+                [(kind, key, url, now) for key, url in urls.items()]
+            )
+
+    def resolve(self, kind: str, keys: Iterable[str], fetch: Callable[[List[str]], Dict[str, Optional[str]]],
+                batch_size: int = BATCH_SIZE) -> Dict[str, Optional[str]]:
+        """Cached URLs for keys, fetching the misses with fetch(batch) in chunks"""
+        wanted = list(dict.fromkeys(k for k in keys if k))
+        if not wanted:
+            return {}
+        urls = self.lookup(kind, wanted)
+        missing = [k for k in wanted if k not in urls]
+        for batch in _chunks(missing, batch_size):
+            try:
+                fetched = fetch(batch)
+            except Exception as e:
+                # Leave the batch uncached so the next render retries it
+                logger.warning(f"Artwork lookup for {len(batch)} {kind}s failed: {e}")
+                continue
+            fetched = {k: fetched.get(k) for k in batch}
+            self.store(kind, fetched)
+            urls.update(fetched)
+        if missing:
+            logger.info(f"Artwork: {len(wanted) - len(missing)} {kind}s cached, {len(missing)} fetched")
+        return urls
+
+
+_cache: Optional[ArtworkCache] = None
+
+
+def get_cache() -> ArtworkCache:
+    global _cache
+    if _cache is None:
+        _cache = ArtworkCache()
+    return _cache
+
+
+def track_images(sp, track_ids: Iterable[str]) -> Dict[str, Optional[str]]:
+    """Album image URL per track id for a whole page, in as few API calls as possible"""
+    def fetch(batch):
+        if sp is None:
+            raise RuntimeError("Spotify client unavailable")
+        tracks = sp.tracks(batch).get('tracks') or []
+        # Results come back in request order (None for unknown IDs); zip rather
+        # than key by t['id'] because relinked tracks report a different id
+        return {tid: _album_image(t) for tid, t in zip(batch, tracks)}
+
+    return get_cache().resolve('track', track_ids, fetch)
+
+
+def _artist_image(artist: dict) -> Optional[str]:
+    imgs = (artist or {}).get('images') or []
+    return imgs[0]['url'] if imgs else None
+
+
+def artist_images(sp, artists: Iterable) -> Dict[str, Optional[str]]:
+    """
+    Image URL per artist name for (artist_name, artist_id) pairs. Artists with an
+    ID go through sp.artists, 50 at a time; rows logged before IDs were captured
+    fall back to a name search, cached per name.
+    """
+    artists = [(name, aid if isinstance(aid, str) and aid else None) for name, aid in artists if name]
+
+    def fetch_by_id(batch):
+        if sp is None:
+            raise RuntimeError("Spotify client unavailable")
+        found = sp.artists(batch).get('artists') or []
+        return {aid: _artist_image(a) for aid, a in zip(batch, found)}
+
+    def search_by_name(batch):
+        if sp is None:
+            raise RuntimeError("Spotify client unavailable")
+        urls = {}
+        for name in batch:
+            r = sp.search(q=f'artist:{name}', type='artist', limit=1)
+            items = r['artists']['items']
+            urls[name] = _artist_image(items[0]) if items else None
+        return urls
+
+    by_id = get_cache().resolve('artist', [aid for _, aid in artists if aid], fetch_by_id)
+    by_name = get_cache().resolve('artist_name', [name for name, aid in artists if not aid], search_by_name,
+                                  batch_size=1)
+    return {name: by_id.get(aid) if aid else by_name.get(name) for name, aid in artists}
@@ -0,0 +1,120 @@
+# bench_dashboard.py
+# Dashboard start-up and page benchmark, run headless with Streamlit's AppTest.
+# Each sample is a fresh interpreter, so "first_render" includes imports and
+# the first query of the landing page; every page is then opened twice
+# ("cold" = first visit, "warm" = rerun served from the loader caches).
+# Run with: python3 bench_dashboard.py [--plays 20000] [--samples 3]
+#           python3 bench_dashboard.py --save-baseline     # record the current numbers
+# Results go to bench_results/; the run exits non-zero when any timing is
+# more than --tolerance slower than the saved baseline.
+# Always runs against a throwaway SQLite file, never spotify_data.db.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+RESULTS_DIR = HERE / 'bench_results'
+BASELINE = RESULTS_DIR / 'dashboard-baseline.json'
+PAGES = ["Overview", "Top Charts", "Artists", "Recent Plays", "Activity"]
+
+
+def measure():
+    """One sample, inside a fresh interpreter whose cwd holds the synthetic database"""
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(HERE / 'dashboard.py'), default_timeout=120)
+    at.run()
+    timings = {'first_render': time.perf_counter() - started}
+    if at.exception:
+        raise RuntimeError(f"dashboard raised: {at.exception[0].message}")
+
+    for page in PAGES:
+        for phase in ('cold', 'warm'):
+            t0 = time.perf_counter()
+            at.sidebar.radio[0].set_value(page).run()
+            timings[f"{page} {phase}"] = time.perf_counter() - t0
+    print(json.dumps(timings))
+
+
+def build_database(workdir: Path, plays: int):
+    os.environ['SUPABASE_DB_URL'] = ''   # set-but-empty also stops .env from supplying one
+    sys.path.insert(0, str(HERE))
+    os.chdir(workdir)
+    import config
+    config.DATABASE_PATH = str(workdir / 'spotify_data.db')
+    from bench_playlist import generate_history
+    from database import SpotifyDatabase
+    SpotifyDatabase().add_tracks(generate_history(plays))
+
+
+def run_samples(plays: int, samples: int):
+    env = dict(os.environ, SUPABASE_DB_URL='')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(HERE), env.get('PYTHONPATH')]))
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        build_database(Path(tmp), plays)
+        for i in range(samples):
+            out = subprocess.run([sys.executable, str(HERE / 'bench_dashboard.py'), '--measure'],
+                                 cwd=tmp, env=env, capture_output=True, text=True)
+            if out.returncode != 0:
+                sys.exit(f"sample {i + 1} failed:\n{out.stderr[-2000:]}")
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for key, value in result.items():
+        before = baseline.get(key)
+        if before and value > before * (1 + tolerance):
+            regressions.append((key, before, value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dashboard start-up and page reruns')
+    parser.add_argument('--plays', type=int, default=20000, help='synthetic history size')
+    parser.add_argument('--samples', type=int, default=3, help='fresh-process samples (median is reported)')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown vs baseline')
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--measure', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure()
+        return
+
+    timings = run_samples(args.plays, args.samples)
+    RESULTS_DIR.mkdir(exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    record = {'plays': args.plays, 'samples': args.samples, 'timings': timings}
+    (RESULTS_DIR / f"dashboard-{stamp}.json").write_text(json.dumps(record, indent=2))
+
+    baseline = json.loads(BASELINE.read_text())['timings'] if BASELINE.exists() else {}
+    print(f"{'step':<22} {'seconds':>9} {'baseline':>9}")
+    for key, value in timings.items():
+        before = '—' if key not in baseline else f"{baseline[key]:.3f}"
+        print(f"{key:<22} {value:>9.3f} {before:>9}")
+
+    if args.save_baseline:
+        BASELINE.write_text(json.dumps(record, indent=2))
+        print(f"Baseline saved to {BASELINE}")
+        return
+
+    regressions = compare(timings, baseline, args.tolerance)
+    for key, before, value in regressions:
+        print(f"REGRESSION {key}: {before:.3f}s -> {value:.3f}s")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+# bench_db.py
+# Database benchmark suite over seeded synthetic histories (see synthetic.py).
+# For every --sizes entry and backend, a fresh process bulk-loads a throwaway
+# database and times:
+#   - every SpotifyDatabase method, get_playlist_tracks and import_from_csv
+#   - the search pages and query API endpoints (the dashboard's paged views)
+#   - with --dashboard, each dashboard.py loader, uncached (needs streamlit)
+# Read timings are the median of --repeat calls; write paths run in the order
+# the tracker would hit them, and cleanup_old_data runs last since it deletes.
+# Run with: python3 bench_db.py [--sizes 10000 1000000 10000000] [--repeat 5]
+#                               [--pg-url postgresql://postgres@localhost/bench] [--dashboard]
+#           python3 bench_db.py --save-baseline     # record the current numbers
+# Results go to bench_results/db-<stamp>.json; the run exits non-zero when any
+# timing is more than --tolerance slower than the baseline for the same
+# backend and size.
+# SQLite runs use a temp file, never spotify_data.db. Postgres runs only
+# happen with --pg-url, in a scratch schema that is dropped afterwards; point
+# it at a local server, not Supabase.
+
+import argparse
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import quote
+
+import synthetic
+
+HERE = Path(__file__).resolve().parent
+RESULTS_DIR = HERE / 'bench_results'
+BASELINE = RESULTS_DIR / 'db-baseline.json'
+LOAD_BATCH = 10000
+INCREMENT = 50       # plays per add_tracks call, about one polling cycle's worth
+CSV_PLAYS = 5000     # plays in the import_from_csv file
+COLUMNS = 'date_played, time_played, track_id, track_name, artist_name, artist_id'
+
+
+def _scratch_url(url: str, schema: str) -> str:
+    return f"{url}{'&' if '?' in url else '?'}options={quote(f'-csearch_path={schema}')}"
+
+
+def _count(result):
+    if isinstance(result, (list, tuple, dict)):
+        return len(result)
+    return result if isinstance(result, int) else None
+
+
+def timed(fn, repeat: int) -> dict:
+    samples = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {'median_ms': statistics.median(samples), 'min_ms': min(samples), 'max_ms': max(samples),
+            'rows': _count(result)}
+
+
+def bulk_load(db, rows) -> int:
+    """Straight inserts in one transaction, then one rollup rebuild; add_tracks is timed separately"""
+    import database
+    loaded = 0
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        for chunk in synthetic.batches(rows, LOAD_BATCH):
+            if database.DB_BACKEND == 'postgres':
+                database.psycopg2.extras.execute_values(cursor, f'''
+                    INSERT INTO tracks ({COLUMNS}) VALUES %s
+                    ON CONFLICT (date_played, time_played, track_id) DO NOTHING
+                ''', chunk, page_size=1000)
+            else:
+                cursor.executemany(f'INSERT OR IGNORE INTO tracks ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)', chunk)
+            loaded += len(chunk)
+        conn.commit()
+    db.rebuild_rollups()
+    return loaded
+
+
+def read_benchmarks(db, last_date, repeat: int) -> dict:
+    import config
+    import database
+    import query_api
+    import search
+    backend, p = database.DB_BACKEND, db._placeholder()
+    start_30d, end_30d = query_api.parse_range('30d', today=last_date)
+
+    def with_conn(fn):
+        def run():
+            conn = db.get_connection()
+            try:
+                return fn(conn)
+            finally:
+                conn.close()
+        return run
+
+    cases = {
+        'get_track_frequencies': lambda: db.get_track_frequencies(),
+        'get_track_frequencies(limit)': lambda: db.get_track_frequencies(config.LIMIT_SONGS),
+        'iter_tracks_since': lambda: sum(1 for _ in db.iter_tracks_since(0)),
+        'get_artist_frequencies': lambda: db.get_artist_frequencies(),
+        'get_playlist_tracks': lambda: db.get_playlist_tracks(config.PLAYLIST_SIZE),
+        'get_statistics': lambda: db.get_statistics(),
+        'get_activity(30d)': lambda: db.get_activity(start_30d, end_30d),
+        'get_activity(all)': lambda: db.get_activity(),
+        'search.top_tracks_page': with_conn(lambda c: search.top_tracks_page(c, backend, limit=100)[0]),
+        'search.top_tracks_page(query)': with_conn(lambda c: search.top_tracks_page(c, backend, query='Track 1', limit=100)[0]),
+        'search.recent_plays_page': with_conn(lambda c: search.recent_plays_page(c, backend)[0]),
+        'search.recent_plays_page(query)': with_conn(lambda c: search.recent_plays_page(c, backend, query='Artist 1')[0]),
+    }
+    for path, endpoint in query_api.ENDPOINTS.items():
+        cases[f"api{path}(30d)"] = with_conn(lambda c, fn=endpoint: fn(c, p, start_30d, end_30d, 50))
+        cases[f"api{path}(all)"] = with_conn(lambda c, fn=endpoint: fn(c, p, None, None, 50))
+    return {name: timed(fn, repeat) for name, fn in cases.items()}
+
+
+def dashboard_benchmarks(last_date, repeat: int) -> dict:
+    """Each loader with its st.cache_data entry cleared first, so every call queries"""
+    try:
+        import streamlit  # noqa: F401
+    except ImportError:
+        return {'skipped': 'streamlit is not installed'}
+    import dashboard   # outside `streamlit run`, the page renders once in bare mode
+    start = (last_date - timedelta(days=29)).isoformat()
+    loaders = {
+        'load_top_songs': (), 'load_top_artists': (), 'load_recent': (), 'load_stats': (),
+        'load_hourly': (), 'load_daily': (), 'load_activity_range': (start, last_date.isoformat()),
+        'load_songs_by_artist': ('Artist 0',), 'load_all_artists': (), 'load_chart_page': (),
+        'load_recent_page': (), 'load_on_repeat': (),
+    }
+    results = {'data_versions': timed(dashboard.data_versions, repeat)}
+    for name, args in loaders.items():
+        fn = getattr(dashboard, name)
+        results[name] = timed(lambda fn=fn, args=args: (fn.clear(), fn(*args))[1], repeat)
+    return results
+
+
+def measure(size: int, seed: int, repeat: int, with_dashboard: bool):
+    """One backend x size run, in a fresh interpreter whose cwd and SUPABASE_DB_URL point at scratch storage"""
+    sys.path.insert(0, str(HERE))
+    import config
+    config.DATABASE_PATH = str(Path.cwd() / 'spotify_data.db')
+    import database
+    from database import SpotifyDatabase
+    db = SpotifyDatabase()
+
+    held_back = INCREMENT * repeat + CSV_PLAYS
+    days = (size + held_back) / synthetic.plays_per_day(size + held_back)
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=int(days))
+    rows = synthetic.generate(size + held_back, seed=seed, start=start)
+
+    t0 = time.perf_counter()
+    loaded = bulk_load(db, itertools.islice(rows, size))
+    load_seconds = time.perf_counter() - t0
+    tail = list(rows)
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT CAST(MAX(date_played) AS TEXT) FROM tracks')
+        last_date = datetime.strptime(cursor.fetchone()[0], '%Y-%m-%d').date()
+
+    record = {'backend': database.DB_BACKEND, 'plays': loaded,
+              'load': {'seconds': load_seconds, 'rows_per_s': loaded / load_seconds if load_seconds else None},
+              'ops': read_benchmarks(db, last_date, repeat)}
+    if with_dashboard:
+        record['dashboard'] = dashboard_benchmarks(last_date, repeat)
+
+    ops = record['ops']
+    increments = iter(synthetic.batches(tail[:INCREMENT * repeat], INCREMENT))
+    ops['add_tracks'] = timed(lambda: db.add_tracks(next(increments)), repeat)
+    csv_path = Path.cwd() / 'import.csv'
+    synthetic.write_csv(str(csv_path), tail[INCREMENT * repeat:])
+    ops['import_from_csv'] = timed(lambda: db.import_from_csv(str(csv_path)), 1)
+    ops['rebuild_rollups'] = timed(db.rebuild_rollups, 1)
+    if database.DB_BACKEND == 'sqlite':
+        ops['backup_database'] = timed(db.backup_database, 1)
+    try:
+        ops['cleanup_old_data'] = timed(lambda: db.cleanup_old_data(365), 1)
+    except Exception as e:
+        ops['cleanup_old_data'] = {'error': f"{type(e).__name__}: {e}"}
+    print(json.dumps(record))
+
+
+def run(backend: str, size: int, args) -> dict:
+    env = dict(os.environ, SUPABASE_DB_URL='', SPOTIFY_LOCAL_FIRST='')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(HERE), env.get('PYTHONPATH')]))
+    schema = f"bench_{size}_{os.getpid()}"
+    admin = None
+    if backend == 'postgres':
+        import psycopg2
+        admin = psycopg2.connect(args.pg_url)
+        admin.autocommit = True
+        admin.cursor().execute(f'CREATE SCHEMA {schema}')
+        env['SUPABASE_DB_URL'] = _scratch_url(args.pg_url, schema)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cmd = [sys.executable, str(HERE / 'bench_db.py'), '--measure', '--sizes', str(size),
+                   '--seed', str(args.seed), '--repeat', str(args.repeat)] + (['--dashboard'] if args.dashboard else [])
+            out = subprocess.run(cmd, cwd=tmp, env=env, capture_output=True, text=True)
+            if out.returncode != 0:
+                sys.exit(f"{backend}/{size} failed:\n{out.stderr[-2000:]}")
+            return json.loads(out.stdout.strip().splitlines()[-1])
+    finally:
+        if admin is not None:
+            admin.cursor().execute(f'DROP SCHEMA {schema} CASCADE')
+            admin.close()
+
+
+def flatten(runs: dict) -> dict:
+    """{'sqlite/10000/get_statistics': median_ms, ...} for the comparable timings"""
+    flat = {}
+    for key, record in runs.items():
+        for section in ('ops', 'dashboard'):
+            for name, timing in record.get(section, {}).items():
+                if isinstance(timing, dict) and 'median_ms' in timing:
+                    flat[f"{key}/{name}"] = timing['median_ms']
+        flat[f"{key}/load"] = record['load']['seconds'] * 1000
+    return flat
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for key, value in result.items():
+        before = baseline.get(key)
+        if before and value > before * (1 + tolerance):
+            regressions.append((key, before, value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark database methods on synthetic histories')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 1000000, 10000000],
+                        help='synthetic history sizes, in plays')
+    parser.add_argument('--repeat', type=int, default=5, help='calls per read benchmark (median is reported)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--pg-url', help='local Postgres to benchmark as well (a scratch schema is used)')
+    parser.add_argument('--dashboard', action='store_true', help='also time the dashboard loaders')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown vs baseline')
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--measure', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.sizes[0], args.seed, args.repeat, args.dashboard)
+        return
+
+    backends = ['sqlite'] + (['postgres'] if args.pg_url else [])
+    runs = {}
+    for size in args.sizes:
+        for backend in backends:
+            print(f"⏱ {backend} with {size:,} plays...", flush=True)
+            runs[f"{backend}/{size}"] = run(backend, size, args)
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    record = {'sizes': args.sizes, 'seed': args.seed, 'repeat': args.repeat, 'runs': runs}
+    (RESULTS_DIR / f"db-{stamp}.json").write_text(json.dumps(record, indent=2))
+
+    timings = flatten(runs)
+    baseline = flatten(json.loads(BASELINE.read_text())['runs']) if BASELINE.exists() else {}
+    print(f"{'step':<52} {'ms':>10} {'baseline':>10}")
+    for key, value in timings.items():
+        before = '—' if key not in baseline else f"{baseline[key]:.1f}"
+        print(f"{key:<52} {value:>10.1f} {before:>10}")
+    for key, record_ in runs.items():
+        for section in ('ops', 'dashboard'):
+            for name, timing in record_.get(section, {}).items():
+                if isinstance(timing, dict) and 'error' in timing:
+                    print(f"ERROR {key}/{name}: {timing['error']}")
+        if 'skipped' in record_.get('dashboard', {}):
+            print(f"{key}: dashboard loaders skipped — {record_['dashboard']['skipped']}")
+
+    if args.save_baseline:
+        BASELINE.write_text(json.dumps(record, indent=2))
+        print(f"Baseline saved to {BASELINE}")
+        return
+
+    regressions = compare(timings, baseline, args.tolerance)
+    for key, before, value in regressions:
+        print(f"REGRESSION {key}: {before:.1f}ms -> {value:.1f}ms")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# bench_playlist.py
+# Compares playlist selection latency against history size:
+# the previous Python grouping implementation vs the single SQL query in
+# SpotifyDatabase.get_playlist_tracks.
+# Run with: python3 bench_playlist.py [--sizes 1000 10000 100000] [--repeat 5]
+# Always runs against a throwaway SQLite file, never spotify_data.db.
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import config
+from database import SpotifyDatabase
+
+
+def legacy_playlist_tracks(db, num_songs):
+    """The pre-SQL implementation, kept here as the reference result."""
+    track_frequencies = db.get_track_frequencies(num_songs * 2)
+    if not track_frequencies:
+        return []
+    if len(track_frequencies) <= num_songs:
+        return [row[0] for row in track_frequencies]
+
+    freq_groups = {}
+    for track_id, track_name, artist_name, freq in track_frequencies:
+        freq_groups.setdefault(freq, []).append((track_id, artist_name))
+
+    track_ids = []
+    frequencies = sorted(freq_groups.keys(), reverse=True)
+    for freq in frequencies[:-1]:
+        for track_id, artist_name in freq_groups[freq]:
+            if len(track_ids) < num_songs:
+                track_ids.append(track_id)
+
+    if len(track_ids) < num_songs and frequencies:
+        remaining_slots = num_songs - len(track_ids)
+        lowest_freq_songs = freq_groups[frequencies[-1]]
+        artist_freqs = dict(db.get_artist_frequencies())
+        lowest_freq_songs.sort(key=lambda x: artist_freqs.get(x[1], 0))
+        for track_id, _ in lowest_freq_songs[:remaining_slots]:
+            track_ids.append(track_id)
+
+    return track_ids[:num_songs]
+
+
+def generate_history(num_plays, seed=42):
+    """Skewed synthetic play log: a few favourites, a long tail."""
+    rng = random.Random(seed)
+    num_tracks = max(50, num_plays // 8)
+    num_artists = max(10, num_tracks // 6)
+    catalogue = [
+        (f"trk{i:08d}", f"Track {i}", f"Artist {rng.randrange(num_artists)}")
+        for i in range(num_tracks)
+    ]
+    weights = [1 / (rank + 1) for rank in range(num_tracks)]
+    start = datetime(2025, 1, 1)
+    rows = []
+    for i, (track_id, track_name, artist_name) in enumerate(rng.choices(catalogue, weights, k=num_plays)):
+        played = start + timedelta(seconds=i * 200)
+        rows.append((played.strftime('%Y-%m-%d'), played.strftime('%H:%M:%S'), track_id, track_name, artist_name))
+    return rows
+
+
+def time_call(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark playlist track selection')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--songs', type=int, default=config.PLAYLIST_SIZE)
+    args = parser.parse_args()
+
+    print(f"{'plays':>10} {'legacy ms':>11} {'sql ms':>9} {'speedup':>8}  match")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            db = SpotifyDatabase(str(Path(tmp) / f"bench_{size}.db"))
+            db.add_tracks(generate_history(size))
+
+            legacy_ms, legacy = time_call(lambda: legacy_playlist_tracks(db, args.songs), args.repeat)
+            sql_ms, current = time_call(lambda: db.get_playlist_tracks(args.songs), args.repeat)
+            print(f"{size:>10} {legacy_ms:>11.1f} {sql_ms:>9.1f} {legacy_ms / max(sql_ms, 1e-9):>7.1f}x  "
+                  f"{'yes' if legacy == current else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
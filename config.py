@@ -8,6 +8,20 @@ load_dotenv()
 SUPABASE_DB_URL = os.getenv('SUPABASE_DB_URL')
 DATABASE_PATH   = 'spotify_data.db'   # only used if Supabase URL is absent
 
+# Offline-first replication (see replication.py): with SPOTIFY_LOCAL_FIRST set,
+# every process reads and writes the local SQLite replica, and replication.py
+# pushes new rows to / pulls other nodes' rows from Supabase in the background
+LOCAL_FIRST = os.getenv('SPOTIFY_LOCAL_FIRST', '').lower() not in ('', '0', 'false', 'no')
+REMOTE_DB_URL = SUPABASE_DB_URL
+if LOCAL_FIRST:
+    SUPABASE_DB_URL = None
+SYNC_INTERVAL_SECONDS = 60    # how often the scheduler runs a push + pull
+SYNC_BATCH = 2000             # rows per remote round trip
+# Serial ids can commit out of order (another writer's transaction still open)
+# or never (rolled back, or burned by ON CONFLICT), so a pull re-checks the ids
+# it stepped over for this long before writing them off
+SYNC_GAP_SECONDS = 900
+
 # Database configuration
 DATABASE_PATH = 'spotify_data.db'
 BACKUP_DIR = 'backups'
@@ -16,4 +30,55 @@ BACKUP_DIR = 'backups'
 Path(BACKUP_DIR).mkdir(exist_ok=True)
 
 LIMIT_SONGS = 50
-PLAYLIST_SIZE = 30
\ No newline at end of file
+PLAYLIST_SIZE = 30
+
+# Heavy-hitters sketch (approximate top tracks/artists), stored in the database
+SKETCH_CAPACITY = 1000
+
+# Sessionization / repeat detection
+SESSION_GAP_MINUTES = 30      # silence longer than this starts a new session
+STREAK_MIN_PLAYS = 3          # same track this many times in a row = streak
+REPEAT_WINDOW_HOURS = 24      # max gap between plays of a track on repeat
+REPEAT_MIN_PLAYS = 3          # plays within the window to count as on repeat
+
+# Adaptive polling (SmartSpotifyScheduler)
+POLL_MIN_MINUTES = 5          # never poll more often than this
+POLL_MAX_MINUTES = 120        # never wait longer than this
+POLL_SAFETY = 0.6             # poll when this share of the 50-play window is expected to be used (skips count too)
+RATE_PROFILE_WEEKS = 8        # history used for the hour-of-week profile
+RECENT_RATE_MINUTES = 60      # window for the currently observed play rate
+
+# Metrics endpoint started by the scheduler
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))   # 0 picks a free port
+
+# Opt-in tracing (see tracing.py)
+TRACE_ENABLED = os.getenv('SPOTIFY_TRACE', '').lower() not in ('', '0', 'false', 'no')
+TRACE_FORMAT = os.getenv('SPOTIFY_TRACE_FORMAT', 'jsonl').lower()    # jsonl | chrome
+TRACE_FILE = os.getenv('SPOTIFY_TRACE_FILE')
+TRACE_DIR = 'traces'
+TRACE_PROFILE = [m.strip().lower() for m in os.getenv('SPOTIFY_TRACE_PROFILE', '').split(',') if m.strip()]
+
+# Leader election between scheduler instances (see leader.py)
+LEASE_TTL_SECONDS = 90        # a dead leader's lease lapses after this; the holder renews every third of it
+
+# Dashboard artwork cache (see artwork.py), shared by all dashboard processes
+ARTWORK_CACHE_PATH = 'artwork_cache.db'
+ARTWORK_TTL_HOURS = 24 * 7    # album art rarely changes; missing art is retried after this too
+
+# Job queue for dashboard-triggered runs (see jobs.py)
+JOB_POLL_SECONDS = 15         # how often the dashboard worker (or a scheduler without wake-ups) looks for queued jobs
+JOB_STALE_MINUTES = 15        # a job 'running' longer than this is treated as abandoned
+
+# Read-only HTTP query API (see query_api.py)
+QUERY_API_HOST = os.getenv('QUERY_API_HOST', '127.0.0.1')
+QUERY_API_PORT = int(os.getenv('QUERY_API_PORT', '9109'))
+QUERY_API_CACHE_ENTRIES = 512        # cached responses across all users
+QUERY_API_VERSION_SECONDS = 2        # how long a user's data version is trusted before re-reading it
+QUERY_API_MAX_LIMIT = 500
+# Extra local databases served as ?user=<name>: "alice=alice.db,bob=bob.db"
+QUERY_API_USERS = dict(pair.strip().split('=', 1) for pair in os.getenv('QUERY_API_USERS', '').split(',') if '=' in pair)
+
+# Columnar export (see export.py)
+EXPORT_DIR = 'exports'
+EXPORT_BATCH = 50000          # rows per fetch / Arrow record batch
@@ -1,36 +1,45 @@
 import logging
 import spotipy
 import config
+import tracing
 from database import SpotifyDatabase
 from utils import get_playlist_id_by_name
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def if_playlist_exists(sp, playlist_name):
-    results = sp.current_user_playlists()
-    return any(p['name'].lower() == playlist_name.lower() for p in results['items'])
+PLAYLIST_NAME = 'the better On Repeat'
 
-def create_playlist(sp, user_id):
+@tracing.traced('playlist.create_playlist')
+def create_playlist(sp, user_id, db=None, playlist_id=None, playlist_songs=None):
+    """
+    Sync the On Repeat playlist. Pass a known playlist_id to skip the
+    playlist lookup and precomputed playlist_songs to skip the ranking
+    query; returns the playlist id (None on failure)
+    """
     try:
-        db = SpotifyDatabase()
-        playlist_songs = db.get_playlist_tracks(config.PLAYLIST_SIZE)
+        if playlist_songs is None:
+            db = db or SpotifyDatabase()
+            playlist_songs = db.get_playlist_tracks(config.PLAYLIST_SIZE)
 
         if not playlist_songs:
             logger.error("No songs found to add to playlist")
             return None
 
-        playlist_name = 'the better On Repeat'
+        playlist_name = PLAYLIST_NAME
 
-        if if_playlist_exists(sp, playlist_name):
+        if not playlist_id:
             playlist_id = get_playlist_id_by_name(sp, playlist_name)
+
+        if playlist_id:
             sp.playlist_replace_items(playlist_id, playlist_songs)
         else:
-            sp.user_playlist_create(user=user_id, name=playlist_name, public=True)
-            playlist_id = get_playlist_id_by_name(sp, playlist_name)
+            playlist = sp.user_playlist_create(user=user_id, name=playlist_name, public=True)
+            playlist_id = playlist['id']
             sp.user_playlist_add_tracks(user_id, playlist_id, playlist_songs)
 
         print('_________ ADDED SONGS TO ON REPEAT PLAYLIST ______')
+        return playlist_id
 
     except spotipy.SpotifyException as e:
         logger.error(f"Playlist creation failed: {e}")
@@ -1,17 +1,21 @@
-import os
-import subprocess
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
+from datetime import date, datetime, timedelta
 from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
 
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
+import artwork
+import config
+import jobs
+import search
+import tracing
+import virtual_list
+from database import SpotifyDatabase, activity_summary, data_generation
 
 DB_PATH = "spotify_data.db"
+CACHE_ENTRIES = 32   # per loader; entries for old data versions age out
+CACHE_TTL = 6 * 3600   # backstop should a write ever miss the data generation
 
 C = {
     "bg":         "#0b0b18",
@@ -78,15 +82,6 @@ div[data-testid="metric-container"] div[data-testid="stMetricValue"] {{ color: {
   font-weight: 600 !important; font-size: 0.82rem !important;
   padding: 0.5rem 1.1rem !important; letter-spacing: 0.03em !important;
 }}
-/* Artist x buttons — completely hidden, zero size */
-[data-testid="stMain"] .stButton > button[data-testid^="art_"],
-[data-testid="stMain"] .stButton > button:has(> div > p:only-child) {{
-  visibility: hidden !important;
-  height: 0 !important; min-height: 0 !important;
-  padding: 0 !important; margin: 0 !important;
-  border: none !important; background: none !important;
-  position: absolute !important;
-}}
 hr {{ border-color: {C['border']} !important; margin: 1rem 0 !important; }}
 #MainMenu, footer {{ visibility: hidden; }}
 .stDeployButton {{ display: none; }}
@@ -100,7 +95,11 @@ button[kind="header"] {{ visibility: visible !important; }}
 @st.cache_resource
 def get_conn():
     from sqlalchemy import create_engine, text
-    url = os.getenv('SUPABASE_DB_URL')
+    try:
+        SpotifyDatabase()   # apply pending schema migrations (e.g. artist_id) before querying
+    except Exception:
+        pass
+    url = config.SUPABASE_DB_URL   # unset in local-first mode: read the replica (see replication.py)
     if url:
         try:
             engine = create_engine(url, connect_args={"connect_timeout": 5})
@@ -116,51 +115,87 @@ def get_conn():
 
 @st.cache_resource
 def get_sp():
+    # spotipy is only needed once artwork has to be fetched
+    import spotipy
+    from spotipy.oauth2 import SpotifyOAuth
     try:
         return spotipy.Spotify(auth_manager=SpotifyOAuth(scope="user-read-recently-played", cache_path=".cache"))
     except Exception:
         return None
 
-@st.cache_data(ttl=120)
-def load_top_songs(n=20):
+@st.cache_data(max_entries=CACHE_ENTRIES, ttl=CACHE_TTL)
+@tracing.traced('dashboard.load_top_songs')
+def load_top_songs(n=20, version=None):
+    import pandas as pd   # deferred: cache hits never need it
     conn = get_conn()
     if conn is None: return pd.DataFrame()
     return pd.read_sql_query(f"SELECT track_id, track_name, artist_name, COUNT(*) as plays FROM tracks GROUP BY track_id, track_name, artist_name ORDER BY plays DESC LIMIT {n}", conn)
 
-@st.cache_data(ttl=120)
-def load_top_artists(n=12):
+@st.cache_data(max_entries=CACHE_ENTRIES, ttl=CACHE_TTL)
+@tracing.traced('dashboard.load_top_artists')
+def load_top_artists(n=12, version=None):
+    import pandas as pd
     conn = get_conn()
     if conn is None: return pd.DataFrame()
-    return pd.read_sql_query(f"SELECT artist_name, COUNT(*) as plays, MAX(track_id) as sample_track_id FROM tracks GROUP BY artist_name ORDER BY plays DESC LIMIT {n}", conn)
+    return pd.read_sql_query(f"SELECT artist_name, MAX(artist_id) as artist_id, COUNT(*) as plays, MAX(track_id) as sample_track_id FROM tracks GROUP BY artist_name ORDER BY plays DESC LIMIT {n}", conn)
 
-@st.cache_data(ttl=120)
-def load_recent(n=30):
+@st.cache_data(max_entries=CACHE_ENTRIES, ttl=CACHE_TTL)
+@tracing.traced('dashboard.load_recent')
+def load_recent(n=30, version=None):
+    import pandas as pd
     conn = get_conn()
     if conn is None: return pd.DataFrame()
     return pd.read_sql_query(f"SELECT CAST(date_played AS TEXT) as date_played, CAST(time_played AS TEXT) as time_played, track_id, track_name, artist_name FROM tracks ORDER BY date_played DESC, time_played DESC LIMIT {n}", conn)
 
-@st.cache_data(ttl=120)
-def load_stats():
+@st.cache_data(max_entries=CACHE_ENTRIES, ttl=CACHE_TTL)
+@tracing.traced('dashboard.load_stats')
+def load_stats(version=None):
+    import pandas as pd
     conn = get_conn()
     if conn is None: return {}
     df = pd.read_sql_query("SELECT COUNT(*) as total, COUNT(DISTINCT track_id) as unique_tracks, COUNT(DISTINCT artist_name) as artists, CAST(MIN(date_played) AS TEXT) as date_from, CAST(MAX(date_played) AS TEXT) as date_to FROM tracks", conn)
     r = df.iloc[0]
     return {"total": int(r["total"]), "unique": int(r["unique_tracks"]), "artists": int(r["artists"]), "from": str(r["date_from"]), "to": str(r["date_to"])}
 
-@st.cache_data(ttl=120)
-def load_hourly():
+@st.cache_data(max_entries=CACHE_ENTRIES, ttl=CACHE_TTL)
+@tracing.traced('dashboard.load_hourly')
+def load_hourly(version=None):
+    import pandas as pd
     conn = get_conn()
     if conn is None: return pd.DataFrame()
-    return pd.read_sql_query("SELECT CAST(SUBSTR(CAST(time_played AS TEXT), 1, 2) AS INTEGER) as hour, COUNT(*) as plays FROM tracks GROUP BY hour ORDER BY hour", conn)
+    return pd.read_sql_query("SELECT hour, SUM(plays) as plays FROM activity_cube GROUP BY hour ORDER BY hour", conn)
 
-@st.cache_data(ttl=120)
-def load_daily():
+@st.cache_data(max_entries=CACHE_ENTRIES, ttl=CACHE_TTL)
+@tracing.traced('dashboard.load_daily')
+def load_daily(version=None):
+    import pandas as pd
     conn = get_conn()
     if conn is None: return pd.DataFrame()
-    return pd.read_sql_query("SELECT CAST(date_played AS TEXT) as date_played, COUNT(*) as plays FROM tracks GROUP BY date_played ORDER BY date_played DESC LIMIT 30", conn)
-
-@st.cache_data(ttl=120)
-def load_songs_by_artist(artist_name):
+    return pd.read_sql_query("SELECT CAST(date_played AS TEXT) as date_played, SUM(plays) as plays FROM activity_cube GROUP BY date_played ORDER BY date_played DESC LIMIT 30", conn)
+
+@st.cache_data(max_entries=CACHE_ENTRIES, ttl=CACHE_TTL)
+@tracing.traced('dashboard.load_activity_range')
+def load_activity_range(start, end, version=None):
+    """Hourly, daily (newest first) and weekday x hour frames for a date range, from activity_cube"""
+    import pandas as pd
+    engine = get_conn()
+    empty = {"hourly": pd.DataFrame(), "daily": pd.DataFrame(), "heatmap": pd.DataFrame()}
+    if engine is None: return empty
+    raw = engine.raw_connection()
+    try:
+        res = activity_summary(raw, '%s' if engine.dialect.name == 'postgresql' else '?', start, end)
+    finally:
+        raw.close()
+    return {
+        "hourly":  pd.DataFrame(res["hourly"], columns=["hour", "plays"]),
+        "daily":   pd.DataFrame(res["daily"][::-1], columns=["date_played", "plays"]),
+        "heatmap": pd.DataFrame(res["heatmap"], columns=["dow", "hour", "plays"]),
+    }
+
+@st.cache_data(max_entries=CACHE_ENTRIES, ttl=CACHE_TTL)
+@tracing.traced('dashboard.load_songs_by_artist')
+def load_songs_by_artist(artist_name, version=None):
+    import pandas as pd
     conn = get_conn()
     if conn is None: return pd.DataFrame()
     return pd.read_sql_query(
@@ -170,51 +205,139 @@ def load_songs_by_artist(artist_name):
         conn, params={"a": artist_name}
     )
 
-@st.cache_data(ttl=120)
-def load_all_artists():
+@st.cache_data(max_entries=CACHE_ENTRIES, ttl=CACHE_TTL)
+@tracing.traced('dashboard.load_all_artists')
+def load_all_artists(version=None):
+    import pandas as pd
     conn = get_conn()
     if conn is None: return pd.DataFrame()
     return pd.read_sql_query(
-        "SELECT artist_name, COUNT(*) as plays, COUNT(DISTINCT track_id) as unique_tracks, "
+        "SELECT artist_name, MAX(artist_id) as artist_id, COUNT(*) as plays, COUNT(DISTINCT track_id) as unique_tracks, "
         "MAX(CAST(date_played AS TEXT)) as last_played "
         "FROM tracks GROUP BY artist_name ORDER BY plays DESC",
         conn
     )
 
-@st.cache_data(ttl=120)
-def load_all_recent(n=200):
-    conn = get_conn()
-    if conn is None: return pd.DataFrame()
-    return pd.read_sql_query(
-        f"SELECT CAST(date_played AS TEXT) as date_played, CAST(time_played AS TEXT) as time_played, "
-        f"track_id, track_name, artist_name FROM tracks "
-        f"ORDER BY date_played DESC, time_played DESC LIMIT {n}",
-        conn
-    )
-
-@st.cache_data(ttl=3600)
-def get_track_image(track_id):
-    sp = get_sp()
-    if not sp or not track_id: return None
+@tracing.traced('dashboard.data_versions')
+def data_versions():
+    """
+    Cheap change tokens, read once per rerun and passed to every loader as
+    version=..., so cached results are reused until the data they read changes.
+      tracks:   data generation, bumped by every write to tracks or the rollups
+                (ingest, imports, cleanup, rebuilds, re-basing, replication)
+      sessions: last row processed by sessions.py (repeat_streaks is derived from it)
+    """
+    engine = get_conn()
+    versions = {"tracks": None, "sessions": None}
+    if engine is None: return versions
+    raw = engine.raw_connection()
     try:
-        t = sp.track(track_id)
-        imgs = t['album']['images']
-        return imgs[1]['url'] if len(imgs) > 1 else imgs[0]['url']
+        versions["tracks"] = data_generation(raw)
+        cursor = raw.cursor()
+        cursor.execute("SELECT last_row_id FROM session_state WHERE id = 1")
+        row = cursor.fetchone()
+        versions["sessions"] = row[0] if row else 0
     except Exception:
-        return None
+        pass
+    finally:
+        raw.close()
+    return versions
 
-@st.cache_data(ttl=3600)
-def get_artist_image(artist_name):
-    sp = get_sp()
-    if not sp: return None
+@st.cache_resource
+def get_job_worker():
+    """One background ingest worker per dashboard process (see jobs.py)"""
+    worker = jobs.JobWorker()
+    worker.start()
+    return worker
+
+@st.fragment(run_every=2)
+def ingest_status():
+    """Polls the queued ingest job without blocking the rest of the page"""
+    job_id = st.session_state.get("ingest_job")
+    if not job_id: return
+    job = jobs.JobQueue().get(job_id)
+    if job is None or job["status"] in ("queued", "running"):
+        st.info(f"⏳ Logging… {(job or {}).get('progress') or 'queued'}")
+        return
+    del st.session_state["ingest_job"]
+    if job["status"] == "done":
+        st.session_state["ingest_msg"] = ("success", "Done!" if (job["result"] or {}).get("logged") else "Done — no new plays.")
+    else:
+        st.session_state["ingest_msg"] = ("error", str((job["result"] or {}).get("error", "Logging failed"))[:200])
+    st.rerun()   # new plays change the data version; only affected loaders re-query
+
+def _search_page(page_fn, **kwargs):
+    import pandas as pd
+    engine = get_conn()
+    if engine is None: return pd.DataFrame(), None
+    backend = 'postgres' if engine.dialect.name == 'postgresql' else 'sqlite'
+    raw = engine.raw_connection()
     try:
-        r = sp.search(q=f'artist:{artist_name}', type='artist', limit=1)
-        items = r['artists']['items']
-        if items and items[0]['images']:
-            return items[0]['images'][0]['url']
+        rows, next_cursor = page_fn(raw, backend, **kwargs)
+    finally:
+        raw.close()
+    return pd.DataFrame(rows), next_cursor
+
+@st.cache_data(max_entries=CACHE_ENTRIES, ttl=CACHE_TTL)
+@tracing.traced('dashboard.load_chart_page')
+def load_chart_page(query="", sort="plays", min_plays=1, cursor=None, limit=100, version=None):
+    return _search_page(search.top_tracks_page, query=query, sort=sort, min_plays=min_plays, cursor=cursor, limit=limit)
+
+@st.cache_data(max_entries=CACHE_ENTRIES, ttl=CACHE_TTL)
+@tracing.traced('dashboard.load_recent_page')
+def load_recent_page(query="", sort="newest", cursor=None, limit=50, version=None):
+    return _search_page(search.recent_plays_page, query=query, sort=sort, cursor=cursor, limit=limit)
+
+@st.cache_data(max_entries=CACHE_ENTRIES, ttl=CACHE_TTL)
+@tracing.traced('dashboard.load_on_repeat')
+def load_on_repeat(days=7, n=10, version=None):
+    import pandas as pd
+    conn = get_conn()
+    if conn is None: return pd.DataFrame()
+    since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        return pd.read_sql_query(
+            "SELECT track_id, track_name, artist_name, "
+            "SUM(CASE WHEN kind = 'window' THEN plays ELSE 0 END) as repeat_plays, "
+            "MAX(CASE WHEN kind = 'consecutive' THEN plays ELSE 0 END) as longest_streak "
+            f"FROM repeat_streaks WHERE ended_at >= '{since}' "
+            "GROUP BY track_id, track_name, artist_name "
+            f"ORDER BY repeat_plays DESC, longest_streak DESC LIMIT {n}",
+            conn
+        )
     except Exception:
-        pass
-    return None
+        return pd.DataFrame()   # sessions.py has not run against this database yet
+
+def get_track_images(track_ids):
+    """Artwork for every track on a page in one batched, disk-cached lookup"""
+    return artwork.track_images(get_sp(), [t for t in track_ids if t])
+
+def get_artist_images(df):
+    """Images for the artist_name/artist_id rows of a page, by ID where known"""
+    if df.empty: return {}
+    ids = df["artist_id"] if "artist_id" in df.columns else [None] * len(df)
+    return artwork.artist_images(get_sp(), zip(df["artist_name"], ids))
+
+def page_cursor(key, signature):
+    """Keyset cursor of the current page; a new search/sort (signature) starts over at page 1"""
+    state = st.session_state.setdefault(key, {"sig": None, "cursors": [None]})
+    if state["sig"] != signature:
+        state["sig"], state["cursors"] = signature, [None]
+    return state["cursors"][-1]
+
+def page_nav(key, next_cursor):
+    state = st.session_state[key]
+    n1, n2, n3 = st.columns([1, 2, 1])
+    with n1:
+        if len(state["cursors"]) > 1 and st.button("← Prev", key=f"{key}_prev"):
+            state["cursors"].pop()
+            st.rerun()
+    with n2:
+        st.markdown(f'<div style="text-align:center;font-size:0.75rem;color:{C["muted"]};padding-top:0.5rem;">Page {len(state["cursors"])}</div>', unsafe_allow_html=True)
+    with n3:
+        if next_cursor is not None and st.button("Next →", key=f"{key}_next"):
+            state["cursors"].append(next_cursor)
+            st.rerun()
 
 def base_layout(**kwargs):
     d = dict(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", font=dict(family="Inter", color=C["sub"], size=11), margin=dict(l=8, r=8, t=24, b=8), showlegend=False)
@@ -222,6 +345,7 @@ def base_layout(**kwargs):
     return d
 
 def songs_bar(df):
+    import plotly.graph_objects as go
     d = df.head(15).copy()
     d["label"] = d["track_name"].apply(lambda x: x[:22]+"…" if len(x)>22 else x)
     d = d.iloc[::-1]
@@ -241,12 +365,14 @@ def songs_bar(df):
     return fig
 
 def hourly_chart(df):
+    import plotly.graph_objects as go
     if df.empty: return go.Figure()
     fig = go.Figure(go.Bar(x=df["hour"], y=df["plays"], marker=dict(color=df["plays"], colorscale=[[0, C["navy_dim"]], [0.5, C["navy2"]], [1, C["maroon2"]]], line=dict(width=0)), hovertemplate="<b>%{x}:00</b><br>%{y} plays<extra></extra>"))
     fig.update_layout(**base_layout(height=200), xaxis=dict(showgrid=False, tickmode='array', tickvals=list(range(0,24,3)), ticktext=[f"{h}:00" for h in range(0,24,3)], tickfont=dict(size=9)), yaxis=dict(showgrid=True, gridcolor=C["border"], zeroline=False, tickfont=dict(size=9)), bargap=0.15)
     return fig
 
 def daily_area(df):
+    import plotly.graph_objects as go
     if df.empty: return go.Figure()
     df = df.iloc[::-1]
     fig = go.Figure()
@@ -255,6 +381,7 @@ def daily_area(df):
     return fig
 
 def daily_area_tall(df):
+    import plotly.graph_objects as go
     if df.empty: return go.Figure()
     df = df.iloc[::-1]
     fig = go.Figure()
@@ -268,18 +395,31 @@ def daily_area_tall(df):
         yaxis=dict(showgrid=True, gridcolor=C["border"], zeroline=False, tickfont=dict(size=10)))
     return fig
 
+def week_heatmap(df):
+    import plotly.graph_objects as go
+    days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    z = [[0] * 24 for _ in days]
+    for r in df.itertuples():
+        z[int(r.dow)][int(r.hour)] = int(r.plays)
+    fig = go.Figure(go.Heatmap(z=z, x=[f"{h}:00" for h in range(24)], y=days, xgap=2, ygap=2,
+        colorscale=[[0, C["card2"]], [0.4, C["navy2"]], [1, C["maroon3"]]], showscale=False,
+        hovertemplate="<b>%{y} %{x}</b><br>%{z} plays<extra></extra>"))
+    fig.update_layout(**base_layout(height=250),
+        xaxis=dict(showgrid=False, tickfont=dict(size=9), tickmode='array', tickvals=[f"{h}:00" for h in range(0, 24, 3)]),
+        yaxis=dict(showgrid=False, tickfont=dict(size=10), autorange="reversed"))
+    return fig
+
 # ── Load ──────────────────────────────────────────────────────────────────────
 conn = get_conn()
 if conn is None:
     st.error("Could not connect to database.")
     st.stop()
 
-top_songs   = load_top_songs(20)
-top_artists = load_top_artists(12)
-recent      = load_recent(30)
-hourly      = load_hourly()
-daily       = load_daily()
-stats       = load_stats()
+versions = data_versions()
+V, SV = versions["tracks"], versions["sessions"]
+
+# Each page loads only what it renders; the sidebar needs the stats everywhere
+stats = load_stats(version=V)
 
 # ── Sidebar ───────────────────────────────────────────────────────────────────
 with st.sidebar:
@@ -304,17 +444,15 @@ with st.sidebar:
     st.markdown(f'<div style="font-size:0.68rem;color:{C["muted"]};text-transform:uppercase;letter-spacing:0.1em;padding:0 0.4rem;margin-bottom:0.5rem;">Controls</div>', unsafe_allow_html=True)
 
     if st.button("▶  Log Tracks Now", use_container_width=True):
-        with st.spinner("Logging..."):
-            result = subprocess.run(["python3", "main.py"], capture_output=True, text=True, cwd=str(Path(__file__).parent))
-            if result.returncode == 0:
-                st.success("Done!")
-                st.cache_data.clear()
-                st.rerun()
-            else:
-                st.error(result.stderr[:200])
+        # Returns immediately; clicks while a run is queued/running join that run
+        st.session_state["ingest_job"] = jobs.JobQueue().enqueue("ingest")
+        get_job_worker().wake()
+    ingest_status()
+    if "ingest_msg" in st.session_state:
+        kind, msg = st.session_state.pop("ingest_msg")
+        (st.success if kind == "success" else st.error)(msg)
 
     if st.button("↺  Refresh Data", use_container_width=True):
-        st.cache_data.clear()
         st.rerun()
 
     st.markdown("<hr>", unsafe_allow_html=True)
@@ -334,18 +472,25 @@ with st.sidebar:
 if page == "Overview":
     st.markdown(f'<div style="font-family:Space Grotesk,sans-serif;font-size:1.6rem;font-weight:800;color:{C["text"]};letter-spacing:-0.02em;margin-bottom:0.3rem;">Overview</div><div style="font-size:0.82rem;color:{C["sub"]};margin-bottom:1.5rem;">Your listening at a glance</div>', unsafe_allow_html=True)
 
+    top_songs   = load_top_songs(20, version=V)
+    top_artists = load_top_artists(12, version=V)
+    recent      = load_recent(30, version=V)
+    hourly      = load_hourly(version=V)
+    daily       = load_daily(version=V)
+
     if not top_songs.empty and not top_artists.empty:
         col1, col2, col3 = st.columns(3, gap="medium")
+        ov_imgs = get_track_images(list(top_songs.head(5)["track_id"]) + ([recent.iloc[0]["track_id"]] if not recent.empty else []))
 
         with col1:
             t = top_songs.iloc[0]
-            img = get_track_image(t['track_id'])
+            img = ov_imgs.get(t['track_id'])
             bg = f'<img class="hero-img" src="{img}">' if img else f'<div style="position:absolute;inset:0;background:linear-gradient(135deg,{C["maroon_dim"]},{C["navy_dim"]});"></div>'
             st.markdown(f'<div class="hero-card">{bg}<div class="hero-overlay"><div class="hero-label">🏆 Top Track</div><div class="hero-name">{t["track_name"]}</div><div class="hero-sub">{t["artist_name"]}</div><div class="hero-badge">{t["plays"]} plays</div></div></div>', unsafe_allow_html=True)
 
         with col2:
             a = top_artists.iloc[0]
-            aimg = get_artist_image(a['artist_name'])
+            aimg = get_artist_images(top_artists.head(1)).get(a['artist_name'])
             bg2 = f'<img class="hero-img" src="{aimg}">' if aimg else f'<div style="position:absolute;inset:0;background:linear-gradient(135deg,{C["navy_dim"]},{C["maroon_dim"]});"></div>'
             st.markdown(f'<div class="hero-card">{bg2}<div class="hero-overlay"><div class="hero-label" style="color:{C["gold2"]};">🎤 Top Artist</div><div class="hero-name">{a["artist_name"]}</div><div class="hero-sub">Most played artist</div><div class="hero-badge" style="background:{C["navy2"]};">{a["plays"]} plays</div></div></div>', unsafe_allow_html=True)
 
@@ -353,7 +498,7 @@ if page == "Overview":
         with col3:
             if not recent.empty:
                 rec = recent.iloc[0]
-                rimg = get_track_image(rec['track_id'])
+                rimg = ov_imgs.get(rec['track_id'])
                 bg3 = f'<img class="hero-img" src="{rimg}">' if rimg else f'<div style="position:absolute;inset:0;background:linear-gradient(135deg,{C["card"]},{C["card2"]});"></div>'
                 st.markdown(f'<div class="hero-card">{bg3}<div class="hero-overlay"><div class="hero-label" style="color:{C["sub"]};">⏱ Last Played</div><div class="hero-name">{rec["track_name"]}</div><div class="hero-sub">{rec["artist_name"]}</div><div class="hero-badge" style="background:{C["muted"]};">{str(rec["time_played"])[:5]}  {rec["date_played"]}</div></div></div>', unsafe_allow_html=True)
 
@@ -376,8 +521,9 @@ if page == "Overview":
         st.markdown('<div class="sec-title">🏅 Quick Top 5</div>', unsafe_allow_html=True)
         st.markdown('<div class="panel" style="padding:0.6rem 0.9rem;">', unsafe_allow_html=True)
         if not top_songs.empty:
+            top5_imgs = get_track_images(top_songs.head(5)["track_id"])
             for i, row in enumerate(top_songs.head(5).itertuples(), start=1):
-                img = get_track_image(row.track_id)
+                img = top5_imgs.get(row.track_id)
                 ihtml = f'<img class="track-img" src="{img}">' if img else f'<div class="track-img" style="display:flex;align-items:center;justify-content:center;background:{C["card2"]};border-radius:6px;">🎵</div>'
                 st.markdown(f'''<div class="track-row">
                   <span class="track-num">{i}</span>{ihtml}
@@ -388,20 +534,8 @@ if page == "Overview":
 elif page == "Top Charts":
     st.markdown(f'<div style="font-family:Space Grotesk,sans-serif;font-size:1.6rem;font-weight:800;color:{C["text"]};letter-spacing:-0.02em;margin-bottom:0.3rem;">Top Charts</div><div style="font-size:0.82rem;color:{C["sub"]};margin-bottom:1.5rem;">Your most played songs and artists</div>', unsafe_allow_html=True)
 
-    # Shared CSS for rank table
-    st.markdown(f'''<style>
-      .rank-table {{ width:100%; border-collapse:collapse; }}
-      .rank-table td {{ padding:0.45rem 0.5rem; vertical-align:middle; }}
-      .rank-table tr:hover td {{ background:{C["card2"]}; border-radius:4px; }}
-      .rank-num {{ color:{C["muted"]}; font-size:0.78rem; font-family:"Space Grotesk",sans-serif; width:24px; text-align:right; }}
-      .rank-art img {{ width:34px; height:34px; border-radius:6px; object-fit:cover; display:block; }}
-      .rank-art-ph {{ width:34px; height:34px; border-radius:6px; background:{C["card2"]}; display:flex; align-items:center; justify-content:center; font-size:0.85rem; }}
-      .rank-song {{ color:{C["text"]}; font-size:0.86rem; font-weight:500; user-select:text; cursor:text; }}
-      .rank-artist {{ color:{C["sub"]}; font-size:0.73rem; user-select:text; cursor:text; }}
-      .rank-plays {{ color:{C["maroon3"]}; font-size:0.78rem; font-weight:600; font-family:"Space Grotesk",sans-serif; text-align:right; white-space:nowrap; }}
-    </style>''', unsafe_allow_html=True)
-
-    all_songs = load_top_songs(200)
+    top_songs = load_top_songs(20, version=V)
+
     col_left, col_right = st.columns([2, 3], gap="large")
 
     # ── LEFT: Full rankings with search + sort above leaderboard ─────────────
@@ -415,40 +549,20 @@ elif page == "Top Charts":
         with lf3:
             tc_min = st.number_input("", min_value=1, value=1, step=1, label_visibility="collapsed", key="tc_min", help="Min plays")
 
-        filtered = all_songs.copy()
-        if tc_search:
-            q = tc_search.lower()
-            filtered = filtered[filtered["track_name"].str.lower().str.contains(q) | filtered["artist_name"].str.lower().str.contains(q)]
-        filtered = filtered[filtered["plays"] >= tc_min]
-        if tc_sort == "A → Z":
-            filtered = filtered.sort_values("track_name")
-        elif tc_sort == "Z → A":
-            filtered = filtered.sort_values("track_name", ascending=False)
-
-        # Preserve original rank from all_songs for correct numbering
-        all_songs_ranked = all_songs.reset_index(drop=True)
-        all_songs_ranked["rank"] = all_songs_ranked.index + 1
-        filtered = filtered.merge(all_songs_ranked[["track_id","rank"]], on="track_id", how="left")
-        filtered = filtered.reset_index(drop=True)
+        # Search, filter and sort run in the database; only the visible page is fetched
+        tc_sort_key = {"Most Played": "plays", "A → Z": "name_asc", "Z → A": "name_desc"}[tc_sort]
+        tc_cursor = page_cursor("tc_pages", (tc_search, tc_sort_key, int(tc_min)))
+        filtered, tc_next = load_chart_page(tc_search, tc_sort_key, int(tc_min), tc_cursor, version=V)
 
         if filtered.empty:
             st.info("No songs match your search.")
         else:
-            rows_html = ''
-            for _, row in filtered.head(200).iterrows():
-                img = get_track_image(row["track_id"])
-                art = f'<img src="{img}" style="width:34px;height:34px;border-radius:6px;object-fit:cover;">' if img else '<div class="rank-art-ph">🎵</div>'
-                rank_num = int(row["rank"]) if not pd.isna(row.get("rank", float("nan"))) else "—"
-                rows_html += f'''<tr>
-                  <td class="rank-num">{rank_num}</td>
-                  <td style="padding:0.3rem;">{art}</td>
-                  <td style="min-width:0;width:100%;padding:0.45rem 0.5rem;">
-                    <div class="rank-song">{row["track_name"]}</div>
-                    <div class="rank-artist">{row["artist_name"]}</div>
-                  </td>
-                  <td class="rank-plays">{int(row["plays"])}</td>
-                </tr>'''
-            st.markdown(f'<div class="panel" style="padding:0.5rem 0.6rem;height:880px;overflow-y:auto;"><table class="rank-table">{rows_html}</table></div>', unsafe_allow_html=True)
+            tc_imgs = get_track_images(filtered["track_id"])
+            virtual_list.render([
+                {"n": int(r.rank), "i": tc_imgs.get(r.track_id), "t": r.track_name, "s": r.artist_name, "v": int(r.plays)}
+                for r in filtered.itertuples()
+            ], C, height=880)
+        page_nav("tc_pages", tc_next)
 
     # ── RIGHT: Bar chart (always top 15, unaffected by search) + top 5 artists
     with col_right:
@@ -457,11 +571,12 @@ elif page == "Top Charts":
         st.plotly_chart(songs_bar(top_songs), use_container_width=True, config={"displayModeBar": False})
         st.markdown('</div>', unsafe_allow_html=True)
 
-        top5_artists = load_all_artists().head(5)
+        top5_artists = load_all_artists(version=V).head(5)
         st.markdown('<div class="sec-title">🎤 Top 5 Artists</div>', unsafe_allow_html=True)
         st.markdown('<div class="panel" style="padding:0.8rem 1rem;">', unsafe_allow_html=True)
+        top5_imgs = get_artist_images(top5_artists)
         for row in top5_artists.itertuples():
-            aimg = get_artist_image(row.artist_name)
+            aimg = top5_imgs.get(row.artist_name)
             ihtml = f'<img class="artist-avatar" src="{aimg}">' if aimg else '<div class="artist-avatar" style="display:flex;align-items:center;justify-content:center;">🎤</div>'
             st.markdown(f'''<div class="artist-row">
               {ihtml}
@@ -475,21 +590,9 @@ elif page == "Top Charts":
         st.markdown(f'<div style="font-size:0.72rem;color:{C["muted"]};text-align:right;margin-top:0.35rem;">See all artists → <b>Artists</b> page</div>', unsafe_allow_html=True)
 
 elif page == "Artists":
-    st.markdown(f'<div style="font-family:Space Grotesk,sans-serif;font-size:1.6rem;font-weight:800;color:{C["text"]};letter-spacing:-0.02em;margin-bottom:0.3rem;">Artists</div><div style="font-size:0.82rem;color:{C["sub"]};margin-bottom:1.5rem;">Click any artist to view their top songs</div>', unsafe_allow_html=True)
-
-    st.markdown(f"""<style>
-      .rank-table {{ width:100%; border-collapse:collapse; }}
-      .rank-table td {{ padding:0.45rem 0.5rem; vertical-align:middle; }}
-      .rank-table tr:hover td {{ background:{C["card2"]}; }}
-      .rank-num {{ color:{C["muted"]}; font-size:0.78rem; font-family:"Space Grotesk",sans-serif; width:24px; text-align:right; }}
-      .rank-art img {{ width:34px; height:34px; border-radius:6px; object-fit:cover; display:block; }}
-      .rank-art-ph {{ width:34px; height:34px; border-radius:6px; background:{C["card2"]}; display:flex; align-items:center; justify-content:center; }}
-      .rank-song {{ color:{C["text"]}; font-size:0.86rem; font-weight:500; user-select:text; cursor:text; }}
-      .rank-artist {{ color:{C["sub"]}; font-size:0.73rem; }}
-      .rank-plays {{ color:{C["maroon3"]}; font-size:0.78rem; font-weight:600; font-family:"Space Grotesk",sans-serif; text-align:right; white-space:nowrap; }}
-    </style>""", unsafe_allow_html=True)
-
-    all_artists = load_all_artists()
+    st.markdown(f'<div style="font-family:Space Grotesk,sans-serif;font-size:1.6rem;font-weight:800;color:{C["text"]};letter-spacing:-0.02em;margin-bottom:0.3rem;">Artists</div><div style="font-size:0.82rem;color:{C["sub"]};margin-bottom:1.5rem;">Pick any artist to view their top songs</div>', unsafe_allow_html=True)
+
+    all_artists = load_all_artists(version=V)
 
     # Search + sort
     a1, a2 = st.columns([3, 1], gap="medium")
@@ -521,8 +624,8 @@ elif page == "Artists":
 
     # ── Drill-down shown ABOVE artist list ────────────────────────────────────
     if selected and selected in all_artists["artist_name"].values:
-        artist_songs = load_songs_by_artist(selected)
-        aimg_big     = get_artist_image(selected)
+        artist_songs = load_songs_by_artist(selected, version=V)
+        aimg_big     = get_artist_images(all_artists[all_artists["artist_name"] == selected]).get(selected)
 
         st.markdown(f'<div style="height:1px;background:linear-gradient(90deg,{C["maroon"]},{C["navy2"]},transparent);margin:0.2rem 0 1rem;"></div>', unsafe_allow_html=True)
 
@@ -552,22 +655,14 @@ elif page == "Artists":
             d1, d2 = st.columns([2, 3], gap="large")
             with d1:
                 st.markdown(f"<div class='sec-title'>🎵 {selected}'s Songs</div>", unsafe_allow_html=True)
-                rows_html = ""
-                for i, row in enumerate(artist_songs.itertuples(), start=1):
-                    img = get_track_image(row.track_id)
-                    art = f'<img src="{img}" style="width:34px;height:34px;border-radius:6px;object-fit:cover;">' if img else '<div class="rank-art-ph">🎵</div>'
-                    rows_html += f"""<tr>
-                      <td class="rank-num">{i}</td>
-                      <td style="padding:0.3rem;">{art}</td>
-                      <td style="min-width:0;width:100%;padding:0.45rem 0.5rem;">
-                        <div class="rank-song">{row.track_name}</div>
-                        <div class="rank-artist" style="color:{C['muted']};">Last: {row.last_played}</div>
-                      </td>
-                      <td class="rank-plays">{row.plays}</td>
-                    </tr>"""
-                st.markdown(f'<div class="panel" style="padding:0.5rem 0.6rem;max-height:460px;overflow-y:auto;"><table class="rank-table">{rows_html}</table></div>', unsafe_allow_html=True)
+                song_imgs = get_track_images(artist_songs["track_id"])
+                virtual_list.render([
+                    {"n": i, "i": song_imgs.get(r.track_id), "t": r.track_name, "s": f"Last: {r.last_played}", "v": int(r.plays)}
+                    for i, r in enumerate(artist_songs.itertuples(), start=1)
+                ], C, height=460)
 
             with d2:
+                import plotly.graph_objects as go
                 d = artist_songs.head(12).copy().iloc[::-1]
                 d["label"] = d["track_name"].apply(lambda x: x[:24]+"…" if len(x)>24 else x)
                 fig = go.Figure(go.Bar(
@@ -592,7 +687,7 @@ elif page == "Artists":
 
         st.markdown(f'<div style="height:1px;background:{C["border"]};margin:1.5rem 0 1rem;"></div>', unsafe_allow_html=True)
 
-    # ── Artist grid — pure st.button styled as cards via CSS ───────────────
+    # ── Artist grid ─────────────────────────────────────────────────────────
     sec_row_l, sec_row_r = st.columns([3, 1], gap="medium")
     with sec_row_l:
         st.markdown(f'<div class="sec-title">🎤 All Artists ({len(ar_filtered)})</div>', unsafe_allow_html=True)
@@ -602,78 +697,23 @@ elif page == "Artists":
     if ar_filtered.empty:
         st.info("No artists match your search.")
     else:
-        # Build per-button CSS — one rule per artist card
-        css_rules = []
-        for idx, row in enumerate(ar_filtered.head(int(ar_limit)).itertuples()):
-            is_sel  = (row.artist_name == selected)
-            aimg    = get_artist_image(row.artist_name)
-            img_url = aimg if aimg else ""
-            bg_col  = C["maroon_dim"] if is_sel else C["card"]
-            bd_col  = C["maroon"]     if is_sel else C["border"]
-            fw      = "600"           if is_sel else "400"
-
-            css_rules.append(f"""
-              /* card {idx} */
-              div[data-testid="stButton"]:nth-of-type({idx+1}) button,
-              button[key="art_{idx}"] {{
-                background: {bg_col} !important;
-                border: 1px solid {bd_col} !important;
-                border-radius: 12px !important;
-                padding: 0.55rem 0.85rem !important;
-                text-align: left !important;
-                width: 100% !important;
-                height: auto !important;
-                min-height: 0 !important;
-                color: {C["text"]} !important;
-                font-size: 0 !important;        /* hide default label text */
-                line-height: 0 !important;
-                margin-bottom: 0.3rem !important;
-                transition: border-color 0.15s !important;
-              }}
-              div[data-testid="stButton"]:nth-of-type({idx+1}) button:hover {{
-                border-color: {C["sub"]} !important;
-                background: {C["card2"] if not is_sel else C["maroon_dim"]} !important;
-              }}
-            """)
-
-        # Emit all CSS at once
-        st.markdown(f"<style>{''.join(css_rules)}</style>", unsafe_allow_html=True)
-
-        cols = st.columns(2, gap="medium")
-        for idx, row in enumerate(ar_filtered.head(int(ar_limit)).itertuples()):
-            with cols[idx % 2]:
-                is_sel  = (row.artist_name == selected)
-                aimg    = get_artist_image(row.artist_name)
-                img_tag = f'<img style="width:40px;height:40px;border-radius:50%;object-fit:cover;border:2px solid {C["maroon3"] if is_sel else C["border"]};" src="{aimg}">' if aimg else f'<div style="width:40px;height:40px;border-radius:50%;background:{C["navy_dim"]};border:2px solid {C["border"]};display:flex;align-items:center;justify-content:center;font-size:1rem;">🎤</div>'
-                dot     = f'<span style="color:{C["maroon3"]};font-size:0.65rem;margin-left:auto;padding-left:0.5rem;flex-shrink:0;">●</span>' if is_sel else ''
-                fw      = "600" if is_sel else "500"
-
-                # The button label is HTML rendered via markdown-in-button trick:
-                # We render a flex card as the button label using st.markdown BEFORE
-                # the button, then use negative margin to visually merge them.
-                # Since font-size:0 hides the button text, only our HTML card shows.
-                st.markdown(f'''
-                <div style="display:flex;align-items:center;gap:0.75rem;
-                  padding:0.55rem 0.85rem;border-radius:12px;
-                  background:{"#4a0018" if is_sel else C["card"]};
-                  border:1px solid {"#8b0000" if is_sel else C["border"]};
-                  margin-bottom:0.3rem;pointer-events:none;">
-                  {img_tag}
-                  <div style="flex:1;min-width:0;">
-                    <div style="color:{C["text"]};font-size:0.88rem;font-weight:{fw};
-                      white-space:nowrap;overflow:hidden;text-overflow:ellipsis;">{row.artist_name}</div>
-                    <div style="font-size:0.72rem;color:{C["muted"]};margin-top:2px;">
-                      {row.plays} plays · {row.unique_tracks} tracks · last {row.last_played}</div>
-                  </div>{dot}
-                </div>''', unsafe_allow_html=True)
-
-                # Invisible button sits right below card; negative margin pulls it up
-                # so it overlaps the card div and captures clicks
-                st.markdown('<div style="height:0;overflow:hidden;position:absolute;">', unsafe_allow_html=True)
-                if st.button("x", key=f"art_{idx}", use_container_width=True):
-                    st.session_state["selected_artist"] = None if is_sel else row.artist_name
-                    st.rerun()
-                st.markdown('</div>', unsafe_allow_html=True)
+        shown = ar_filtered.head(int(ar_limit))
+        # One selectbox drives selection; the grid itself is a single windowed element
+        names = list(shown["artist_name"])
+        if selected and selected not in names:
+            names.insert(0, selected)
+        if st.session_state.get("ar_pick") != (selected or "—"):
+            st.session_state["ar_pick"] = selected or "—"
+        st.selectbox("Artist", ["—"] + names, key="ar_pick", label_visibility="collapsed",
+                     on_change=lambda: st.session_state.update(
+                         selected_artist=None if st.session_state["ar_pick"] == "—" else st.session_state["ar_pick"]))
+
+        grid_imgs = get_artist_images(shown)
+        virtual_list.render([
+            {"i": grid_imgs.get(r.artist_name), "t": r.artist_name,
+             "s": f"{r.plays} plays · {r.unique_tracks} tracks · last {r.last_played}", "sel": r.artist_name == selected}
+            for r in shown.itertuples()
+        ], C, height=720, row_height=62, columns=2, round_images=True, placeholder="🎤")
 
 elif page == "Recent Plays":
     st.markdown(f'<div style="font-family:Space Grotesk,sans-serif;font-size:1.6rem;font-weight:800;color:{C["text"]};letter-spacing:-0.02em;margin-bottom:0.3rem;">Recent Plays</div><div style="font-size:0.82rem;color:{C["sub"]};margin-bottom:1.5rem;">Your play history</div>', unsafe_allow_html=True)
@@ -686,50 +726,53 @@ elif page == "Recent Plays":
     with r3:
         rp_limit = st.selectbox("Show", [50, 100, 200], label_visibility="collapsed", key="rp_limit")
 
-    all_recent = load_all_recent(200)
-    rp_filtered = all_recent.copy()
-    if rp_search:
-        q = rp_search.lower()
-        rp_filtered = rp_filtered[rp_filtered["track_name"].str.lower().str.contains(q) | rp_filtered["artist_name"].str.lower().str.contains(q)]
-    if rp_sort == "Oldest First":
-        rp_filtered = rp_filtered.sort_values(["date_played", "time_played"])
-    elif rp_sort == "A → Z":
-        rp_filtered = rp_filtered.sort_values("track_name")
-    rp_filtered = rp_filtered.head(rp_limit).reset_index(drop=True)
-
-    count_label = f"{len(rp_filtered)} tracks" + (f" matching '{rp_search}'" if rp_search else "")
+    rp_sort_key = {"Newest First": "newest", "Oldest First": "oldest", "A → Z": "name_asc"}[rp_sort]
+    rp_cursor = page_cursor("rp_pages", (rp_search, rp_sort_key, rp_limit))
+    rp_filtered, rp_next = load_recent_page(rp_search, rp_sort_key, rp_cursor, int(rp_limit), version=V)
+
+    count_label = f"{len(rp_filtered)}{'+' if rp_next is not None else ''} tracks" + (f" matching '{rp_search}'" if rp_search else "")
     st.markdown(f'<div class="sec-title">🎵 {count_label}</div>', unsafe_allow_html=True)
 
     if rp_filtered.empty:
         st.info("No tracks match your search.")
     else:
-        st.markdown('<div class="panel" style="padding:0.6rem 1rem;">', unsafe_allow_html=True)
-        for row in rp_filtered.itertuples():
-            img = get_track_image(row.track_id)
-            ihtml = f'<img class="track-img" src="{img}">' if img else '<div class="track-img" style="display:flex;align-items:center;justify-content:center;background:#1e1e3a;border-radius:6px;">🎵</div>'
-            name = row.track_name[:42]+"…" if len(row.track_name)>42 else row.track_name
-            st.markdown(f'<div class="track-row">{ihtml}<div class="track-info"><div class="track-name">{name}</div><div class="track-artist">{row.artist_name}</div></div><span class="track-time">{str(row.time_played)[:5]}&nbsp;&nbsp;{row.date_played}</span></div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+        rp_imgs = get_track_images(rp_filtered["track_id"])
+        virtual_list.render([
+            {"i": rp_imgs.get(r.track_id), "t": r.track_name, "s": r.artist_name, "v": f"{str(r.time_played)[:5]}  {r.date_played}"}
+            for r in rp_filtered.itertuples()
+        ], C, height=880, accent=C["sub"])
+        page_nav("rp_pages", rp_next)
 
 elif page == "Activity":
     st.markdown(f'<div style="font-family:Space Grotesk,sans-serif;font-size:1.6rem;font-weight:800;color:{C["text"]};letter-spacing:-0.02em;margin-bottom:0.3rem;">Activity</div><div style="font-size:0.82rem;color:{C["sub"]};margin-bottom:1.5rem;">When and how much you listen</div>', unsafe_allow_html=True)
 
+    # Any range is answered from activity_cube, so widening it costs nothing
+    first_day = date.fromisoformat(stats["from"][:10]) if stats.get("from") not in (None, "None") else date.today()
+    last_day  = date.fromisoformat(stats["to"][:10]) if stats.get("to") not in (None, "None") else date.today()
+    picked = st.date_input("Range", value=(max(first_day, last_day - timedelta(days=29)), last_day),
+                           min_value=first_day, max_value=last_day, key="act_range")
+    picked = tuple(picked) if isinstance(picked, (tuple, list)) else (picked,)
+    start, end = picked[0], picked[-1]   # a half-picked range is a single day
+    activity = load_activity_range(str(start), str(end), version=V)
+    hourly, daily, heat = activity["hourly"], activity["daily"], activity["heatmap"]
+    range_label = f"{start} → {end}"
+
     # Row 1: stat cards across full width
     if not hourly.empty and not daily.empty:
         peak_h  = hourly.loc[hourly["plays"].idxmax()]
         avg_d   = daily["plays"].mean()
         peak_d  = daily.loc[daily["plays"].idxmax()]
-        total_w = int(daily.head(7)["plays"].sum())
+        total_r = int(daily["plays"].sum())
         s1, s2, s3, s4 = st.columns(4, gap="medium")
         s1.metric("Peak Hour",   f'{int(peak_h["hour"]):02d}:00',    f'{int(peak_h["plays"])} plays')
         s2.metric("Best Day",    str(peak_d["date_played"])[-5:],     f'{int(peak_d["plays"])} plays')
         s3.metric("Daily Avg",   f'{avg_d:.1f}',                     "plays / day")
-        s4.metric("Last 7 Days", f'{total_w:,}',                     "total plays")
+        s4.metric("In Range",    f'{total_r:,}',                     "total plays")
 
     st.markdown("<br>", unsafe_allow_html=True)
 
     # Row 2: daily trend full width, taller
-    st.markdown('<div class="sec-title">📅 Daily Plays — last 30 days</div>', unsafe_allow_html=True)
+    st.markdown(f'<div class="sec-title">📅 Daily Plays — {range_label}</div>', unsafe_allow_html=True)
     st.markdown('<div class="panel">', unsafe_allow_html=True)
     if not daily.empty and "date_played" in daily.columns and "plays" in daily.columns:
         st.plotly_chart(daily_area_tall(daily), use_container_width=True, config={"displayModeBar": False})
@@ -762,4 +805,28 @@ elif page == "Activity":
                   <div style="height:5px;background:{C["border"]};border-radius:3px;">
                     <div style="height:5px;width:{pct}%;background:linear-gradient(90deg,{C["navy2"]},{C["maroon2"]});border-radius:3px;"></div>
                   </div></div>''', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
\ No newline at end of file
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    # Row 4: weekday x hour heatmap
+    st.markdown("<br>", unsafe_allow_html=True)
+    st.markdown('<div class="sec-title">🗓 Weekday × Hour</div>', unsafe_allow_html=True)
+    st.markdown('<div class="panel">', unsafe_allow_html=True)
+    if not heat.empty:
+        st.plotly_chart(week_heatmap(heat), use_container_width=True, config={"displayModeBar": False})
+    else:
+        st.caption("No plays in this range.")
+    st.markdown('</div>', unsafe_allow_html=True)
+
+    # Row 5: repeat streaks from sessions.py
+    on_repeat = load_on_repeat(7, version=(SV, str(date.today())))   # window slides daily too
+    if not on_repeat.empty:
+        st.markdown("<br>", unsafe_allow_html=True)
+        st.markdown('<div class="sec-title">🔁 On Repeat This Week</div>', unsafe_allow_html=True)
+        st.markdown('<div class="panel" style="padding:0.6rem 0.9rem;">', unsafe_allow_html=True)
+        for i, row in enumerate(on_repeat.itertuples(), start=1):
+            streak = f' · {row.longest_streak}× in a row' if row.longest_streak else ''
+            st.markdown(f'''<div class="track-row">
+              <span class="track-num">{i}</span>
+              <div class="track-info"><div class="track-name">{row.track_name}</div><div class="track-artist">{row.artist_name}{streak}</div></div>
+              <span class="track-plays">{row.repeat_plays}</span></div>''', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
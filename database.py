@@ -1,10 +1,13 @@
 import logging
 import config
 from datetime import datetime, timedelta
-from typing import List, Tuple, Optional, Dict
+from typing import List, Tuple, Optional, Dict, Iterator
 from pathlib import Path
 import shutil
 
+import tracing
+from metrics import timed_db
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -13,98 +16,566 @@ if config.SUPABASE_DB_URL:
     import psycopg2
     import psycopg2.extras
     DB_BACKEND = 'postgres'
+    IntegrityError = psycopg2.IntegrityError
     logger.info("Using Supabase PostgreSQL backend")
 else:
     import sqlite3
     DB_BACKEND = 'sqlite'
+    IntegrityError = sqlite3.IntegrityError
     logger.info("Using local SQLite backend")
 
 
+# ── Schema migrations ─────────────────────────────────────────────────────────
+# Append new (version, description, fn(cursor, backend)) entries; never edit
+# applied ones. Each runs once per database and is recorded in schema_version.
+# backend is the database being migrated, which need not be DB_BACKEND (the
+# remote Postgres of a local-first replica, see replication.py).
+
+def _pk(backend: str):
+    return 'SERIAL PRIMARY KEY' if backend == 'postgres' else 'INTEGER PRIMARY KEY AUTOINCREMENT'
+
+
+def _create_indexes(cursor, indexes):
+    for idx in indexes:
+        try:
+            cursor.execute(idx)
+        except Exception:
+            pass  # index already exists in postgres
+
+
+def _migration_base_tables(cursor, backend):
+    pk = _pk(backend)
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS tracks (
+            id {pk},
+            date_played DATE NOT NULL,
+            time_played TIME NOT NULL,
+            track_id TEXT NOT NULL,
+            track_name TEXT NOT NULL,
+            artist_name TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(date_played, time_played, track_id)
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS artists (
+            id {pk},
+            artist_name TEXT UNIQUE NOT NULL,
+            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            total_plays INTEGER DEFAULT 0
+        )
+    ''')
+    _create_indexes(cursor, [
+        "CREATE INDEX IF NOT EXISTS idx_track_id ON tracks(track_id)",
+        "CREATE INDEX IF NOT EXISTS idx_artist_name ON tracks(artist_name)",
+        "CREATE INDEX IF NOT EXISTS idx_date_played ON tracks(date_played)",
+        "CREATE INDEX IF NOT EXISTS idx_track_artist ON tracks(track_name, artist_name)",
+    ])
+
+
+def _migration_session_tables(cursor, backend):
+    # Sessionization results (see sessions.py)
+    pk = _pk(backend)
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS listening_sessions (
+            id {pk},
+            started_at TIMESTAMP NOT NULL,
+            ended_at TIMESTAMP NOT NULL,
+            plays INTEGER NOT NULL DEFAULT 0,
+            unique_tracks INTEGER NOT NULL DEFAULT 0,
+            duration_seconds INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS repeat_streaks (
+            id {pk},
+            track_id TEXT NOT NULL,
+            track_name TEXT NOT NULL,
+            artist_name TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            started_at TIMESTAMP NOT NULL,
+            ended_at TIMESTAMP NOT NULL,
+            plays INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS track_repeat_state (
+            track_id TEXT PRIMARY KEY,
+            chain_started_at TIMESTAMP NOT NULL,
+            last_played_at TIMESTAMP NOT NULL,
+            chain_plays INTEGER NOT NULL,
+            streak_id INTEGER
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS session_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_row_id INTEGER NOT NULL DEFAULT 0,
+            last_played_at TIMESTAMP,
+            session_id INTEGER,
+            streak_track_id TEXT,
+            streak_started_at TIMESTAMP,
+            streak_plays INTEGER NOT NULL DEFAULT 0,
+            streak_id INTEGER
+        )
+    ''')
+    _create_indexes(cursor, [
+        "CREATE INDEX IF NOT EXISTS idx_sessions_started ON listening_sessions(started_at)",
+        "CREATE INDEX IF NOT EXISTS idx_streaks_ended ON repeat_streaks(ended_at)",
+    ])
+
+
+def _migration_scheduler_leases(cursor, backend):
+    # Leader election between scheduler instances on Postgres (see leader.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scheduler_leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_at TIMESTAMP NOT NULL
+        )
+    ''')
+
+
+def _migration_artist_ids(cursor, backend):
+    # Spotify artist IDs captured at ingest; NULL on rows logged before this
+    exists = 'IF NOT EXISTS ' if backend == 'postgres' else ''
+    cursor.execute(f"ALTER TABLE tracks ADD COLUMN {exists}artist_id TEXT")
+    cursor.execute(f"ALTER TABLE artists ADD COLUMN {exists}artist_id TEXT")
+
+
+def _migration_search_indexes(cursor, backend):
+    # Name search + keyset pagination for the dashboard (see search.py)
+    _create_indexes(cursor, [
+        "CREATE INDEX IF NOT EXISTS idx_played_at ON tracks(date_played, time_played, id)",
+    ])
+    if backend == 'postgres':
+        # pg_trgm may be unavailable to this role; search then falls back to a scan
+        cursor.execute("SAVEPOINT trgm")
+        try:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_track_name_trgm ON tracks USING gin (track_name gin_trgm_ops)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_artist_name_trgm ON tracks USING gin (artist_name gin_trgm_ops)")
+            cursor.execute("RELEASE SAVEPOINT trgm")
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT trgm")
+            logger.warning(f"pg_trgm indexes not created: {e}")
+        return
+    # External-content FTS5 index over tracks, kept in sync by triggers. Needs
+    # SQLite 3.34+ built with FTS5; without it search falls back to a scan
+    cursor.execute("SAVEPOINT fts")
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+                track_name, artist_name, content='tracks', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS tracks_fts_insert AFTER INSERT ON tracks BEGIN
+                INSERT INTO tracks_fts (rowid, track_name, artist_name) VALUES (new.id, new.track_name, new.artist_name);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS tracks_fts_delete AFTER DELETE ON tracks BEGIN
+                INSERT INTO tracks_fts (tracks_fts, rowid, track_name, artist_name) VALUES ('delete', old.id, old.track_name, old.artist_name);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS tracks_fts_update AFTER UPDATE OF track_name, artist_name ON tracks BEGIN
+                INSERT INTO tracks_fts (tracks_fts, rowid, track_name, artist_name) VALUES ('delete', old.id, old.track_name, old.artist_name);
+                INSERT INTO tracks_fts (rowid, track_name, artist_name) VALUES (new.id, new.track_name, new.artist_name);
+            END
+        ''')
+        cursor.execute("INSERT INTO tracks_fts (tracks_fts) VALUES ('rebuild')")
+        cursor.execute("RELEASE SAVEPOINT fts")
+    except Exception as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT fts")
+        cursor.execute("RELEASE SAVEPOINT fts")
+        logger.warning(f"tracks_fts index not created: {e}")
+
+
+def _migration_jobs(cursor, backend):
+    # Local job queue shared by the dashboard and the scheduler (see jobs.py)
+    pk = _pk(backend)
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id {pk},
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            progress TEXT,
+            result TEXT,
+            requested_at TIMESTAMP NOT NULL,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    _create_indexes(cursor, [
+        # At most one queued/running job per kind: concurrent enqueues dedupe
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active ON jobs(kind) WHERE status IN ('queued', 'running')",
+    ])
+
+
+def _activity_cube_backfill_sql(backend: str = None) -> str:
+    # dow: 0 = Monday ... 6 = Sunday, same as datetime.weekday()
+    if (backend or DB_BACKEND) == 'postgres':
+        hour, dow = 'EXTRACT(HOUR FROM time_played)::int', '(EXTRACT(ISODOW FROM date_played)::int - 1)'
+    else:
+        hour, dow = "CAST(SUBSTR(time_played, 1, 2) AS INTEGER)", "((CAST(strftime('%w', date_played) AS INTEGER) + 6) % 7)"
+    return f'''
+        INSERT INTO activity_cube (date_played, hour, dow, plays, distinct_tracks)
+        SELECT date_played, {hour}, {dow}, COUNT(*), COUNT(DISTINCT track_id)
+        FROM tracks
+        GROUP BY date_played, {hour}, {dow}
+    '''
+
+
+def _migration_activity_cube(cursor, backend):
+    # Plays per (date, hour) bucket, maintained by add_tracks (see refresh_rollups)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_cube (
+            date_played DATE NOT NULL,
+            hour INTEGER NOT NULL,
+            dow INTEGER NOT NULL,
+            plays INTEGER NOT NULL,
+            distinct_tracks INTEGER NOT NULL,
+            PRIMARY KEY (date_played, hour)
+        )
+    ''')
+    cursor.execute(_activity_cube_backfill_sql(backend))
+
+
+def _artists_refresh_sql(backend: str = None) -> str:
+    return '''
+        INSERT INTO artists (artist_name, total_plays, artist_id)
+        SELECT artist_name, COUNT(*), MAX(artist_id) FROM tracks GROUP BY artist_name
+        ON CONFLICT (artist_name) DO UPDATE
+            SET total_plays = EXCLUDED.total_plays,
+                artist_id = COALESCE(EXCLUDED.artist_id, artists.artist_id)
+    ''' if (backend or DB_BACKEND) == 'postgres' else '''
+        INSERT OR REPLACE INTO artists (artist_name, total_plays, artist_id)
+        SELECT artist_name, COUNT(*), MAX(artist_id) FROM tracks GROUP BY artist_name
+    '''
+
+
+def _track_daily_fill_sql(where: str = '') -> str:
+    return f'''
+        INSERT INTO track_daily (date_played, track_id, track_name, artist_name, artist_id, plays)
+        SELECT date_played, track_id, MAX(track_name), MAX(artist_name), MAX(artist_id), COUNT(*)
+        FROM tracks {where}
+        GROUP BY date_played, track_id
+    '''
+
+
+def _migration_track_daily(cursor, backend):
+    # Plays per (date, track), maintained by add_tracks; top tracks/artists for
+    # any date range sum this instead of scanning tracks (see query_api.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS track_daily (
+            date_played DATE NOT NULL,
+            track_id TEXT NOT NULL,
+            track_name TEXT NOT NULL,
+            artist_name TEXT NOT NULL,
+            artist_id TEXT,
+            plays INTEGER NOT NULL,
+            PRIMARY KEY (date_played, track_id)
+        )
+    ''')
+    cursor.execute(_track_daily_fill_sql())
+
+
+def _migration_sync_state(cursor, backend):
+    # High-water marks for replication.py (local replica <-> Supabase)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            name TEXT PRIMARY KEY,
+            value BIGINT NOT NULL
+        )
+    ''')
+
+
+def _migration_sync_gaps(cursor, backend):
+    # Remote ids replication.py has stepped over but not yet seen committed:
+    # re-checked on every pull until they appear or age out
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_gaps (
+            lo BIGINT PRIMARY KEY,
+            hi BIGINT NOT NULL,
+            seen_at DOUBLE PRECISION NOT NULL
+        )
+    ''')
+
+
+def _migration_sketch_state(cursor, backend):
+    # Persisted heavy-hitters sketch (see heavy_hitters.py), kept with the
+    # rows it summarises so it can never be applied to another database
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sketch_state (
+            name TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        )
+    ''')
+
+
+def _track_totals_fill_sql(where: str = '') -> str:
+    return f'''
+        INSERT INTO track_totals (track_id, track_name, artist_name, plays)
+        SELECT track_id, MAX(track_name), MAX(artist_name), SUM(plays)
+        FROM track_daily {where}
+        GROUP BY track_id
+    '''
+
+
+def _migration_track_totals(cursor, backend):
+    # All-time plays per track, kept from track_daily by refresh_rollups; the
+    # dashboard's ranked chart (search.top_tracks_page) pages down this
+    # instead of grouping the whole tracks table for every page
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS track_totals (
+            track_id TEXT PRIMARY KEY,
+            track_name TEXT NOT NULL,
+            artist_name TEXT NOT NULL,
+            plays INTEGER NOT NULL
+        )
+    ''')
+    _create_indexes(cursor, [
+        "CREATE INDEX IF NOT EXISTS idx_track_totals_rank ON track_totals(plays DESC, track_id)",
+        "CREATE INDEX IF NOT EXISTS idx_track_daily_track ON track_daily(track_id)",
+    ])
+    cursor.execute(_track_totals_fill_sql())
+
+
+def _migration_data_generation(cursor, backend):
+    # One counter bumped by every transaction that changes tracks or the
+    # rollups; readers (dashboard, query_api.py) key their caches on it
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_generation (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation BIGINT NOT NULL
+        )
+    ''')
+    cursor.execute("INSERT INTO data_generation (id, generation) VALUES (1, 0) ON CONFLICT (id) DO NOTHING")
+
+
+def bump_generation(cursor):
+    """Mark the play data changed, inside the caller's transaction"""
+    cursor.execute("UPDATE data_generation SET generation = generation + 1 WHERE id = 1")
+
+
+def data_generation(conn) -> int:
+    """Current data generation on any DB-API connection"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT generation FROM data_generation WHERE id = 1")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def refresh_rollups(cursor, p: str, buckets, backend: str = None):
+    """
+    Bring artists, activity_cube, track_daily and track_totals up to date for the (date, hour)
+    buckets that just gained plays, and bump the data generation, inside the
+    caller's transaction. Works on any connection (p / backend describe it),
+    so replication can run it remotely.
+    """
+    for date_played, hour in sorted(buckets):
+        # Served by idx_played_at; a bucket holds at most a few dozen plays
+        cursor.execute(f'''
+            SELECT COUNT(*), COUNT(DISTINCT track_id) FROM tracks
+            WHERE date_played = {p} AND time_played BETWEEN {p} AND {p}
+        ''', (date_played, f"{hour:02d}:00:00", f"{hour:02d}:59:59"))
+        plays, distinct_tracks = cursor.fetchone()
+        dow = datetime.strptime(date_played[:10], '%Y-%m-%d').weekday()
+        cursor.execute(f'''
+            INSERT INTO activity_cube (date_played, hour, dow, plays, distinct_tracks)
+            VALUES ({p}, {p}, {p}, {p}, {p})
+            ON CONFLICT (date_played, hour) DO UPDATE
+                SET plays = EXCLUDED.plays, distinct_tracks = EXCLUDED.distinct_tracks
+        ''', (date_played, hour, dow, plays, distinct_tracks))
+
+    dates = sorted({d for d, _ in buckets})
+    for i in range(0, len(dates), 500):
+        chunk = dates[i:i + 500]
+        marks = ', '.join([p] * len(chunk))
+        cursor.execute(f"DELETE FROM track_daily WHERE date_played IN ({marks})", chunk)
+        cursor.execute(_track_daily_fill_sql(f"WHERE date_played IN ({marks})"), chunk)
+        # Re-total every track played on those dates (idx_track_daily_track)
+        touched = f"SELECT track_id FROM track_daily WHERE date_played IN ({marks})"
+        cursor.execute(f"DELETE FROM track_totals WHERE track_id IN ({touched})", chunk)
+        cursor.execute(_track_totals_fill_sql(f"WHERE track_id IN ({touched})"), chunk)
+
+    cursor.execute(_artists_refresh_sql(backend))
+    bump_generation(cursor)
+
+
+def date_range_clause(p: str, start: str = None, end: str = None) -> Tuple[str, list]:
+    """WHERE clause (or '') limiting date_played to an inclusive range; either end may be open"""
+    where, params = [], []
+    if start:
+        where.append(f"date_played >= {p}")
+        params.append(str(start))
+    if end:
+        where.append(f"date_played <= {p}")
+        params.append(str(end))
+    return (f"WHERE {' AND '.join(where)}" if where else ''), params
+
+
+def activity_summary(conn, p: str, start: str = None, end: str = None) -> Dict:
+    """
+    Range query over activity_cube on any DB-API connection (p is its
+    placeholder), so the dashboard's engine can share it. Inclusive dates;
+    returns lists of rows: hourly (hour, plays), daily (date, plays) oldest
+    first, heatmap (dow, hour, plays).
+    """
+    where_sql, params = date_range_clause(p, start, end)
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT hour, SUM(plays) FROM activity_cube {where_sql} GROUP BY hour ORDER BY hour", params)
+    hourly = cursor.fetchall()
+    cursor.execute(f'''
+        SELECT CAST(date_played AS TEXT), SUM(plays)
+        FROM activity_cube {where_sql} GROUP BY date_played ORDER BY date_played
+    ''', params)
+    daily = cursor.fetchall()
+    cursor.execute(f"SELECT dow, hour, SUM(plays) FROM activity_cube {where_sql} GROUP BY dow, hour ORDER BY dow, hour", params)
+    heatmap = cursor.fetchall()
+    return {'hourly': hourly, 'daily': daily, 'heatmap': heatmap}
+
+
+MIGRATIONS = [
+    (1, 'tracks and artists tables', _migration_base_tables),
+    (2, 'listening session and repeat streak tables', _migration_session_tables),
+    (3, 'scheduler lease table', _migration_scheduler_leases),
+    (4, 'artist ids on tracks and artists', _migration_artist_ids),
+    (5, 'track name search and pagination indexes', _migration_search_indexes),
+    (6, 'job queue', _migration_jobs),
+    (7, 'activity cube', _migration_activity_cube),
+    (8, 'daily track plays rollup', _migration_track_daily),
+    (9, 'replication high-water marks', _migration_sync_state),
+    (10, 'heavy-hitters sketch state', _migration_sketch_state),
+    (11, 'per-track play totals', _migration_track_totals),
+    (12, 'data generation counter', _migration_data_generation),
+    (13, 'replication id gaps', _migration_sync_gaps),
+]
+
+MIGRATION_LOCK_KEY = 7426071   # pg_advisory_lock key held while migrating
+
+
+def schema_version(conn) -> int:
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+        return cursor.fetchone()[0] or 0
+    except Exception:
+        # Table missing — database predates versioning or is brand new
+        conn.rollback()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.commit()
+        return 0
+
+
+def migrate(conn, backend: str = None) -> List[int]:
+    """
+    Apply pending MIGRATIONS on any DB-API connection (backend describes it,
+    default DB_BACKEND) and commit; returns the versions applied
+    """
+    backend = backend or DB_BACKEND
+    p = '%s' if backend == 'postgres' else '?'
+    # Several processes may start on an old schema at once: serialise them
+    # and read the version under the lock, so each migration (and its
+    # backfill) runs exactly once
+    cursor = conn.cursor()
+    if backend == 'postgres':
+        # Session-level, so it outlives the commits below; released in finally
+        cursor.execute(f"SELECT pg_advisory_lock({MIGRATION_LOCK_KEY})")
+    try:
+        if schema_version(conn) >= MIGRATIONS[-1][0]:
+            return []
+        if backend != 'postgres':
+            cursor.execute('BEGIN IMMEDIATE')   # SQLite's write lock, held until the commit
+        current = schema_version(conn)
+        pending = [m for m in MIGRATIONS if m[0] > current]
+        for version, description, apply in pending:
+            apply(cursor, backend)
+            cursor.execute(f'''
+                INSERT INTO schema_version (version, description) VALUES ({p}, {p})
+                ON CONFLICT (version) DO NOTHING
+            ''', (version, description))
+            logger.info(f"Applied schema migration {version}: {description}")
+        conn.commit()
+        return [m[0] for m in pending]
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if backend == 'postgres':
+            cursor.execute(f"SELECT pg_advisory_unlock({MIGRATION_LOCK_KEY})")
+            conn.commit()
+
+
+# Databases whose schema has been brought up to date in this process
+_verified_schemas = set()
+
+
+def _instrumented(fn):
+    """Per-method latency metric, plus a trace span when SPOTIFY_TRACE is set"""
+    return tracing.traced(f"db.{fn.__name__}")(timed_db(fn))
+
+
 class SpotifyDatabase:
 
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, persistent: bool = False):
         self.db_path = db_path or config.DATABASE_PATH
-        self.init_database()
+        # persistent=True reuses one connection across calls (long-lived
+        # processes like the scheduler); `with conn:` still scopes each
+        # transaction, it just doesn't reconnect every time
+        self.persistent = persistent
+        self._conn = None
+        # Schema is checked once per process per database, not per instance
+        if self._schema_key() not in _verified_schemas:
+            self.init_database()
+
+    def _schema_key(self) -> str:
+        return config.SUPABASE_DB_URL if DB_BACKEND == 'postgres' else str(Path(self.db_path).resolve())
 
     def get_connection(self):
+        if self.persistent and self._conn is not None:
+            if DB_BACKEND != 'postgres' or not self._conn.closed:
+                return self._conn
         if DB_BACKEND == 'postgres':
             conn = psycopg2.connect(config.SUPABASE_DB_URL)
-            return conn
         else:
             import sqlite3
             conn = sqlite3.connect(self.db_path)
             conn.execute("PRAGMA foreign_keys = ON")
             conn.execute("PRAGMA journal_mode = WAL")
-            return conn
+        if self.persistent:
+            self._conn = conn
+        return conn
+
+    def close(self):
+        """Close the persistent connection, if any"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
 
     def _placeholder(self):
         """Return the correct SQL placeholder for the backend."""
         return '%s' if DB_BACKEND == 'postgres' else '?'
 
+    @_instrumented
     def init_database(self):
+        """Apply any pending MIGRATIONS and mark this database verified for the process"""
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-
-            if DB_BACKEND == 'postgres':
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS tracks (
-                        id SERIAL PRIMARY KEY,
-                        date_played DATE NOT NULL,
-                        time_played TIME NOT NULL,
-                        track_id TEXT NOT NULL,
-                        track_name TEXT NOT NULL,
-                        artist_name TEXT NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(date_played, time_played, track_id)
-                    )
-                ''')
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS artists (
-                        id SERIAL PRIMARY KEY,
-                        artist_name TEXT UNIQUE NOT NULL,
-                        first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        total_plays INTEGER DEFAULT 0
-                    )
-                ''')
-            else:
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS tracks (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        date_played DATE NOT NULL,
-                        time_played TIME NOT NULL,
-                        track_id TEXT NOT NULL,
-                        track_name TEXT NOT NULL,
-                        artist_name TEXT NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(date_played, time_played, track_id)
-                    )
-                ''')
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS artists (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        artist_name TEXT UNIQUE NOT NULL,
-                        first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        total_plays INTEGER DEFAULT 0
-                    )
-                ''')
-
-            # Indexes work the same in both backends
-            indexes = [
-                "CREATE INDEX IF NOT EXISTS idx_track_id ON tracks(track_id)",
-                "CREATE INDEX IF NOT EXISTS idx_artist_name ON tracks(artist_name)",
-                "CREATE INDEX IF NOT EXISTS idx_date_played ON tracks(date_played)",
-                "CREATE INDEX IF NOT EXISTS idx_track_artist ON tracks(track_name, artist_name)",
-            ]
-            for idx in indexes:
-                try:
-                    cursor.execute(idx)
-                except Exception:
-                    pass  # index already exists in postgres
-
-            conn.commit()
-        logger.info(f"Database initialized ({'Supabase' if DB_BACKEND == 'postgres' else self.db_path})")
+            migrate(conn)
+        _verified_schemas.add(self._schema_key())
+        logger.info(f"Database initialized ({'Supabase' if DB_BACKEND == 'postgres' else self.db_path}, schema v{MIGRATIONS[-1][0]})")
 
+    @_instrumented
     def add_tracks(self, tracks: List[Tuple]) -> int:
+        """Insert (date, time, track_id, track_name, artist_name[, artist_id]) rows"""
         if not tracks:
             return 0
         p = self._placeholder()
@@ -112,30 +583,26 @@ class SpotifyDatabase:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 inserted = 0
+                buckets = set()
                 for track in tracks:
+                    track = tuple(track) + (None,) * (6 - len(track))
                     try:
                         cursor.execute(f'''
-                            INSERT INTO tracks (date_played, time_played, track_id, track_name, artist_name)
-                            VALUES ({p}, {p}, {p}, {p}, {p})
+                            INSERT INTO tracks (date_played, time_played, track_id, track_name, artist_name, artist_id)
+                            VALUES ({p}, {p}, {p}, {p}, {p}, {p})
                             ON CONFLICT (date_played, time_played, track_id) DO NOTHING
                         ''' if DB_BACKEND == 'postgres' else f'''
-                            INSERT OR IGNORE INTO tracks (date_played, time_played, track_id, track_name, artist_name)
-                            VALUES ({p}, {p}, {p}, {p}, {p})
+                            INSERT OR IGNORE INTO tracks (date_played, time_played, track_id, track_name, artist_name, artist_id)
+                            VALUES ({p}, {p}, {p}, {p}, {p}, {p})
                         ''', track)
                         if cursor.rowcount > 0:
                             inserted += 1
+                            buckets.add((str(track[0]), int(str(track[1])[:2])))
                     except Exception:
                         pass
 
                 if inserted > 0:
-                    cursor.execute(f'''
-                        INSERT INTO artists (artist_name, total_plays)
-                        SELECT artist_name, COUNT(*) FROM tracks GROUP BY artist_name
-                        ON CONFLICT (artist_name) DO UPDATE SET total_plays = EXCLUDED.total_plays
-                    ''' if DB_BACKEND == 'postgres' else '''
-                        INSERT OR REPLACE INTO artists (artist_name, total_plays)
-                        SELECT artist_name, COUNT(*) FROM tracks GROUP BY artist_name
-                    ''')
+                    refresh_rollups(cursor, p, buckets)
                 conn.commit()
                 logger.info(f"Inserted {inserted} new tracks")
                 return inserted
@@ -143,11 +610,39 @@ class SpotifyDatabase:
             logger.error(f"Error adding tracks: {e}")
             return 0
 
+    @_instrumented
+    def rebuild_rollups(self) -> Dict:
+        """Recompute artists and the rollup tables from tracks (after bulk loads that bypass add_tracks)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_artists_refresh_sql())
+            counts = {'artists': cursor.rowcount}
+            for table, fill_sql in (('activity_cube', _activity_cube_backfill_sql()),
+                                    ('track_daily', _track_daily_fill_sql()),
+                                    ('track_totals', _track_totals_fill_sql())):
+                cursor.execute(f'DELETE FROM {table}')
+                cursor.execute(fill_sql)
+                cursor.execute(f'SELECT COUNT(*) FROM {table}')
+                counts[table] = cursor.fetchone()[0]
+            # Rows may have been deleted or rewritten under the sketch's
+            # cursor; drop it so heavy_hitters.refresh rebuilds from scratch
+            cursor.execute('DELETE FROM sketch_state')
+            bump_generation(cursor)
+            conn.commit()
+            return counts
+
+    @_instrumented
+    def get_activity(self, start: str = None, end: str = None) -> Dict:
+        """Hourly, daily and weekday x hour play counts for a date range, from activity_cube"""
+        with self.get_connection() as conn:
+            return activity_summary(conn, self._placeholder(), start, end)
+
     # --- All methods below are unchanged from your original database.py ---
     # get_track_frequencies, get_artist_frequencies, get_playlist_tracks,
     # get_statistics, cleanup_old_data, backup_database, import_from_csv
     # Copy them in exactly as they are — the SQL is identical for both backends
     
+    @_instrumented
     def get_track_frequencies(self, limit: Optional[int] = None) -> List[Tuple]:
         """Get tracks ordered by play frequency"""
         try:
@@ -171,6 +666,33 @@ class SpotifyDatabase:
             logger.error(f"Database error getting track frequencies: {e}")
             return []
     
+    def stream_cursor(self, conn, name: str = 'stream'):
+        """Cursor that streams large result sets instead of buffering them
+        (a server-side named cursor on Postgres, a plain cursor on SQLite)"""
+        if DB_BACKEND == 'postgres':
+            return conn.cursor(name=name)
+        return conn.cursor()
+
+    def iter_tracks_since(self, last_id: int = 0, batch_size: int = 5000) -> Iterator[Tuple]:
+        """Stream (id, date_played, time_played, track_id, track_name, artist_name)
+        rows with id > last_id in id order, batch_size rows at a time"""
+        p = self._placeholder()
+        with self.get_connection() as conn:
+            cursor = self.stream_cursor(conn, 'iter_tracks_since')
+            cursor.execute(f'''
+                SELECT id, CAST(date_played AS TEXT), CAST(time_played AS TEXT),
+                       track_id, track_name, artist_name
+                FROM tracks
+                WHERE id > {p}
+                ORDER BY id
+            ''', (last_id,))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+
+    @_instrumented
     def get_artist_frequencies(self) -> List[Tuple]:
         """Get artists ordered by total plays"""
         try:
@@ -190,54 +712,62 @@ class SpotifyDatabase:
             logger.error(f"Database error getting artist frequencies: {e}")
             return []
     
+    @_instrumented
     def get_playlist_tracks(self, num_songs: int) -> List[str]:
         """
         Get track IDs for playlist creation using your original logic
         Returns list of track_ids
+
+        The selection runs as a single query: the top ``num_songs * 2`` tracks
+        form the candidate pool, every frequency tier above the pool's lowest
+        is taken in order, and the lowest tier is tie-broken by the artist's
+        total plays (least played artist first).
         """
+        p = self._placeholder()
         try:
-            track_frequencies = self.get_track_frequencies(num_songs * 2)  # Get extra for selection
-            
-            if not track_frequencies:
-                return []
-            
-            if len(track_frequencies) <= num_songs:
-                return [row[0] for row in track_frequencies]
-            
-            # Group tracks by frequency (your original logic)
-            freq_groups = {}
-            for track_id, track_name, artist_name, freq in track_frequencies:
-                if freq not in freq_groups:
-                    freq_groups[freq] = []
-                freq_groups[freq].append((track_id, artist_name))
-            
-            track_ids = []
-            frequencies = sorted(freq_groups.keys(), reverse=True)
-            
-            # Add all tracks except from the lowest frequency group
-            for freq in frequencies[:-1]:
-                for track_id, artist_name in freq_groups[freq]:
-                    if len(track_ids) < num_songs:
-                        track_ids.append(track_id)
-            
-            # Handle remaining slots with lowest frequency songs
-            if len(track_ids) < num_songs and frequencies:
-                remaining_slots = num_songs - len(track_ids)
-                lowest_freq_songs = freq_groups[frequencies[-1]]
-                
-                # Sort by artist frequency for tie-breaking
-                artist_freqs = dict(self.get_artist_frequencies())
-                lowest_freq_songs.sort(key=lambda x: artist_freqs.get(x[1], 0))
-                
-                for track_id, _ in lowest_freq_songs[:remaining_slots]:
-                    track_ids.append(track_id)
-            
-            return track_ids[:num_songs]
-            
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    WITH track_freq AS (
+                        SELECT track_id, track_name, artist_name, COUNT(*) AS frequency
+                        FROM tracks
+                        GROUP BY track_id, track_name, artist_name
+                    ),
+                    pool AS (
+                        SELECT track_id, track_name, artist_name, frequency
+                        FROM track_freq
+                        ORDER BY frequency DESC, track_name ASC
+                        LIMIT {p}
+                    ),
+                    artist_totals AS (
+                        SELECT artist_name, COUNT(*) AS artist_plays
+                        FROM tracks
+                        WHERE artist_name IN (SELECT artist_name FROM pool)
+                        GROUP BY artist_name
+                    ),
+                    ranked AS (
+                        SELECT pool.track_id, pool.track_name, pool.frequency,
+                               COALESCE(artist_totals.artist_plays, 0) AS artist_plays,
+                               RANK() OVER (ORDER BY pool.frequency ASC) AS tier_from_bottom,
+                               COUNT(*) OVER () AS pool_size
+                        FROM pool
+                        LEFT JOIN artist_totals ON artist_totals.artist_name = pool.artist_name
+                    )
+                    SELECT track_id
+                    FROM ranked
+                    ORDER BY frequency DESC,
+                             CASE WHEN pool_size > {p} AND tier_from_bottom = 1
+                                  THEN artist_plays ELSE 0 END ASC,
+                             track_name ASC
+                    LIMIT {p}
+                ''', (num_songs * 2, num_songs, num_songs))
+                return [row[0] for row in cursor.fetchall()]
+
         except Exception as e:
             logger.error(f"Error generating playlist tracks: {e}")
             return []
     
+    @_instrumented
     def get_statistics(self) -> Dict:
         """Get database statistics"""
         try:
@@ -291,6 +821,7 @@ class SpotifyDatabase:
             logger.error(f"Error getting statistics: {e}")
             return {}
     
+    @_instrumented
     def cleanup_old_data(self, days_to_keep: int = 90) -> int:
         """Remove data older than specified days"""
         try:
@@ -298,16 +829,22 @@ class SpotifyDatabase:
                 cursor = conn.cursor()
                 
                 cutoff_date = (datetime.now() - timedelta(days=days_to_keep)).date()
+                p = self._placeholder()
                 
-                cursor.execute('''
+                cursor.execute(f'''
                     DELETE FROM tracks 
-                    WHERE date_played < ?
+                    WHERE date_played < {p}
                 ''', (cutoff_date,))
                 
                 deleted_count = cursor.rowcount
                 
                 # Update artist statistics
                 if deleted_count > 0:
+                    cursor.execute(f'DELETE FROM activity_cube WHERE date_played < {p}', (cutoff_date,))
+                    cursor.execute(f'DELETE FROM track_daily WHERE date_played < {p}', (cutoff_date,))
+                    cursor.execute('DELETE FROM track_totals')
+                    cursor.execute(_track_totals_fill_sql())
+
                     cursor.execute('''
                         UPDATE artists SET total_plays = (
                             SELECT COUNT(*) FROM tracks WHERE tracks.artist_name = artists.artist_name
@@ -316,15 +853,20 @@ class SpotifyDatabase:
                     
                     # Remove artists with no tracks
                     cursor.execute('DELETE FROM artists WHERE total_plays = 0')
+
+                    # The sketch still counts the deleted plays; rebuild it
+                    cursor.execute('DELETE FROM sketch_state')
+                    bump_generation(cursor)
                 
                 conn.commit()
                 logger.info(f"Cleaned up {deleted_count} old records")
                 return deleted_count
                 
-        except sqlite3.Error as e:
+        except Exception as e:
             logger.error(f"Error cleaning up old data: {e}")
             return 0
     
+    @_instrumented
     def backup_database(self, backup_name: str = None) -> str:
         """Create a backup of the database"""
         try:
@@ -342,6 +884,7 @@ class SpotifyDatabase:
             logger.error(f"Error backing up database: {e}")
             return ""
     
+    @_instrumented
     def import_from_csv(self, csv_file_path: str) -> int:
         """Import data from your existing CSV files"""
         import csv
@@ -0,0 +1,272 @@
+# export.py
+# Columnar export of the play history for offline analysis, plus the legacy
+# frequency reports:
+#   exports/<table>/month=YYYY-MM/part-0.parquet   (or .arrow with --format arrow)
+#   for tracks, track_daily and activity_cube, Hive-style partitions that
+#   pyarrow.dataset / pandas / DuckDB read as one table
+#   - strings (track/artist ids and names) are dictionary-encoded
+#   - every partition is read with a streaming cursor and written EXPORT_BATCH
+#     rows at a time, so memory stays flat however big the month is
+#   - incremental: exports/_manifest.json records a content token per month
+#     (play count, max and sum of ids, sum of timestamps, read from the
+#     idx_played_at index); only months whose token changed (new plays,
+#     imports, cleanup, re-based times) are rewritten, and months that no
+#     longer exist are removed
+#   freq_log.csv / artist_log.csv are regenerated from track_daily and
+#   artists instead of grouping the whole tracks table
+# Needs pyarrow for the columnar files (pip install pyarrow); --csv-only
+# works without it.
+# Run with: python3 export.py [--out exports] [--format parquet|arrow] [--full] [--csv-only]
+
+import argparse
+import csv
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import date
+from pathlib import Path
+from typing import Dict, List
+
+import config
+import database
+from database import SpotifyDatabase
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST = '_manifest.json'
+EXPORT_VERSION = 1    # bump when a table's columns change, to rewrite every partition
+TABLES = ('tracks', 'track_daily', 'activity_cube')
+
+
+def _arrow():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise RuntimeError("Columnar export needs pyarrow — pip install pyarrow (or use --csv-only)")
+    return pa
+
+
+def _schema(pa, table: str):
+    text = pa.dictionary(pa.int32(), pa.string())
+    return {
+        'tracks': pa.schema([('id', pa.int64()), ('date_played', pa.date32()), ('time_played', pa.time32('s')),
+                             ('track_id', text), ('track_name', text), ('artist_name', text), ('artist_id', text)]),
+        'track_daily': pa.schema([('date_played', pa.date32()), ('track_id', text), ('track_name', text),
+                                  ('artist_name', text), ('artist_id', text), ('plays', pa.int32())]),
+        'activity_cube': pa.schema([('date_played', pa.date32()), ('hour', pa.int8()), ('dow', pa.int8()),
+                                    ('plays', pa.int32()), ('distinct_tracks', pa.int32())]),
+    }[table]
+
+
+def _select(table: str, p: str) -> str:
+    """Rows of one month ([p, p) on date_played), in an index-served order"""
+    columns = {
+        'tracks': 'id, CAST(date_played AS TEXT), CAST(time_played AS TEXT), track_id, track_name, artist_name, artist_id',
+        'track_daily': 'CAST(date_played AS TEXT), track_id, track_name, artist_name, artist_id, plays',
+        'activity_cube': 'CAST(date_played AS TEXT), hour, dow, plays, distinct_tracks',
+    }[table]
+    order = {'tracks': 'date_played, time_played, id', 'track_daily': 'date_played, track_id',
+             'activity_cube': 'date_played, hour'}[table]
+    return f"SELECT {columns} FROM {table} WHERE date_played >= {p} AND date_played < {p} ORDER BY {order}"
+
+
+class _Dictionary:
+    """
+    Append-only string dictionary for one column of one file. Batches share
+    it, so an Arrow IPC file only ever sees dictionary deltas (the file format
+    forbids replacing a dictionary), and memory grows with distinct values,
+    not rows.
+    """
+
+    def __init__(self, pa):
+        self.pa = pa
+        self.index: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def encode(self, column):
+        indices = []
+        for value in column:
+            if value is None:
+                indices.append(None)
+                continue
+            i = self.index.get(value)
+            if i is None:
+                i = self.index[value] = len(self.values)
+                self.values.append(value)
+            indices.append(i)
+        return self.pa.DictionaryArray.from_arrays(self.pa.array(indices, self.pa.int32()),
+                                                   self.pa.array(self.values, self.pa.string()))
+
+
+def _to_batch(pa, schema, rows, dictionaries):
+    arrays = []
+    for field, column in zip(schema, zip(*rows)):
+        if pa.types.is_dictionary(field.type):
+            arrays.append(dictionaries.setdefault(field.name, _Dictionary(pa)).encode(column))
+        elif pa.types.is_date(field.type):
+            arrays.append(pa.array(column, pa.string()).cast(pa.date32()))
+        elif pa.types.is_time(field.type):
+            seconds = [int(t[:2]) * 3600 + int(t[3:5]) * 60 + int(t[6:8]) for t in column]
+            arrays.append(pa.array(seconds, pa.int32()).cast(field.type))
+        else:
+            arrays.append(pa.array(column, field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def month_tokens(db: SpotifyDatabase) -> Dict[str, str]:
+    """
+    Content token per YYYY-MM — the change token for every table's partition.
+    A count alone misses edits that keep it (rows replaced or re-timed), so
+    the ids and timestamps are summed too; all of it comes off idx_played_at.
+    """
+    if database.DB_BACKEND == 'postgres':
+        epoch = 'CAST(EXTRACT(EPOCH FROM date_played + time_played) AS BIGINT)'
+    else:
+        epoch = "CAST(strftime('%s', date_played || ' ' || time_played) AS INTEGER)"
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT SUBSTR(CAST(date_played AS TEXT), 1, 7), COUNT(*), MAX(id), SUM(id), SUM({epoch})
+            FROM tracks
+            GROUP BY SUBSTR(CAST(date_played AS TEXT), 1, 7)
+        ''')
+        return {month: ':'.join(str(int(v)) for v in values) for month, *values in cursor.fetchall()}
+
+
+def _month_bounds(month: str):
+    year, mon = int(month[:4]), int(month[5:7])
+    return date(year, mon, 1).isoformat(), (date(year + mon // 12, mon % 12 + 1, 1)).isoformat()
+
+
+def write_partition(db: SpotifyDatabase, table: str, month: str, path: Path, fmt: str) -> int:
+    """Stream one month of table into path (written beside it, then renamed into place); returns rows"""
+    pa = _arrow()
+    schema = _schema(pa, table)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")   # dot-files are ignored by dataset readers
+    dictionaries = {}
+    rows_written = 0
+    with db.get_connection() as conn:
+        cursor = db.stream_cursor(conn, f"export_{table}")
+        cursor.execute(_select(table, db._placeholder()), _month_bounds(month))
+        if fmt == 'arrow':
+            writer = pa.ipc.new_file(str(tmp), schema, options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+        else:
+            import pyarrow.parquet as pq
+            writer = pq.ParquetWriter(str(tmp), schema, compression='zstd')
+        try:
+            while True:
+                rows = cursor.fetchmany(config.EXPORT_BATCH)
+                if not rows:
+                    break
+                writer.write_batch(_to_batch(pa, schema, rows, dictionaries))
+                rows_written += len(rows)
+        finally:
+            writer.close()
+    os.replace(tmp, path)
+    return rows_written
+
+
+def export_all(db: SpotifyDatabase = None, out_dir: str = None, fmt: str = 'parquet', full: bool = False) -> Dict:
+    """Bring out_dir up to date; returns {'written': [...], 'skipped': n, 'removed': [...], 'rows': n}"""
+    db = db or SpotifyDatabase()
+    out = Path(out_dir or config.EXPORT_DIR)
+    manifest_path = out / MANIFEST
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() and not full else {}
+    if manifest.get('version') != EXPORT_VERSION or manifest.get('format') != fmt:
+        # Starting over: drop partitions written by another version or format
+        for table in TABLES:
+            shutil.rmtree(out / table, ignore_errors=True)
+        manifest = {'version': EXPORT_VERSION, 'format': fmt, 'months': {}}
+    out.mkdir(parents=True, exist_ok=True)
+
+    tokens = month_tokens(db)
+    done = manifest['months']
+    stats = {'written': [], 'skipped': 0, 'removed': [], 'rows': 0}
+    for month in sorted(tokens):
+        if done.get(month) == tokens[month]:
+            stats['skipped'] += 1
+            continue
+        started = time.perf_counter()
+        rows = {table: write_partition(db, table, month, out / table / f"month={month}" / f"part-0.{fmt}", fmt)
+                for table in TABLES}
+        # Recorded per month, so an interrupted export resumes where it stopped
+        done[month] = tokens[month]
+        manifest_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+        stats['written'].append(month)
+        stats['rows'] += sum(rows.values())
+        logger.info(f"📦 {month}: {rows['tracks']:,} plays, {rows['track_daily']:,} track-days "
+                    f"({time.perf_counter() - started:.1f}s)")
+
+    for month in sorted(set(done) - set(tokens)):
+        for table in TABLES:
+            shutil.rmtree(out / table / f"month={month}", ignore_errors=True)
+        del done[month]
+        stats['removed'].append(month)
+    if stats['removed']:
+        manifest_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return stats
+
+
+def write_frequency_csvs(db: SpotifyDatabase = None, track_path: str = 'freq_log.csv',
+                         artist_path: str = 'artist_log.csv') -> Dict[str, int]:
+    """Regenerate the legacy frequency CSVs from track_daily and artists (same columns and order as before)"""
+    db = db or SpotifyDatabase()
+    reports = (
+        (track_path, ['Track ID', 'Track Name', 'Artist Name', 'Frequency'], 'export_track_freq', '''
+            SELECT track_id, MAX(track_name) AS track_name, MAX(artist_name), SUM(plays) AS frequency
+            FROM track_daily
+            GROUP BY track_id
+            ORDER BY frequency DESC, track_name ASC
+        '''),
+        (artist_path, ['Artist Name', 'Frequency'], 'export_artist_freq', '''
+            SELECT artist_name, total_plays FROM artists
+            WHERE total_plays > 0
+            ORDER BY total_plays DESC, artist_name ASC
+        '''),
+    )
+    written = {}
+    with db.get_connection() as conn:
+        for path, header, name, sql in reports:
+            cursor = db.stream_cursor(conn, name)
+            cursor.execute(sql)
+            tmp = f"{path}.tmp"
+            count = 0
+            with open(tmp, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                while True:
+                    rows = cursor.fetchmany(config.EXPORT_BATCH)
+                    if not rows:
+                        break
+                    writer.writerows(rows)
+                    count += len(rows)
+            os.replace(tmp, path)
+            written[path] = count
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export play history to Parquet/Arrow and refresh the frequency CSVs')
+    parser.add_argument('--out', default=config.EXPORT_DIR, help=f'export directory (default {config.EXPORT_DIR})')
+    parser.add_argument('--format', choices=('parquet', 'arrow'), default='parquet')
+    parser.add_argument('--full', action='store_true', help='rewrite every partition, ignoring the manifest')
+    parser.add_argument('--csv-only', action='store_true', help='only regenerate freq_log.csv and artist_log.csv')
+    args = parser.parse_args()
+
+    db = SpotifyDatabase()
+    started = time.perf_counter()
+    if not args.csv_only:
+        stats = export_all(db, args.out, args.format, args.full)
+        logger.info(f"✅ Exported {len(stats['written'])} months ({stats['rows']:,} rows), "
+                    f"{stats['skipped']} unchanged, {len(stats['removed'])} removed")
+    for path, count in write_frequency_csvs(db).items():
+        logger.info(f"📝 {path}: {count:,} rows")
+    logger.info(f"Done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,453 @@
+# fake_spotify.py
+# Local stand-in for the parts of the Spotify Web API this project calls, so
+# the tracker, playlist sync and dashboard artwork can be load-tested offline
+# (see load_test.py). Point a spotipy client at it with
+#     sp = spotipy.Spotify(auth='user-0000'); sp.prefix = 'http://127.0.0.1:9110/v1/'
+#   GET  /v1/me                                  profile of the token's user
+#   GET  /v1/me/player/recently-played           ?limit&after|before, with cursors
+#   GET  /v1/me/playlists                        ?limit&offset
+#   POST /v1/me/playlists, /v1/users/{id}/playlists
+#   GET  /v1/playlists/{id}/items                ?limit&offset (/tracks too)
+#   PUT  /v1/playlists/{id}/items                {"uris": [...]} replaces
+#   POST /v1/playlists/{id}/items                [...] or {"uris": [...]} appends
+#   GET  /v1/tracks?ids=..., /v1/artists?ids=... up to 50 per call
+#   GET  /v1/search                              ?q&type=track|artist&limit&offset
+#   GET  /_stats                                 requests per endpoint, 429s sent
+# Bearer tokens are user ids: user-0000 .. user-{N-1} for --users N.
+# Every user listens on a simulated clock running --speedup times real time:
+# sessions of Zipf-picked tracks from a shared synthetic catalogue (each user
+# with their own favourites), some skipped early, so plays keep arriving and
+# the listen-threshold logic sees both kinds. Faults:
+#   --latency-ms / --jitter-ms   added to every response
+#   --rate-429                   fraction of requests answered 429 at random
+#   --rate-limit                 requests per user per 30s window, then 429
+# 429s carry Retry-After, which spotipy's retry adapter honours.
+# Run with: python3 fake_spotify.py [--port 9110] [--users 100] [--speedup 60]
+#                                   [--latency-ms 40] [--rate-429 0.01] [--rate-limit 0]
+
+import argparse
+import bisect
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import synthetic
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 9110
+CATALOGUE_TRACKS = 20000
+HISTORY_HOURS = 12         # simulated listening each user already has at start-up
+HISTORY_CAP = 5000         # plays kept per user; older ones fall off, as on Spotify
+RATE_WINDOW_SECONDS = 30   # Spotify's rate limit is a rolling 30s window
+MAX_IDS = 50
+MAX_PLAYLIST_WRITE = 100
+
+
+class ApiError(Exception):
+
+    def __init__(self, status: int, message: str, headers: Dict[str, str] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def _iso(ms: int) -> str:
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.') + f"{ms % 1000:03d}Z"
+
+
+def _int_arg(query, name: str, default: int, lo: int, hi: int) -> int:
+    raw = (query.get(name) or [None])[-1]
+    if raw is None:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ApiError(400, f"Invalid {name}")
+    if not lo <= value <= hi:
+        raise ApiError(400, f"Invalid {name}: must be between {lo} and {hi}")
+    return value
+
+
+class Catalogue:
+    """Synthetic tracks with durations; track_json / artist_json build API objects on demand"""
+
+    def __init__(self, size: int, seed: int):
+        rng = random.Random(seed)
+        self.tracks = synthetic.catalogue(size, rng)
+        self.durations = [int(max(60.0, rng.gauss(210, 45)) * 1000) for _ in self.tracks]
+        self.cum_weights = synthetic.zipf_cum_weights(size)
+        self.track_index = {t[0]: i for i, t in enumerate(self.tracks)}
+        self.artists = {}
+        for _, _, name, aid in self.tracks:
+            self.artists.setdefault(aid, name)
+
+    def track_json(self, i: int) -> dict:
+        track_id, track_name, artist_name, artist_id = self.tracks[i]
+        return {
+            'id': track_id, 'name': track_name, 'type': 'track', 'uri': f"spotify:track:{track_id}",
+            'duration_ms': self.durations[i], 'popularity': max(0, 100 - i // 200),
+            'artists': [self.artist_json(artist_id, brief=True)],
+            'album': {'id': track_id[::-1], 'name': f"{track_name} (Single)",
+                      'images': [{'url': f"https://i.fake.scdn.co/image/{track_id}/{px}", 'height': px, 'width': px}
+                                 for px in (640, 300, 64)]},
+        }
+
+    def artist_json(self, artist_id: str, brief: bool = False) -> dict:
+        artist = {'id': artist_id, 'name': self.artists[artist_id], 'type': 'artist',
+                  'uri': f"spotify:artist:{artist_id}"}
+        if not brief:
+            artist.update(genres=[], images=[{'url': f"https://i.fake.scdn.co/artist/{artist_id}", 'height': 640,
+                                              'width': 640}])
+        return artist
+
+
+class Listener:
+    """One user's play history, extended lazily up to the simulated now"""
+
+    def __init__(self, user_id: str, catalogue: Catalogue, start_ms: int, seed: int):
+        self.user_id = user_id
+        self.catalogue = catalogue
+        self.rng = random.Random(f"{seed}:{user_id}")
+        self.offset = self.rng.randrange(len(catalogue.tracks))   # this user's own favourites
+        self.times: List[int] = []    # played_at ms, ascending
+        self.plays: List[int] = []    # catalogue index per play
+        self.clock = start_ms
+        self.session_left = 0
+
+    def advance(self, now_ms: int):
+        rng, n = self.rng, len(self.catalogue.tracks)
+        while self.clock <= now_ms:
+            if self.session_left == 0:
+                self.clock += int(rng.expovariate(1 / 2400) * 1000)     # ~40 min between sessions
+                self.session_left = max(1, int(rng.expovariate(1 / synthetic.MEAN_SESSION_TRACKS)))
+                continue
+            rank = bisect.bisect_left(self.catalogue.cum_weights, rng.random() * self.catalogue.cum_weights[-1])
+            index = (min(rank, n - 1) + self.offset) % n
+            duration = self.catalogue.durations[index]
+            listened = int(duration * rng.uniform(0.05, 0.5)) if rng.random() < synthetic.SKIP_RATE else duration
+            # played_at marks the end of a play, so the gap to the next one is how long it was listened to
+            self.clock += listened
+            self.times.append(self.clock)
+            self.plays.append(index)
+            self.session_left -= 1
+        if len(self.times) > HISTORY_CAP * 2:
+            del self.times[:-HISTORY_CAP], self.plays[:-HISTORY_CAP]
+
+    def window(self, now_ms: int, limit: int, after: Optional[int], before: Optional[int]) -> Tuple[int, int, bool]:
+        """[lo, hi) slice of plays to return, and whether more lie beyond it in the paging direction"""
+        self.advance(now_ms)
+        end = bisect.bisect_right(self.times, now_ms)
+        if after is not None:
+            lo = bisect.bisect_right(self.times, after, 0, end)
+            hi = min(lo + limit, end)
+            return lo, hi, hi < end
+        hi = bisect.bisect_left(self.times, before, 0, end) if before is not None else end
+        lo = max(0, hi - limit)
+        return lo, hi, lo > 0
+
+
+class FakeSpotify:
+    """All simulated state; handlers call its methods under one lock"""
+
+    def __init__(self, users: int = 100, speedup: float = 60.0, seed: int = 42,
+                 latency_ms: float = 0, jitter_ms: float = 0, rate_429: float = 0, rate_limit: int = 0,
+                 catalogue_size: int = CATALOGUE_TRACKS):
+        self.catalogue = Catalogue(catalogue_size, seed)
+        self.speedup = speedup
+        self.latency_ms, self.jitter_ms = latency_ms, jitter_ms
+        self.rate_429, self.rate_limit = rate_429, rate_limit
+        self.started_ms = int(time.time() * 1000)
+        start = self.started_ms - HISTORY_HOURS * 3600 * 1000
+        self.listeners = {uid: Listener(uid, self.catalogue, start, seed)
+                          for uid in (f"user-{i:04d}" for i in range(users))}
+        self.playlists: Dict[str, dict] = {}
+        self.owned: Dict[str, List[str]] = {uid: [] for uid in self.listeners}
+        self.windows: Dict[str, Tuple[int, int]] = {}
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+
+    def now_ms(self) -> int:
+        real = time.time() * 1000
+        return int(self.started_ms + (real - self.started_ms) * self.speedup)
+
+    def user(self, authorization: Optional[str]) -> str:
+        token = (authorization or '').removeprefix('Bearer ').strip()
+        if token not in self.listeners:
+            raise ApiError(401, 'Invalid access token')
+        return token
+
+    def throttle(self, user_id: str):
+        """Injected 429s: random ones, then the per-user window budget"""
+        if self.rate_429 and self.rng.random() < self.rate_429:
+            raise ApiError(429, 'API rate limit exceeded', {'Retry-After': '1'})
+        if self.rate_limit:
+            window = int(time.time()) // RATE_WINDOW_SECONDS
+            current, count = self.windows.get(user_id, (window, 0))
+            count = count + 1 if current == window else 1
+            self.windows[user_id] = (window, count)
+            if count > self.rate_limit:
+                wait = RATE_WINDOW_SECONDS - int(time.time()) % RATE_WINDOW_SECONDS
+                raise ApiError(429, 'API rate limit exceeded', {'Retry-After': str(wait)})
+
+    # ── Endpoints ────────────────────────────────────────────────────────────
+    def me(self, user_id, query, body):
+        return {'id': user_id, 'display_name': user_id.replace('-', ' ').title(), 'type': 'user',
+                'uri': f"spotify:user:{user_id}", 'product': 'premium'}
+
+    def recently_played(self, user_id, query, body):
+        limit = _int_arg(query, 'limit', 20, 1, 50)
+        after = _int_arg(query, 'after', None, 0, 2 ** 62)
+        before = _int_arg(query, 'before', None, 0, 2 ** 62)
+        if after is not None and before is not None:
+            raise ApiError(400, 'Only one of after and before may be given')
+        listener = self.listeners[user_id]
+        lo, hi, more = listener.window(self.now_ms(), limit, after, before)
+        items = [{'track': self.catalogue.track_json(listener.plays[i]), 'played_at': _iso(listener.times[i]),
+                  'context': None} for i in range(hi - 1, lo - 1, -1)]
+        href = '/v1/me/player/recently-played'
+        cursors = {'after': str(listener.times[hi - 1]), 'before': str(listener.times[lo])} if items else None
+        following = None
+        if more and items:
+            following = (f"{href}?after={cursors['after']}&limit={limit}" if after is not None
+                         else f"{href}?before={cursors['before']}&limit={limit}")
+        return {'href': href, 'items': items, 'limit': limit, 'next': following, 'cursors': cursors}
+
+    def _playlist_json(self, playlist: dict) -> dict:
+        summary = {k: v for k, v in playlist.items() if k != 'uris'}
+        summary['tracks'] = summary['items'] = {'total': len(playlist['uris'])}
+        return summary
+
+    def my_playlists(self, user_id, query, body):
+        limit = _int_arg(query, 'limit', 20, 1, 50)
+        offset = _int_arg(query, 'offset', 0, 0, 100000)
+        ids = self.owned[user_id]
+        page = [self._playlist_json(self.playlists[pid]) for pid in ids[offset:offset + limit]]
+        return {'items': page, 'limit': limit, 'offset': offset, 'total': len(ids),
+                'next': None if offset + limit >= len(ids) else f"/v1/me/playlists?offset={offset + limit}&limit={limit}"}
+
+    def create_playlist(self, user_id, query, body, owner=None):
+        if owner is not None and owner != user_id:
+            raise ApiError(403, "You cannot create a playlist for another user")
+        if not isinstance(body, dict) or not body.get('name'):
+            raise ApiError(400, 'Missing required field: name')
+        pid = synthetic.spotify_id(self.rng)
+        self.playlists[pid] = {'id': pid, 'name': body['name'], 'public': body.get('public', True),
+                               'collaborative': body.get('collaborative', False),
+                               'description': body.get('description', ''), 'owner': {'id': user_id},
+                               'uri': f"spotify:playlist:{pid}", 'snapshot_id': synthetic.spotify_id(self.rng),
+                               'uris': []}
+        self.owned[user_id].append(pid)
+        return 201, self._playlist_json(self.playlists[pid])
+
+    def _own_playlist(self, user_id, playlist_id) -> dict:
+        playlist = self.playlists.get(playlist_id)
+        if playlist is None:
+            raise ApiError(404, 'Not found.')
+        if playlist['owner']['id'] != user_id:
+            raise ApiError(403, "You cannot modify another user's playlist")
+        return playlist
+
+    def _track_uris(self, uris) -> List[str]:
+        if not isinstance(uris, list) or len(uris) > MAX_PLAYLIST_WRITE:
+            raise ApiError(400, f"Provide a list of at most {MAX_PLAYLIST_WRITE} uris")
+        for uri in uris:
+            if not isinstance(uri, str) or uri.split(':')[-1] not in self.catalogue.track_index:
+                raise ApiError(400, f"Invalid track uri: {uri}")
+        return uris
+
+    def playlist_items(self, user_id, query, body, playlist_id=None):
+        playlist = self.playlists.get(playlist_id)
+        if playlist is None:
+            raise ApiError(404, 'Not found.')
+        limit = _int_arg(query, 'limit', 100, 1, 100)
+        offset = _int_arg(query, 'offset', 0, 0, 100000)
+        uris = playlist['uris']
+        items = [{'track': self.catalogue.track_json(self.catalogue.track_index[u.split(':')[-1]])}
+                 for u in uris[offset:offset + limit]]
+        return {'items': items, 'limit': limit, 'offset': offset, 'total': len(uris),
+                'next': None if offset + limit >= len(uris) else f"/v1/playlists/{playlist_id}/items?offset={offset + limit}&limit={limit}"}
+
+    def replace_items(self, user_id, query, body, playlist_id=None):
+        playlist = self._own_playlist(user_id, playlist_id)
+        playlist['uris'] = list(self._track_uris((body or {}).get('uris', [])))
+        playlist['snapshot_id'] = synthetic.spotify_id(self.rng)
+        return {'snapshot_id': playlist['snapshot_id']}
+
+    def add_items(self, user_id, query, body, playlist_id=None):
+        playlist = self._own_playlist(user_id, playlist_id)
+        uris = self._track_uris(body.get('uris') if isinstance(body, dict) else body)
+        position = _int_arg(query, 'position', len(playlist['uris']), 0, len(playlist['uris']))
+        playlist['uris'][position:position] = uris
+        playlist['snapshot_id'] = synthetic.spotify_id(self.rng)
+        return 201, {'snapshot_id': playlist['snapshot_id']}
+
+    def _ids(self, query) -> List[str]:
+        ids = [i for i in ','.join(query.get('ids') or []).split(',') if i]
+        if not ids or len(ids) > MAX_IDS:
+            raise ApiError(400, f"Provide between 1 and {MAX_IDS} ids")
+        return ids
+
+    def tracks(self, user_id, query, body):
+        index = self.catalogue.track_index
+        return {'tracks': [self.catalogue.track_json(index[t]) if t in index else None for t in self._ids(query)]}
+
+    def artists(self, user_id, query, body):
+        known = self.catalogue.artists
+        return {'artists': [self.catalogue.artist_json(a) if a in known else None for a in self._ids(query)]}
+
+    def search(self, user_id, query, body):
+        q = (query.get('q') or [''])[-1].strip()
+        if not q:
+            raise ApiError(400, 'No search query')
+        limit = _int_arg(query, 'limit', 10, 1, 50)
+        offset = _int_arg(query, 'offset', 0, 0, 1000)
+        # Field filters (artist:, track:) narrow nothing here; match on the text
+        needle = re.sub(r'^\w+:', '', q).strip('"').lower()
+        result = {}
+        for kind in (query.get('type') or ['track'])[-1].split(','):
+            if kind == 'artist':
+                found = [self.catalogue.artist_json(aid) for aid, name in self.catalogue.artists.items()
+                         if needle in name.lower()]
+            elif kind == 'track':
+                found = [self.catalogue.track_json(i) for i, t in enumerate(self.catalogue.tracks)
+                         if needle in t[1].lower()]
+            else:
+                raise ApiError(400, f"Unsupported type: {kind}")
+            result[f"{kind}s"] = {'items': found[offset:offset + limit], 'limit': limit, 'offset': offset,
+                                  'total': len(found)}
+        return result
+
+
+ROUTES = [
+    ('GET', re.compile(r'^/v1/me$'), 'me'),
+    ('GET', re.compile(r'^/v1/me/player/recently-played$'), 'recently_played'),
+    ('GET', re.compile(r'^/v1/me/playlists$'), 'my_playlists'),
+    ('POST', re.compile(r'^/v1/me/playlists$'), 'create_playlist'),
+    ('POST', re.compile(r'^/v1/users/(?P<owner>[^/]+)/playlists$'), 'create_playlist'),
+    ('GET', re.compile(r'^/v1/playlists/(?P<playlist_id>\w+)/(?:items|tracks)$'), 'playlist_items'),
+    ('PUT', re.compile(r'^/v1/playlists/(?P<playlist_id>\w+)/(?:items|tracks)$'), 'replace_items'),
+    ('POST', re.compile(r'^/v1/playlists/(?P<playlist_id>\w+)/(?:items|tracks)$'), 'add_items'),
+    ('GET', re.compile(r'^/v1/tracks$'), 'tracks'),
+    ('GET', re.compile(r'^/v1/artists$'), 'artists'),
+    ('GET', re.compile(r'^/v1/search$'), 'search'),
+]
+
+
+# ── HTTP ──────────────────────────────────────────────────────────────────────
+class _Handler(BaseHTTPRequestHandler):
+    api: FakeSpotify = None
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def _dispatch(self, method):
+        api = self.api
+        url = urlsplit(self.path)
+        path = url.path.rstrip('/')
+        if method == 'GET' and path == '/_stats':
+            with api.lock:
+                stats = dict(api.stats)
+            self._send(200, stats)
+            return
+        if api.latency_ms or api.jitter_ms:
+            time.sleep((api.latency_ms + api.rng.uniform(0, api.jitter_ms)) / 1000)
+        route = next(((name, m.groupdict()) for verb, pattern, name in ROUTES
+                      if verb == method and (m := pattern.match(path))), None)
+        label = f"{method} {route[0]}" if route else 'other'
+        try:
+            if route is None:
+                raise ApiError(404, 'Service not found')
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                body = json.loads(self.rfile.read(length)) if length else None
+            except ValueError:
+                raise ApiError(400, 'Error parsing JSON.')
+            with api.lock:
+                api.stats[label] += 1
+                user_id = api.user(self.headers.get('Authorization'))
+                api.throttle(user_id)
+                result = getattr(api, route[0])(user_id, parse_qs(url.query), body, **route[1])
+            status, payload = result if isinstance(result, tuple) else (200, result)
+            self._send(status, payload)
+        except ApiError as e:
+            with api.lock:
+                api.stats['429' if e.status == 429 else f"error {e.status}"] += 1
+            self._send(e.status, {'error': {'status': e.status, 'message': str(e)}}, e.headers)
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # one line per request would drown everything else
+
+
+def make_server(host: str = '127.0.0.1', port: int = DEFAULT_PORT, api: FakeSpotify = None) -> ThreadingHTTPServer:
+    """Bound (not yet serving) server; port 0 picks a free port"""
+    handler = type('FakeSpotifyHandler', (_Handler,), {'api': api or FakeSpotify()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Simulation options, shared with load_test.py"""
+    parser.add_argument('--users', type=int, default=100, help='simulated users (tokens user-0000 ...)')
+    parser.add_argument('--speedup', type=float, default=60.0, help='simulated seconds per real second')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--latency-ms', type=float, default=0, help='added to every response')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='random extra latency, up to this much')
+    parser.add_argument('--rate-429', type=float, default=0, help='fraction of requests answered 429 at random')
+    parser.add_argument('--rate-limit', type=int, default=0,
+                        help=f'requests per user per {RATE_WINDOW_SECONDS}s before 429s (0 = unlimited)')
+
+
+def from_arguments(args) -> FakeSpotify:
+    return FakeSpotify(users=args.users, speedup=args.speedup, seed=args.seed, latency_ms=args.latency_ms,
+                       jitter_ms=args.jitter_ms, rate_429=args.rate_429, rate_limit=args.rate_limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a local fake of the Spotify Web API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, from_arguments(args))
+    host, port = server.server_address[:2]
+    logger.info(f"🎭 Fake Spotify API on http://{host}:{port}/v1/ for {args.users} users "
+                f"(x{args.speedup:g} clock, {args.latency_ms:g}ms latency, {args.rate_429:.0%} random 429s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("🛑 Fake Spotify API stopped")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,10 +5,18 @@ from database import SpotifyDatabase
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_freq():
+def get_freq(approximate=False, limit=None):
     db = SpotifyDatabase()
-    return db.get_track_frequencies()
+    if approximate:
+        # Served from the bounded-memory sketch; rows carry an extra error column
+        import heavy_hitters
+        return heavy_hitters.refresh(db).top_tracks(limit)
+    return db.get_track_frequencies(limit)
 
-def get_artist_freq():
+def get_artist_freq(approximate=False, limit=None):
     db = SpotifyDatabase()
-    return db.get_artist_frequencies()
\ No newline at end of file
+    if approximate:
+        import heavy_hitters
+        return heavy_hitters.refresh(db).top_artists(limit)
+    rows = db.get_artist_frequencies()
+    return rows[:limit] if limit else rows
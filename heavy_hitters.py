@@ -0,0 +1,198 @@
+import heapq
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SKETCH_VERSION = 1
+SKETCH_NAME = 'heavy_hitters'    # row in sketch_state
+
+
+class SpaceSaving:
+    """
+    Space-Saving top-K counter (Metwally et al.) in bounded memory.
+
+    At most `capacity` keys are tracked. Each counter carries an overestimate
+    `count` and an `error`, so the true frequency lies in [count - error, count].
+    Any key whose true frequency exceeds total / capacity is guaranteed to be
+    tracked. A lazy min-heap finds the counter to evict.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.total = 0
+        self.counters: Dict[str, list] = {}   # key -> [count, error, label]
+        self._heap: List[Tuple[int, str]] = []
+
+    def update(self, key: str, weight: int = 1, label=None):
+        self.total += weight
+        entry = self.counters.get(key)
+        if entry is not None:
+            entry[0] += weight
+            if label is not None:
+                entry[2] = label
+        elif len(self.counters) < self.capacity:
+            entry = self.counters[key] = [weight, 0, label]
+        else:
+            min_count, min_key = self._pop_min()
+            del self.counters[min_key]
+            entry = self.counters[key] = [min_count + weight, min_count, label]
+        heapq.heappush(self._heap, (entry[0], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+
+    def _pop_min(self) -> Tuple[int, str]:
+        # Heap entries go stale when a counter is incremented; skip them
+        while True:
+            count, key = heapq.heappop(self._heap)
+            entry = self.counters.get(key)
+            if entry is not None and entry[0] == count:
+                return count, key
+
+    def _rebuild_heap(self):
+        self._heap = [(entry[0], key) for key, entry in self.counters.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[str, int, int, object]]:
+        """(key, count, error, label) for the n largest counters, count descending"""
+        items = self.counters.items()
+        if n is None:
+            ranked = sorted(items, key=lambda kv: (-kv[1][0], kv[0]))
+        else:
+            ranked = heapq.nsmallest(n, items, key=lambda kv: (-kv[1][0], kv[0]))
+        return [(key, entry[0], entry[1], entry[2]) for key, entry in ranked]
+
+    def guaranteed_threshold(self) -> float:
+        """Frequencies above this are guaranteed to be tracked"""
+        return self.total / self.capacity if self.capacity else 0.0
+
+    def to_dict(self) -> Dict:
+        return {'capacity': self.capacity, 'total': self.total,
+                'counters': {k: list(v) for k, v in self.counters.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SpaceSaving':
+        sketch = cls(data['capacity'])
+        sketch.total = data['total']
+        sketch.counters = {k: list(v) for k, v in data['counters'].items()}
+        sketch._rebuild_heap()
+        return sketch
+
+
+class HeavyHitters:
+    """
+    Approximate top tracks and artists maintained incrementally from the
+    tracks table. Only rows with id greater than the stored cursor are read,
+    and the sketches are persisted in the database's sketch_state table
+    between runs, so each database has its own.
+    """
+
+    def __init__(self, capacity: int = None):
+        self.capacity = capacity or config.SKETCH_CAPACITY
+        self.tracks = SpaceSaving(self.capacity)
+        self.artists = SpaceSaving(self.capacity)
+        self.last_id = 0
+
+    @classmethod
+    def load(cls, db, capacity: int = None) -> 'HeavyHitters':
+        hh = cls(capacity)
+        try:
+            with db.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"SELECT data FROM sketch_state WHERE name = {db._placeholder()}", (SKETCH_NAME,))
+                row = cursor.fetchone()
+            if row is None:
+                return hh
+            data = json.loads(row[0])
+            if data.get('version') != SKETCH_VERSION or data['tracks']['capacity'] != hh.capacity:
+                logger.info("Heavy-hitters sketch is outdated — rebuilding from scratch")
+                return hh
+            hh.tracks = SpaceSaving.from_dict(data['tracks'])
+            hh.artists = SpaceSaving.from_dict(data['artists'])
+            hh.last_id = data['last_id']
+        except Exception as e:
+            logger.warning(f"Could not load heavy-hitters sketch, rebuilding: {e}")
+            hh = cls(capacity)
+        return hh
+
+    def save(self, db):
+        data = {'version': SKETCH_VERSION, 'last_id': self.last_id,
+                'tracks': self.tracks.to_dict(), 'artists': self.artists.to_dict()}
+        p = db._placeholder()
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                INSERT INTO sketch_state (name, data) VALUES ({p}, {p})
+                ON CONFLICT (name) DO UPDATE SET data = EXCLUDED.data
+            ''', (SKETCH_NAME, json.dumps(data)))
+            conn.commit()
+
+    def add_play(self, track_id: str, track_name: str, artist_name: str):
+        self.tracks.update(track_id, label=[track_name, artist_name])
+        self.artists.update(artist_name)
+
+    def sync(self, db) -> int:
+        """Ingest rows logged since the last sync; returns how many were read"""
+        ingested = 0
+        for row_id, _, _, track_id, track_name, artist_name in db.iter_tracks_since(self.last_id):
+            self.add_play(track_id, track_name, artist_name)
+            self.last_id = row_id
+            ingested += 1
+        if ingested:
+            logger.info(f"Heavy-hitters sketch ingested {ingested} plays")
+        return ingested
+
+    def top_tracks(self, n: Optional[int] = None) -> List[Tuple]:
+        """(track_id, track_name, artist_name, frequency, error), frequency descending"""
+        return [(key, label[0], label[1], count, error)
+                for key, count, error, label in self.tracks.top(n)]
+
+    def top_artists(self, n: Optional[int] = None) -> List[Tuple]:
+        """(artist_name, frequency, error), frequency descending"""
+        return [(key, count, error) for key, count, error, _ in self.artists.top(n)]
+
+
+def refresh(db) -> HeavyHitters:
+    """Load the database's sketch, catch it up with its new rows and save it"""
+    hh = HeavyHitters.load(db)
+    if hh.sync(db):
+        hh.save(db)
+    return hh
+
+
+def exact_top_tracks(db, n: Optional[int] = None) -> List[Tuple]:
+    """Exact (track_id, track_name, artist_name, frequency) — the verification fallback"""
+    return db.get_track_frequencies(n)
+
+
+def exact_top_artists(db, n: Optional[int] = None) -> List[Tuple]:
+    """Exact (artist_name, frequency) — the verification fallback"""
+    rows = db.get_artist_frequencies()
+    return rows[:n] if n else rows
+
+
+def verify(db, n: int = 20) -> Dict:
+    """Compare the sketch's top-n tracks against the exact GROUP BY"""
+    hh = refresh(db)
+    approx = hh.top_tracks(n)
+    exact = exact_top_tracks(db, n)
+    exact_counts = dict((row[0], row[3]) for row in db.get_track_frequencies())
+    within_bounds = all(
+        count - error <= exact_counts.get(track_id, 0) <= count
+        for track_id, _, _, count, error in approx
+    )
+    overlap = len({row[0] for row in approx} & {row[0] for row in exact})
+    return {'n': n, 'overlap': overlap, 'within_bounds': within_bounds,
+            'guaranteed_threshold': hh.tracks.guaranteed_threshold()}
+
+
+if __name__ == '__main__':
+    from database import SpotifyDatabase
+    result = verify(SpotifyDatabase())
+    print(f"Top-{result['n']} overlap with exact counts: {result['overlap']}/{result['n']}")
+    print(f"All estimates within error bounds: {result['within_bounds']}")
+    print(f"Tracks with more than {result['guaranteed_threshold']:.1f} plays are guaranteed to be tracked")
@@ -0,0 +1,319 @@
+# jobs.py
+# Small job queue in the main database, shared by the dashboard and the scheduler.
+#   - the dashboard enqueues an 'ingest' job and returns immediately; a queued
+#     or running job of the same kind is reused, so repeated clicks dedupe
+#   - whoever holds the user's leadership (see leader.py) runs it: the
+#     scheduler drains the queue between runs, and the dashboard's in-process
+#     JobWorker thread picks jobs up when no scheduler is running
+#   - progress is written per pipeline stage so the dashboard can poll it
+#   - enqueue wakes a sleeping scheduler (JobSignal): NOTIFY on Postgres, a
+#     byte down a FIFO next to the database on SQLite
+
+import errno
+import json
+import logging
+import os
+import select
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+import config
+import database
+import leader
+import metrics
+from database import SpotifyDatabase
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TS_FORMAT = '%Y-%m-%d %H:%M:%S'
+CHANNEL = 'jobs_queued'     # Postgres NOTIFY channel
+
+
+def _now() -> str:
+    return datetime.now().strftime(TS_FORMAT)
+
+
+class JobQueue:
+
+    def __init__(self, db: SpotifyDatabase = None):
+        self.db = db or SpotifyDatabase()
+        self.p = self.db._placeholder()
+
+    def enqueue(self, kind: str) -> int:
+        """Queue a job, or return the id of the one already queued/running"""
+        p = self.p
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            # A worker that died mid-job must not block new requests forever
+            stale = (datetime.now() - timedelta(minutes=config.JOB_STALE_MINUTES)).strftime(TS_FORMAT)
+            cursor.execute(f'''
+                UPDATE jobs SET status = 'failed', finished_at = {p}, result = {p}
+                WHERE kind = {p} AND status = 'running' AND started_at < {p}
+            ''', (_now(), json.dumps({'error': 'abandoned by its worker'}), kind, stale))
+            conn.commit()
+            try:
+                # idx_jobs_active allows one active job per kind
+                cursor.execute(f'''
+                    INSERT INTO jobs (kind, status, requested_at) VALUES ({p}, 'queued', {p})
+                ''', (kind, _now()))
+                if database.DB_BACKEND == 'postgres':
+                    cursor.execute(f"NOTIFY {CHANNEL}")   # delivered on commit
+                conn.commit()
+                if database.DB_BACKEND != 'postgres':
+                    _poke_fifo()
+            except database.IntegrityError:
+                conn.rollback()
+            cursor.execute(f'''
+                SELECT id FROM jobs WHERE kind = {p} AND status IN ('queued', 'running')
+                ORDER BY id DESC LIMIT 1
+            ''', (kind,))
+            job_id = cursor.fetchone()[0]
+        self.depth()
+        return job_id
+
+    def claim(self, kind: str) -> Optional[int]:
+        """Mark the oldest queued job of this kind running; None if another worker got it"""
+        p = self.p
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT id FROM jobs WHERE kind = {p} AND status = 'queued' ORDER BY id LIMIT 1", (kind,))
+            row = cursor.fetchone()
+            if not row:
+                conn.commit()
+                return None
+            cursor.execute(f'''
+                UPDATE jobs SET status = 'running', started_at = {p}, progress = 'starting'
+                WHERE id = {p} AND status = 'queued'
+            ''', (_now(), row[0]))
+            claimed = cursor.rowcount == 1
+            conn.commit()
+        self.depth()
+        return row[0] if claimed else None
+
+    def progress(self, job_id: int, message: str):
+        with self.db.get_connection() as conn:
+            conn.cursor().execute(f"UPDATE jobs SET progress = {self.p} WHERE id = {self.p}", (message, job_id))
+            conn.commit()
+
+    def finish(self, job_id: int, ok: bool, result: Dict = None):
+        p = self.p
+        with self.db.get_connection() as conn:
+            conn.cursor().execute(f'''
+                UPDATE jobs SET status = {p}, finished_at = {p}, progress = NULL, result = {p} WHERE id = {p}
+            ''', ('done' if ok else 'failed', _now(), json.dumps(result or {}, default=str), job_id))
+            conn.commit()
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT id, kind, status, progress, result, CAST(requested_at AS TEXT),
+                       CAST(started_at AS TEXT), CAST(finished_at AS TEXT)
+                FROM jobs WHERE id = {self.p}
+            ''', (job_id,))
+            row = cursor.fetchone()
+        if not row:
+            return None
+        job = dict(zip(('id', 'kind', 'status', 'progress', 'result', 'requested_at', 'started_at', 'finished_at'), row))
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def depth(self) -> int:
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'")
+            depth = cursor.fetchone()[0]
+        metrics.QUEUE_DEPTH.set(depth)
+        return depth
+
+
+# ── Wake-ups ──────────────────────────────────────────────────────────────────
+def _fifo_path() -> str:
+    return f"{config.DATABASE_PATH}.jobs.fifo"
+
+
+def _poke_fifo():
+    try:
+        fd = os.open(_fifo_path(), os.O_WRONLY | os.O_NONBLOCK)
+    except OSError:
+        return   # no FIFO or nobody listening: no scheduler to wake
+    try:
+        os.write(fd, b'\n')
+    except OSError as e:
+        if e.errno != errno.EAGAIN:   # a full pipe already holds a wake-up
+            logger.debug(f"Could not signal the job queue: {e}")
+    finally:
+        os.close(fd)
+
+
+class JobSignal:
+    """
+    Lets the scheduler sleep until a job is enqueued by any process (or a
+    timeout): LISTEN on Postgres, a FIFO next to the database on SQLite.
+    Falls back to waking every JOB_POLL_SECONDS where neither is available.
+    """
+
+    def __init__(self):
+        self._conn = None
+        self._fd = None
+
+    def _open(self):
+        if database.DB_BACKEND == 'postgres':
+            if self._conn is None or self._conn.closed:
+                self._conn = database.psycopg2.connect(config.SUPABASE_DB_URL)
+                self._conn.autocommit = True
+                self._conn.cursor().execute(f"LISTEN {CHANNEL}")
+            return self._conn
+        if self._fd is None and hasattr(os, 'mkfifo'):
+            path = _fifo_path()
+            try:
+                os.mkfifo(path)
+            except FileExistsError:
+                pass
+            # Read-write so the FIFO always has a writer and never reads as EOF
+            self._fd = os.open(path, os.O_RDWR | os.O_NONBLOCK)
+        return self._fd
+
+    def wait(self, timeout: float) -> bool:
+        """Block up to timeout seconds; True if a job was enqueued meanwhile"""
+        try:
+            source = self._open()
+        except Exception as e:
+            logger.warning(f"Job wake-ups unavailable, polling instead: {e}")
+            self.close()
+            source = None
+        if source is None:
+            time.sleep(min(timeout, config.JOB_POLL_SECONDS))
+            return False
+        try:
+            ready, _, _ = select.select([source], [], [], timeout)
+            if not ready:
+                return False
+            if database.DB_BACKEND == 'postgres':
+                self._conn.poll()
+                self._conn.notifies.clear()
+            else:
+                while True:
+                    try:
+                        if not os.read(self._fd, 4096):
+                            break
+                    except BlockingIOError:
+                        break
+            return True
+        except Exception as e:
+            logger.warning(f"Job wake-up wait failed: {e}")
+            self.close()
+            return False
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+# ── Handlers ──────────────────────────────────────────────────────────────────
+def _run_ingest(runtime, report: Callable[[str], None]) -> Dict:
+    stats = runtime.tick(on_stage=lambda stage: report(f"running {stage}"))
+    return {'logged': stats['logged'], 'duration': round(stats['duration'], 2), 'api_calls': stats['api_calls']}
+
+
+HANDLERS = {'ingest': _run_ingest}
+
+
+def run_pending(runtime, queue: JobQueue = None) -> int:
+    """Run every queued job with the caller's runtime; the caller must hold leadership"""
+    queue = queue or JobQueue(runtime.db)
+    done = 0
+    for kind, handler in HANDLERS.items():
+        while True:
+            job_id = queue.claim(kind)
+            if job_id is None:
+                break
+            logger.info(f"▶ Running queued {kind} job #{job_id}")
+            try:
+                result = handler(runtime, lambda message: queue.progress(job_id, message))
+                queue.finish(job_id, True, result)
+            except Exception as e:
+                logger.exception(f"Queued {kind} job #{job_id} failed")
+                queue.finish(job_id, False, {'error': str(e)})
+            done += 1
+    return done
+
+
+def fail_pending(queue: JobQueue, error: str):
+    """Fail queued jobs that cannot run, so callers waiting on them stop waiting"""
+    for kind in HANDLERS:
+        while True:
+            job_id = queue.claim(kind)
+            if job_id is None:
+                break
+            queue.finish(job_id, False, {'error': error})
+
+
+class JobWorker:
+    """
+    In-process worker for the dashboard: a daemon thread with its own
+    SpotifyRuntime that runs queued jobs when woken (or every JOB_POLL_SECONDS).
+    It only takes leadership for the duration of a job, so a running
+    scheduler keeps ownership and handles the queue itself.
+    """
+
+    def __init__(self, runtime_factory: Callable = None):
+        self.runtime_factory = runtime_factory
+        self.runtime = None
+        self.election = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._loop, name='job-worker', daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(config.JOB_POLL_SECONDS)
+            self._wake.clear()
+            try:
+                self._drain()
+            except Exception as e:
+                logger.error(f"Job worker error: {e}")
+                if self.runtime is not None:
+                    self.runtime.close()
+                self.runtime, self.election = None, None
+
+    def _drain(self):
+        queue = JobQueue()
+        if not queue.depth():
+            return
+        if self.runtime is None:
+            from runtime import SpotifyRuntime
+            self.runtime = (self.runtime_factory or SpotifyRuntime)()
+            if not self.runtime.connect():
+                self.runtime = None
+                fail_pending(queue, "Spotify authentication failed")
+                return
+            self.election = leader.for_user(self.runtime.user_id)
+            self.runtime.leader = self.election
+        if not self.election.acquire():
+            logger.info("Scheduler holds leadership — leaving queued jobs to it")
+            return
+        try:
+            run_pending(self.runtime, JobQueue(self.runtime.db))
+        finally:
+            self.election.release()
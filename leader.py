@@ -0,0 +1,150 @@
+# leader.py
+# Makes sure only one scheduler instance runs ingest and playlist jobs per user.
+#   Postgres: a row in scheduler_leases, renewed by a heartbeat thread; a
+#             standby takes over once the lease expires (LEASE_TTL_SECONDS).
+#   SQLite:   an exclusive flock on a lock file next to the database; the OS
+#             releases it the moment the leader process dies.
+
+import logging
+import os
+import socket
+import threading
+import uuid
+from pathlib import Path
+
+import config
+import database
+from database import SpotifyDatabase
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _holder_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaseElection:
+    """Postgres lease: the row is taken over only when missing, ours, or expired"""
+
+    def __init__(self, name: str, ttl: int = None):
+        self.name = name
+        self.ttl = ttl or config.LEASE_TTL_SECONDS
+        self.holder = _holder_id()
+        # Own connection: renewals come from the heartbeat thread
+        self.db = SpotifyDatabase(persistent=True)
+        self.is_leader = False
+        self._stop = threading.Event()   # the current heartbeat's; each heartbeat gets a fresh one
+        self._lock = threading.Lock()   # the scheduler thread and heartbeat share one connection
+
+    def acquire(self) -> bool:
+        """Take or renew the lease; returns whether we hold it now"""
+        with self._lock:
+            return self._acquire()
+
+    def _acquire(self) -> bool:
+        try:
+            with self.db.get_connection() as conn:
+                cursor = conn.cursor()
+                # Expiry uses the database clock so node clock skew doesn't matter
+                cursor.execute('''
+                    INSERT INTO scheduler_leases (name, holder, expires_at)
+                    VALUES (%s, %s, NOW() + %s * INTERVAL '1 second')
+                    ON CONFLICT (name) DO UPDATE
+                        SET holder = EXCLUDED.holder, expires_at = EXCLUDED.expires_at
+                        WHERE scheduler_leases.holder = EXCLUDED.holder
+                           OR scheduler_leases.expires_at < NOW()
+                    RETURNING holder
+                ''', (self.name, self.holder, self.ttl))
+                row = cursor.fetchone()
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"Lease check for '{self.name}' failed: {e}")
+            row = None
+
+        was_leader = self.is_leader
+        self.is_leader = bool(row and row[0] == self.holder)
+        if self.is_leader and not was_leader:
+            logger.info(f"👑 Acquired leadership of '{self.name}' as {self.holder}")
+            self._start_heartbeat()
+        elif was_leader and not self.is_leader:
+            logger.warning(f"Lost leadership of '{self.name}'")
+        return self.is_leader
+
+    def _start_heartbeat(self):
+        # A previous heartbeat may still be winding down (or even be the
+        # caller); stop it and give the new one its own Event, so a release
+        # aimed at the old one can never silence this one
+        self._stop.set()
+        self._stop = threading.Event()
+        threading.Thread(target=self._renew_loop, args=(self._stop,), name=f"lease-{self.name}", daemon=True).start()
+
+    def _renew_loop(self, stop: threading.Event):
+        while not stop.wait(self.ttl / 3):
+            if not self.acquire():
+                return
+
+    def release(self):
+        self._stop.set()
+        if not self.is_leader:
+            return
+        with self._lock:
+            self._release()
+
+    def _release(self):
+        try:
+            with self.db.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM scheduler_leases WHERE name = %s AND holder = %s',
+                               (self.name, self.holder))
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not release lease '{self.name}': {e}")
+        self.is_leader = False
+        self.db.close()
+
+
+class FileLockElection:
+    """SQLite: non-blocking exclusive flock, held for the life of the process"""
+
+    def __init__(self, name: str):
+        self.name = name
+        safe = ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+        self.path = Path(f"{config.DATABASE_PATH}.{safe}.lock")
+        self.is_leader = False
+        self._fh = None
+
+    def acquire(self) -> bool:
+        if self.is_leader:
+            return True
+        import fcntl
+        fh = open(self.path, 'a+')
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fh.close()
+            return False
+        fh.seek(0)
+        fh.truncate()
+        fh.write(_holder_id())
+        fh.flush()
+        self._fh = fh
+        self.is_leader = True
+        logger.info(f"👑 Acquired leadership of '{self.name}' ({self.path})")
+        return True
+
+    def release(self):
+        if self._fh is not None:
+            import fcntl
+            fcntl.flock(self._fh, fcntl.LOCK_UN)
+            self._fh.close()
+            self._fh = None
+        self.is_leader = False
+
+
+def for_user(user_id: str):
+    """Election guarding the ingest + playlist jobs for one Spotify user"""
+    name = f"tracker:{user_id}"
+    if database.DB_BACKEND == 'postgres':
+        return LeaseElection(name)
+    return FileLockElection(name)
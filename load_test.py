@@ -0,0 +1,187 @@
+# load_test.py
+# End-to-end load test of ingest and playlist sync against fake_spotify.py.
+# Each simulated user gets its own SQLite database and SpotifyRuntime (the
+# scheduler's per-user state), with a spotipy client pointed at the fake
+# server; --workers processes share the users and tick each one every --poll
+# seconds for --duration seconds, exactly as the scheduler would. At the end
+# every user resolves artwork for their top tracks and artists, the
+# dashboard's Spotify traffic. Reported:
+#   - plays logged per second, ticks per second, tick latency p50 / p95
+#   - playlist syncs, Spotify calls per tick, tick errors
+#   - the server's request counts per endpoint and the 429s it sent
+# Run with: python3 load_test.py [--users 50] [--workers 4] [--duration 60] [--poll 5]
+#                                [--latency-ms 40] [--rate-429 0.01] [--rate-limit 0]
+#           python3 load_test.py --server http://127.0.0.1:9110 ...   # fake_spotify.py already running
+# Results go to bench_results/load-<stamp>.json. Databases live in a temp
+# directory; spotify_data.db and the real API are never touched.
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from urllib.request import urlopen
+
+import fake_spotify
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+HERE = Path(__file__).resolve().parent
+RESULTS_DIR = HERE / 'bench_results'
+ARTWORK_PAGE = 50
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_users(url: str, users: list, workdir: str, duration: float, poll: float, requests_timeout: int) -> dict:
+    """One worker process: tick each of its users every poll seconds until duration is up"""
+    os.chdir(workdir)
+    logging.getLogger().setLevel(logging.WARNING)   # per-track INFO lines would swamp the run
+    import artwork
+    from database import SpotifyDatabase
+    from runtime import SpotifyRuntime
+
+    runtimes = {}
+    for user_id in users:
+        home = Path(workdir) / user_id
+        home.mkdir()
+        db = SpotifyDatabase(db_path=str(home / 'spotify_data.db'), persistent=True)
+        runtimes[user_id] = SpotifyRuntime(db=db, auth=user_id, api_url=url, requests_timeout=requests_timeout)
+
+    result = {'ticks': 0, 'tick_seconds': [], 'api_calls': 0, 'syncs': 0, 'errors': 0, 'plays': 0,
+              'artwork_seconds': []}
+    due = {user_id: time.monotonic() for user_id in users}
+    deadline = time.monotonic() + duration
+    while True:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        user_id = min(due, key=due.get)
+        if due[user_id] > now:
+            time.sleep(min(due[user_id], deadline) - now)
+            continue
+        due[user_id] = now + poll
+        started = time.perf_counter()
+        try:
+            stats = runtimes[user_id].tick()
+        except Exception as e:
+            result['errors'] += 1
+            logger.warning(f"⚠️ {user_id} tick failed: {e}")
+            continue
+        result['ticks'] += 1
+        result['tick_seconds'].append(time.perf_counter() - started)
+        result['api_calls'] += stats['api_calls']
+        result['syncs'] += stats['stages'].get('sync') is not None and runtimes[user_id].playlist_id is not None
+
+    for user_id, rt in runtimes.items():
+        with rt.db.get_connection() as conn:
+            result['plays'] += conn.execute('SELECT COUNT(*) FROM tracks').fetchone()[0]
+            top = conn.execute('''
+                SELECT track_id, artist_name, artist_id FROM tracks
+                GROUP BY track_id ORDER BY COUNT(*) DESC LIMIT ?
+            ''', (ARTWORK_PAGE,)).fetchall()
+        artwork._cache = artwork.ArtworkCache(path=str(Path(workdir) / user_id / 'artwork_cache.db'))
+        started = time.perf_counter()
+        try:
+            artwork.track_images(rt.sp, [t for t, _, _ in top])
+            artwork.artist_images(rt.sp, {(name, aid) for _, name, aid in top})
+            result['artwork_seconds'].append(time.perf_counter() - started)
+        except Exception as e:
+            result['errors'] += 1
+            logger.warning(f"⚠️ {user_id} artwork failed: {e}")
+        rt.close()
+    return result
+
+
+def server_stats(url: str) -> dict:
+    with urlopen(f"{url.rstrip('/')}/_stats", timeout=10) as response:
+        return json.loads(response.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test ingest and playlist sync against a fake Spotify API')
+    parser.add_argument('--server', help='URL of a running fake_spotify.py (default: start one in-process)')
+    parser.add_argument('--workers', type=int, default=4, help='tracker processes sharing the users')
+    parser.add_argument('--duration', type=float, default=60, help='seconds to run')
+    parser.add_argument('--poll', type=float, default=5, help='seconds between ticks per user')
+    parser.add_argument('--timeout', type=int, default=10, help='spotipy request timeout, seconds')
+    fake_spotify.add_arguments(parser)
+    args = parser.parse_args()
+
+    os.environ['SUPABASE_DB_URL'] = ''        # set-but-empty also stops .env from supplying one
+    os.environ['SPOTIFY_LOCAL_FIRST'] = ''
+    server = None
+    url = args.server
+    if url is None:
+        server = fake_spotify.make_server(port=0, api=fake_spotify.from_arguments(args))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+    before = server_stats(url)
+
+    users = [f"user-{i:04d}" for i in range(args.users)]
+    workers = max(1, min(args.workers, len(users)))
+    print(f"🚦 {len(users)} users on {workers} workers against {url}, "
+          f"polling every {args.poll:g}s for {args.duration:g}s", flush=True)
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        # spawn: fresh interpreters that read the environment set above
+        with multiprocessing.get_context('spawn').Pool(workers) as pool:
+            jobs = [pool.apply_async(run_users, (url, users[i::workers], tmp, args.duration, args.poll, args.timeout))
+                    for i in range(workers)]
+            parts = [job.get() for job in jobs]
+    elapsed = time.perf_counter() - started
+    after = server_stats(url)
+    if server is not None:
+        server.shutdown()
+
+    ticks = [t for part in parts for t in part['tick_seconds']]
+    artwork_times = [t for part in parts for t in part['artwork_seconds']]
+    total = lambda key: sum(part[key] for part in parts)
+    requests = {k: v - before.get(k, 0) for k, v in after.items() if v - before.get(k, 0)}
+    summary = {
+        'users': len(users), 'workers': workers, 'duration': args.duration, 'poll': args.poll,
+        'faults': {'latency_ms': args.latency_ms, 'jitter_ms': args.jitter_ms, 'rate_429': args.rate_429,
+                   'rate_limit': args.rate_limit},
+        'elapsed': elapsed,
+        'ticks': len(ticks),
+        'ticks_per_s': len(ticks) / args.duration,
+        'plays': total('plays'),
+        'plays_per_s': total('plays') / args.duration,
+        'syncs': total('syncs'),
+        'errors': total('errors'),
+        'api_calls_per_tick': total('api_calls') / len(ticks) if ticks else None,
+        'tick_p50': statistics.median(ticks) if ticks else None,
+        'tick_p95': _percentile(ticks, 0.95),
+        'artwork_p50': statistics.median(artwork_times) if artwork_times else None,
+        'server_requests': requests,
+    }
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    (RESULTS_DIR / f"load-{stamp}.json").write_text(json.dumps(summary, indent=2))
+    fmt = lambda v: '—' if v is None else f"{v * 1000:.0f}ms"
+    print(f"Plays logged:   {summary['plays']:,} ({summary['plays_per_s']:.1f}/s)")
+    print(f"Ticks:          {summary['ticks']:,} ({summary['ticks_per_s']:.1f}/s), "
+          f"p50 {fmt(summary['tick_p50'])}, p95 {fmt(summary['tick_p95'])}, {summary['errors']} errors")
+    print(f"Playlist syncs: {summary['syncs']:,}")
+    print(f"Spotify calls:  {summary['api_calls_per_tick'] or 0:.1f} per tick, artwork p50 {fmt(summary['artwork_p50'])}")
+    for key, count in sorted(requests.items()):
+        print(f"  {key:<28} {count:>8,}")
+    sys.exit(1 if summary['errors'] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,4 @@
-import os
 from dotenv import load_dotenv
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
 
 import logging
 logging.basicConfig(level=logging.INFO)
@@ -9,45 +6,16 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-import track_logger
-import find_repeat_songs
-import create_on_repeat
+from runtime import SpotifyRuntime
 
-def authenticate():
-    try:
-
-        sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
-        client_id=os.getenv('SPOTIPY_CLIENT_ID'),
-        client_secret=os.getenv('SPOTIPY_CLIENT_SECRET'),
-        redirect_uri=os.getenv('SPOTIPY_REDIRECT_URI'),
-        #scope='playlist-modify-public'
-        scope='playlist-modify-public user-read-currently-playing user-read-playback-state user-read-recently-played'
-        ))
-
-        # Test the connection
-        user_info = sp.current_user()
-        if not user_info:
-            raise Exception("Failed to get user info")
-
-        return sp
-
-    except spotipy.SpotifyException as e:
-        logger.error(f"Spotify authentication failed: {e}")
-        return None
-    except Exception as e:
-        logger.error(f"Authentication error: {e}")
-        return None
-
-
-def main():
-
-    sp = authenticate()
-    if not sp:
-        return
-    user_id = sp.current_user()["id"]
-    track_logger.log_songs(sp)
-    print('Logging the tracks - done ✅')
-    create_on_repeat.create_playlist(sp, user_id)
+def main(runtime=None):
+    """Run once. The scheduler passes its long-lived SpotifyRuntime so the
+    client, user profile and DB connection are reused between runs."""
+    if runtime is None:
+        runtime = SpotifyRuntime()
+        if not runtime.connect():
+            return
+    return runtime.tick()
 
 
 if __name__ == '__main__':
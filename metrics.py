@@ -0,0 +1,213 @@
+# metrics.py
+# Minimal Prometheus-compatible metrics (stdlib only) and a local /metrics endpoint.
+# The scheduler starts the server; scrape it with e.g.
+#   curl http://127.0.0.1:9108/metrics
+
+import functools
+import logging
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ROW_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 500, 1000, 10000)
+
+_lock = threading.Lock()
+_registry: Dict[str, '_Metric'] = {}
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _fmt_labels(names: Sequence[str], values: Tuple, extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _fmt_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple, object] = {}
+        with _lock:
+            _registry[name] = self
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(n, '')) for n in self.label_names)
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        with _lock:
+            items = list(self._values.items())
+        lines.extend(self._render_items(items))
+        return '\n'.join(lines)
+
+    def _render_items(self, items):
+        return [f'{self.name}{_fmt_labels(self.label_names, key)} {_fmt_value(value)}' for key, value in items]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with _lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def _render_items(self, items):
+        lines = []
+        for key, (counts, total, count) in items:
+            for bound, c in zip(self.buckets, counts):
+                le = 'le="' + _fmt_value(bound) + '"'
+                lines.append(f'{self.name}_bucket{_fmt_labels(self.label_names, key, le)} {c}')
+            lines.append(f'{self.name}_sum{_fmt_labels(self.label_names, key)} {_fmt_value(total)}')
+            lines.append(f'{self.name}_count{_fmt_labels(self.label_names, key)} {count}')
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def render() -> str:
+    with _lock:
+        metrics = list(_registry.values())
+    return '\n'.join(m.render() for m in metrics) + '\n'
+
+
+# ── Metrics used across the app ───────────────────────────────────────────────
+RUN_DURATION = Histogram('spotify_run_duration_seconds', 'Duration of a scheduled tracker run', ['status'])
+RUNS = Counter('spotify_runs_total', 'Scheduled tracker runs', ['status'])
+API_LATENCY = Histogram('spotify_api_request_duration_seconds', 'Spotify Web API request latency', ['endpoint', 'status'])
+DB_LATENCY = Histogram('spotify_db_query_duration_seconds', 'SpotifyDatabase method latency', ['method'])
+STAGE_DURATION = Histogram('spotify_stage_duration_seconds', 'Duration of each tracker pipeline stage', ['stage', 'status'])
+RUN_ROWS = Histogram('spotify_run_rows', 'Rows handled per run by stage', ['stage'], buckets=ROW_BUCKETS)
+TRACKS_TOTAL = Gauge('spotify_tracks_total', 'Rows in the tracks table at the last check')
+QUEUE_DEPTH = Gauge('spotify_job_queue_depth', 'Jobs waiting in the local job queue')
+SPOOL_DEPTH = Gauge('spotify_sync_spool_depth', 'Rows waiting to be pushed to the remote database')
+QUERY_API_REQUESTS = Counter('spotify_query_api_requests_total', 'Query API requests by endpoint and cache outcome', ['endpoint', 'outcome'])
+QUERY_API_LATENCY = Histogram('spotify_query_api_request_duration_seconds', 'Query API request latency', ['endpoint'])
+QUEUE_DEPTH.set(0)
+SPOOL_DEPTH.set(0)
+
+
+# Spotify IDs are 22 base62 chars; collapse them so endpoints stay low-cardinality
+_ID_RE = re.compile(r'/[0-9A-Za-z]{22}(?=/|$)')
+
+
+def api_endpoint(url: str) -> str:
+    path = re.sub(r'^https?://[^/]+', '', url).split('?', 1)[0]
+    return _ID_RE.sub('/{id}', path)
+
+
+def observe_api_response(response, *args, **kwargs):
+    """requests response hook: records latency per Spotify endpoint"""
+    API_LATENCY.observe(response.elapsed.total_seconds(),
+                        endpoint=f"{response.request.method} {api_endpoint(response.url)}",
+                        status=response.status_code)
+
+
+def timed_db(fn: Callable) -> Callable:
+    """Decorator for SpotifyDatabase methods"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with DB_LATENCY.time(method=fn.__name__):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+# ── HTTP endpoint ─────────────────────────────────────────────────────────────
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes would flood the scheduler log
+
+
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_server(host: str = None, port: int = None) -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics from a daemon thread; safe to call more than once"""
+    global _server
+    if _server is not None:
+        return _server
+    host = host or config.METRICS_HOST
+    port = config.METRICS_PORT if port is None else port
+    try:
+        _server = ThreadingHTTPServer((host, port), _Handler)
+    except OSError as e:
+        logger.warning(f"Metrics endpoint not started on {host}:{port}: {e}")
+        return None
+    threading.Thread(target=_server.serve_forever, name='metrics', daemon=True).start()
+    logger.info(f"Metrics available at http://{host}:{_server.server_port}/metrics")
+    return _server
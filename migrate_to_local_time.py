@@ -1,79 +1,437 @@
 # migrate_to_local_time.py
-# One-time script to convert existing UTC timestamps in the DB to Gulf Standard Time (UTC+4)
-# Run once with: python3 migrate_to_local_time.py
+# Re-bases stored play timestamps from one time zone to another, e.g. history
+# logged in UTC that should read as local wall-clock time.
+#   - zones are IANA names (Asia/Dubai, Europe/Berlin, ...) or fixed offsets
+#     (+04:00); DST is handled by turning each zone into its UTC-offset
+#     transitions for the span of the data
+#   - --history takes a per-period offset history instead of one zone: a CSV
+#     of "utc_start,zone" lines, e.g. for plays logged while travelling
+#   - the conversion is set-based SQL over id chunks (--batch rows per
+#     transaction): an offsets table is joined per row to compute the new
+#     date/time into a rebase_plan table, then applied with UPDATE ... FROM
+#   - collisions (a converted play landing on another play of the same track
+#     at the same wall-clock time: a UTC/local duplicate, or two plays in the
+#     hour the clocks go back) are found with joins before anything changes;
+#     the run stops unless --drop-duplicates deletes the later row of each
+#   - rows whose new key is still held by another row that moves too are
+#     parked on a placeholder key first (PARK_DATE onwards, one second per
+#     id), so the unique key never trips mid-run
+#   - an interrupted run leaves rebase_plan behind and the next run resumes
+#     it, provided planning and the collision check finished (rebase_ready);
+#     a half-built plan is dropped and planned again
+# Run with: python3 migrate_to_local_time.py --to Asia/Dubai --dry-run
+#           python3 migrate_to_local_time.py --to Asia/Dubai [--from UTC] [--batch 50000]
+#           python3 migrate_to_local_time.py --history offsets.csv [--diff changes.csv]
+# Afterwards the rollups are rebuilt; run 'python3 sessions.py --rebuild' too.
 
-import sqlite3
-import shutil
-from datetime import datetime, timezone, timedelta
-from pathlib import Path
+import argparse
+import csv
+import json
+import logging
+import re
+import time
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
 
-DB_PATH = "spotify_data.db"
-BACKUP_PATH = "spotify_data_pre_migration.db"
-GST = timezone(timedelta(hours=4))
+import database
+from database import SpotifyDatabase
 
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-def migrate():
-    # ── Step 1: Backup ────────────────────────────────────────────────────────
-    shutil.copy2(DB_PATH, BACKUP_PATH)
-    print(f"✅ Backup created at {BACKUP_PATH}")
+OPEN_START = datetime(1, 1, 1)
+# Parked rows sit at PARK_DATE + id seconds until their final key is free:
+# unique per id, and in range for SQLite's dates up to id ~2.8e11
+PARK_DATE = '1000-01-01'
+_OFFSET_RE = re.compile(r'^(?:UTC|GMT)?([+-])(\d{1,2})(?::?(\d{2}))?$', re.I)
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
 
-    # ── Step 2: Fetch all rows ────────────────────────────────────────────────
-    cursor.execute("SELECT id, date_played, time_played FROM tracks")
-    rows = cursor.fetchall()
-    print(f"Found {len(rows)} tracks to migrate")
+def parse_zone(name: str) -> tzinfo:
+    name = name.strip()
+    if name.upper() in ('UTC', 'GMT', 'Z'):
+        return timezone.utc
+    m = _OFFSET_RE.match(name)
+    if m:
+        delta = timedelta(hours=int(m.group(2)), minutes=int(m.group(3) or 0))
+        return timezone(delta if m.group(1) == '+' else -delta)
+    return ZoneInfo(name)   # ZoneInfoNotFoundError for unknown names
 
-    # ── Step 3: Convert each row ──────────────────────────────────────────────
-    updated = 0
-    skipped = 0
-    errors  = 0
 
-    for row_id, date_played, time_played in rows:
-        try:
-            # Parse as UTC
-            utc_dt = datetime.fromisoformat(f"{date_played}T{time_played}").replace(tzinfo=timezone.utc)
+def _offset(zone: tzinfo, utc: datetime) -> int:
+    return int(utc.replace(tzinfo=timezone.utc).astimezone(zone).utcoffset().total_seconds())
 
-            # Convert to GST (UTC+4)
-            gst_dt = utc_dt.astimezone(GST)
 
-            new_date = gst_dt.strftime("%Y-%m-%d")
-            new_time = gst_dt.strftime("%H:%M:%S")
+def offset_changes(history: List[Tuple[datetime, tzinfo]], lo: datetime, hi: datetime) -> List[Tuple[datetime, int]]:
+    """
+    [(utc_start, offset_seconds)] covering lo..hi, one entry per change of
+    offset. history is [(utc_start, zone)] sorted by start; the first zone
+    also covers everything before its start.
+    """
+    changes = []
+    for i, (start, zone) in enumerate(history):
+        span_lo = lo if i == 0 else max(lo, start)
+        span_hi = min(hi, history[i + 1][0]) if i + 1 < len(history) else hi
+        if span_lo >= span_hi and i + 1 < len(history):
+            continue
+        t = span_lo
+        current = _offset(zone, t)
+        changes.append((t, current))
+        # DST rules change offsets at most a few times a year; step, then bisect to the second
+        while t < span_hi:
+            nxt = min(t + timedelta(hours=6), span_hi)
+            if _offset(zone, nxt) != current:
+                a, b = t, nxt
+                while b - a > timedelta(seconds=1):
+                    mid = a + (b - a) / 2
+                    a, b = (mid, b) if _offset(zone, mid) == current else (a, mid)
+                current = _offset(zone, b)
+                changes.append((b.replace(microsecond=0), current))
+                nxt = b
+            t = nxt
+    merged = []
+    for start, off in changes:
+        if merged and merged[-1][1] == off:
+            continue
+        merged.append((start, off))
+    merged[0] = (OPEN_START, merged[0][1])
+    return merged
 
-            # Skip rows that are already the same (already local or no change)
-            if new_date == date_played and new_time == time_played:
-                skipped += 1
+
+def local_keys(changes: List[Tuple[datetime, int]]) -> List[Tuple[datetime, int]]:
+    """
+    The same changes keyed on wall-clock time, for reading timestamps stored
+    in that zone. Repeated wall times (clocks going back) take the earlier
+    offset and skipped ones (clocks going forward) keep the old offset, as
+    datetime does with fold=0.
+    """
+    keyed = [(OPEN_START, changes[0][1])]
+    for (start, off), (_, prev) in zip(changes[1:], changes):
+        keyed.append((start + timedelta(seconds=max(off, prev)), off))
+    return keyed
+
+
+def read_history(path: str) -> List[Tuple[datetime, tzinfo]]:
+    history = []
+    with open(path, newline='') as f:
+        for row in csv.reader(f):
+            if not row or row[0].strip().startswith('#') or row[0].strip().lower() in ('utc_start', 'start'):
                 continue
+            start = datetime.fromisoformat(row[0].strip().replace('Z', '')).replace(tzinfo=None)
+            history.append((start, parse_zone(row[1])))
+    if not history:
+        raise SystemExit(f"❌ {path} has no 'utc_start,zone' rows")
+    return sorted(history, key=lambda h: h[0])
+
+
+class Rebaser:
+
+    def __init__(self, db: SpotifyDatabase, batch: int = 50000):
+        self.db = db
+        self.batch = batch
+        self.pg = database.DB_BACKEND == 'postgres'
+        self.p = db._placeholder()
+        self.conn = db.get_connection()
+        self.cur = self.conn.cursor()
+
+    # ── SQL dialect ──────────────────────────────────────────────────────────
+    def _ts(self, date_col: str, time_col: str) -> str:
+        return f"({date_col} + {time_col})" if self.pg else f"({date_col} || ' ' || {time_col})"
+
+    def _shift(self, ts: str, seconds: str) -> str:
+        return f"({ts} + make_interval(secs => {seconds}))" if self.pg else f"datetime({ts}, ({seconds}) || ' seconds')"
+
+    def _date(self, ts: str) -> str:
+        return f"CAST({ts} AS DATE)" if self.pg else f"date({ts})"
+
+    def _time(self, ts: str) -> str:
+        return f"CAST({ts} AS TIME)" if self.pg else f"time({ts})"
+
+    def _park(self) -> str:
+        if self.pg:
+            return (f"date_played = DATE '{PARK_DATE}' + CAST(id / 86400 AS INTEGER), "
+                    f"time_played = TIME '00:00:00' + make_interval(secs => id % 86400)")
+        return f"date_played = date('{PARK_DATE}', (id / 86400) || ' days'), time_played = time(id % 86400, 'unixepoch')"
+
+    def _commit(self):
+        self.conn.commit()
+
+    def scalar(self, sql: str, params=()):
+        self.cur.execute(sql, params)
+        return self.cur.fetchone()[0]
+
+    def _exists(self, table: str) -> bool:
+        if self.pg:
+            return self.scalar(f"SELECT to_regclass('{table}') IS NOT NULL")
+        return bool(self.scalar(f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = '{table}'"))
+
+    def plan_exists(self) -> bool:
+        return self._exists('rebase_plan')
+
+    def plan_ready(self) -> bool:
+        """rebase_plan was fully built and collision-checked, so applying it can resume"""
+        return self._exists('rebase_ready')
+
+    def mark_ready(self):
+        self.cur.execute("CREATE TABLE rebase_ready (checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+        self.cur.execute("INSERT INTO rebase_ready DEFAULT VALUES")
+        self._commit()
+
+    # ── Plan ─────────────────────────────────────────────────────────────────
+    def load_offsets(self, side: str, keyed: List[Tuple[datetime, int]]):
+        p = self.p
+        self.cur.execute(f"DELETE FROM rebase_offsets WHERE side = {p}", (side,))
+        self.cur.executemany(f"INSERT INTO rebase_offsets (side, start_key, offset_seconds) VALUES ({p}, {p}, {p})",
+                             [(side, start.isoformat(sep=' ', timespec='seconds'), off) for start, off in keyed])
+
+    def create_tables(self, temporary: bool):
+        ts_type = 'TIMESTAMP' if self.pg else 'TEXT'
+        temp = 'TEMPORARY ' if temporary else ''
+        self.cur.execute(f'''
+            CREATE TEMPORARY TABLE IF NOT EXISTS rebase_offsets (
+                side TEXT NOT NULL, start_key {ts_type} NOT NULL, offset_seconds INTEGER NOT NULL,
+                PRIMARY KEY (side, start_key)
+            )
+        ''')
+        self.cur.execute(f'''
+            CREATE {temp}TABLE rebase_plan (
+                id BIGINT PRIMARY KEY,
+                track_id TEXT NOT NULL,
+                old_date DATE NOT NULL, old_time TIME NOT NULL,
+                new_date DATE NOT NULL, new_time TIME NOT NULL,
+                shift_seconds INTEGER NOT NULL,
+                state INTEGER NOT NULL DEFAULT 0      -- 0 pending, 1 parked, 2 applied
+            )
+        ''')
+        self._commit()
 
-            cursor.execute(
-                "UPDATE tracks SET date_played = ?, time_played = ? WHERE id = ?",
-                (new_date, new_time, row_id)
+    def build_plan(self) -> int:
+        """Compute the new date/time of every row that changes, batch rows per transaction"""
+        p = self.p
+        lookup = lambda side, ts: (f"(SELECT offset_seconds FROM rebase_offsets WHERE side = '{side}' "
+                                   f"AND start_key <= {ts} ORDER BY start_key DESC LIMIT 1)")
+        cols = 'id, track_id, date_played, time_played'
+        lo, hi = self.scalar("SELECT MIN(id) FROM tracks"), self.scalar("SELECT MAX(id) FROM tracks")
+        planned = 0
+        for start in range(lo or 0, (hi or -1) + 1, self.batch):
+            # MATERIALIZED so each offset lookup and shift runs once per row,
+            # not once per reference after the planner inlines the CTEs
+            self.cur.execute(f'''
+                INSERT INTO rebase_plan (id, track_id, old_date, old_time, new_date, new_time, shift_seconds)
+                WITH stored AS MATERIALIZED (
+                    SELECT {cols}, local_ts, {lookup('from', 'local_ts')} AS from_offset
+                    FROM (SELECT {cols}, {self._ts('date_played', 'time_played')} AS local_ts
+                          FROM tracks WHERE id >= {p} AND id < {p}) t
+                ),
+                utc AS MATERIALIZED (
+                    SELECT {cols}, from_offset, utc_ts, {lookup('to', 'utc_ts')} AS to_offset
+                    FROM (SELECT {cols}, from_offset, {self._shift('local_ts', '-from_offset')} AS utc_ts FROM stored) s
+                ),
+                rebased AS MATERIALIZED (
+                    SELECT {cols}, to_offset - from_offset AS shift_seconds,
+                           {self._shift('utc_ts', 'to_offset')} AS new_ts
+                    FROM utc
+                )
+                SELECT id, track_id, date_played, time_played, new_date, new_time, shift_seconds
+                FROM (SELECT {cols}, shift_seconds, {self._date('new_ts')} AS new_date, {self._time('new_ts')} AS new_time
+                      FROM rebased) r
+                WHERE new_date <> date_played OR new_time <> time_played
+            ''', (start, start + self.batch))
+            planned += self.cur.rowcount
+            self._commit()
+        # Collision / parking lookups join on the old and new keys
+        self.cur.execute("CREATE INDEX IF NOT EXISTS idx_rebase_old ON rebase_plan(old_date, old_time, track_id)")
+        self.cur.execute("CREATE INDEX IF NOT EXISTS idx_rebase_new ON rebase_plan(new_date, new_time, track_id)")
+        self._commit()
+        return planned
+
+    def collisions(self) -> List[Tuple]:
+        """Plan rows whose new key would duplicate a row that stays put or a lower-id moving row"""
+        self.cur.execute('''
+            SELECT p.id, CAST(p.old_date AS TEXT), CAST(p.old_time AS TEXT),
+                   CAST(p.new_date AS TEXT), CAST(p.new_time AS TEXT), p.track_id
+            FROM rebase_plan p
+            WHERE EXISTS (
+                SELECT 1 FROM tracks t
+                WHERE t.date_played = p.new_date AND t.time_played = p.new_time AND t.track_id = p.track_id
+                  AND t.id NOT IN (SELECT id FROM rebase_plan)
+            ) OR EXISTS (
+                SELECT 1 FROM rebase_plan q
+                WHERE q.new_date = p.new_date AND q.new_time = p.new_time AND q.track_id = p.track_id AND q.id < p.id
             )
-            updated += 1
-
-        except Exception as e:
-            if "UNIQUE constraint" in str(e):
-                # Row already stored in local time — target timestamp already exists, skip it
-                skipped += 1
-            else:
-                print(f"  ⚠️  Row {row_id} ({date_played} {time_played}): {e}")
-                errors += 1
-
-    conn.commit()
-    conn.close()
-
-    # ── Step 4: Summary ───────────────────────────────────────────────────────
-    print(f"\nMigration complete:")
-    print(f"  Updated : {updated}")
-    print(f"  Skipped : {skipped} (already correct)")
-    print(f"  Errors  : {errors}")
-    print(f"\nYour original data is safely backed up at '{BACKUP_PATH}'")
-    print("You can delete the backup once you've verified the dashboard looks correct.")
-
-
-if __name__ == "__main__":
-    if not Path(DB_PATH).exists():
-        print(f"❌ Could not find {DB_PATH} — make sure you run this from your project folder")
+            ORDER BY p.id
+        ''')
+        return self.cur.fetchall()
+
+    def drop(self, ids: List[int]):
+        p = self.p
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            marks = ', '.join([p] * len(chunk))
+            self.cur.execute(f"DELETE FROM tracks WHERE id IN ({marks})", chunk)
+            self.cur.execute(f"DELETE FROM rebase_plan WHERE id IN ({marks})", chunk)
+        self._commit()
+
+    def summary(self) -> dict:
+        self.cur.execute("SELECT shift_seconds, COUNT(*) FROM rebase_plan GROUP BY shift_seconds ORDER BY 2 DESC")
+        shifts = {f"{s / 3600:+g}h": n for s, n in self.cur.fetchall()}
+        return {'changed': self.scalar("SELECT COUNT(*) FROM rebase_plan"), 'by_shift': shifts}
+
+    def diff_rows(self, limit: Optional[int] = None):
+        sql = '''
+            SELECT p.id, CAST(p.old_date AS TEXT), CAST(p.old_time AS TEXT),
+                   CAST(p.new_date AS TEXT), CAST(p.new_time AS TEXT), t.track_name, t.artist_name
+            FROM rebase_plan p JOIN tracks t ON t.id = p.id ORDER BY p.id
+        '''
+        self.cur.execute(sql + (f" LIMIT {int(limit)}" if limit else ''))
+        return self.cur.fetchall()
+
+    # ── Apply ────────────────────────────────────────────────────────────────
+    def _move(self, where: str, params=()):
+        if self.pg:
+            self.cur.execute(f'''
+                UPDATE tracks t SET date_played = p.new_date, time_played = p.new_time
+                FROM rebase_plan p WHERE t.id = p.id AND {where}
+            ''', params)
+        else:
+            self.cur.execute(f'''
+                UPDATE tracks SET date_played = p.new_date, time_played = p.new_time
+                FROM rebase_plan p WHERE tracks.id = p.id AND {where}
+            ''', params)
+        return self.cur.rowcount
+
+    def apply(self) -> int:
+        p = self.p
+        # 1. Park rows whose destination is another moving row's current key
+        self.cur.execute('''
+            UPDATE rebase_plan SET state = 1
+            WHERE state = 0 AND EXISTS (
+                SELECT 1 FROM rebase_plan q
+                WHERE q.old_date = rebase_plan.new_date AND q.old_time = rebase_plan.new_time
+                  AND q.track_id = rebase_plan.track_id AND q.id <> rebase_plan.id AND q.state = 0
+            )
+        ''')
+        self.cur.execute(f'''
+            UPDATE tracks SET {self._park()}
+            WHERE id IN (SELECT id FROM rebase_plan WHERE state = 1)
+        ''')
+        parked = self.cur.rowcount
+        self._commit()
+        if parked:
+            logger.info(f"🅿 Parked {parked} rows whose new time is still taken by a row that moves")
+
+        # 2. Everything else, batch rows per transaction
+        moved = 0
+        lo, hi = self.scalar("SELECT MIN(id) FROM rebase_plan WHERE state = 0"), self.scalar("SELECT MAX(id) FROM rebase_plan")
+        for start in range(lo or 0, (hi or -1) + 1, self.batch) if lo is not None else ():
+            where = f"p.state = 0 AND p.id >= {p} AND p.id < {p}"
+            moved += self._move(where, (start, start + self.batch))
+            self.cur.execute(f"UPDATE rebase_plan SET state = 2 WHERE state = 0 AND id >= {p} AND id < {p}",
+                             (start, start + self.batch))
+            self._commit()
+            logger.info(f"  rows through id {min(start + self.batch - 1, hi)} re-based ({moved:,} so far)")
+
+        # 3. Parked rows to their final keys, now free
+        moved += self._move("p.state = 1")
+        self.cur.execute("UPDATE rebase_plan SET state = 2 WHERE state = 1")
+        self._commit()
+        return moved
+
+    def finish(self):
+        database.bump_generation(self.cur)   # stored times changed under every cached view
+        self.cur.execute("DROP TABLE IF EXISTS rebase_plan")
+        self.cur.execute("DROP TABLE IF EXISTS rebase_ready")
+        self._commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-base stored play timestamps to another time zone')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--to', help="zone the stored times should read in, e.g. Asia/Dubai or +04:00")
+    target.add_argument('--history', help="CSV of 'utc_start,zone' rows: which zone applied from when")
+    parser.add_argument('--from', dest='from_zone', default='UTC', help='zone the times are stored in now (default UTC)')
+    parser.add_argument('--batch', type=int, default=50000, help='rows per transaction')
+    parser.add_argument('--dry-run', action='store_true', help='report what would change; modify nothing')
+    parser.add_argument('--diff', help='write every planned change to this CSV')
+    parser.add_argument('--drop-duplicates', action='store_true',
+                        help='delete the later row of each collision instead of stopping')
+    args = parser.parse_args()
+
+    db = SpotifyDatabase(persistent=True)
+    rb = Rebaser(db, args.batch)
+    started = time.perf_counter()
+
+    resuming = rb.plan_exists()
+    if resuming and not rb.plan_ready():
+        # Interrupted while planning or checking collisions: nothing has
+        # moved yet, so start over rather than apply an unchecked plan
+        logger.info("↻ Dropping a re-base plan that was never finished; planning again")
+        rb.finish()
+        resuming = False
+    if resuming and args.dry_run:
+        raise SystemExit("❌ An interrupted re-base is pending (rebase_plan exists); run without --dry-run to finish it")
+    if resuming:
+        logger.info("↻ Resuming the interrupted re-base from rebase_plan (its zones were fixed when it was planned)")
     else:
-        migrate()
\ No newline at end of file
+        history = read_history(args.history) if args.history else [(OPEN_START, parse_zone(args.to))]
+        rb.cur.execute("SELECT MIN(date_played), MAX(date_played) FROM tracks")
+        first, last = rb.cur.fetchone()
+        if first is None:
+            logger.info("No tracks — nothing to re-base")
+            return
+        lo = datetime.fromisoformat(str(first)) - timedelta(days=2)
+        hi = datetime.fromisoformat(str(last)) + timedelta(days=2)
+        if not args.dry_run and not rb.pg:
+            rb.cur.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            if not db.backup_database(f"pre_rebase_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"):
+                raise SystemExit("❌ Backup failed — not touching the database")
+
+        rb.create_tables(temporary=args.dry_run)
+        rb.load_offsets('from', local_keys(offset_changes([(OPEN_START, parse_zone(args.from_zone))], lo, hi)))
+        rb.load_offsets('to', offset_changes(history, lo, hi))
+        total = rb.scalar("SELECT COUNT(*) FROM tracks")
+        planned = rb.build_plan()
+        plan_seconds = time.perf_counter() - started
+        logger.info(f"🧮 Planned {total:,} rows in {plan_seconds:.2f}s ({total / max(plan_seconds, 1e-9):,.0f} rows/s): "
+                    f"{planned:,} change")
+
+        clashes = rb.collisions()
+        if clashes:
+            logger.warning(f"⚠️ {len(clashes)} rows would land on an existing play of the same track:")
+            for row_id, od, ot, nd, nt, track_id in clashes[:20]:
+                logger.warning(f"   #{row_id} {track_id}: {od} {ot} -> {nd} {nt}")
+        if args.diff:
+            with open(args.diff, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['id', 'old_date', 'old_time', 'new_date', 'new_time', 'track_name', 'artist_name'])
+                writer.writerows(rb.diff_rows())
+            logger.info(f"Diff written to {args.diff}")
+
+        if args.dry_run:
+            for row in rb.diff_rows(10):
+                logger.info(f"   #{row[0]} {row[1]} {row[2]} -> {row[3]} {row[4]}  {row[5]} — {row[6]}")
+            print(json.dumps({**rb.summary(), 'collisions': len(clashes), 'rows': total,
+                              'plan_seconds': round(plan_seconds, 3)}, indent=2))
+            return
+        if clashes and not args.drop_duplicates:
+            rb.finish()
+            raise SystemExit("❌ Stopped before changing anything; rerun with --drop-duplicates to delete "
+                             "those rows, or --dry-run --diff to inspect them")
+        if clashes:
+            rb.drop([c[0] for c in clashes])
+            logger.info(f"🗑 Dropped {len(clashes)} colliding rows")
+        rb.mark_ready()
+
+    applied_at = time.perf_counter()
+    moved = rb.apply()
+    apply_seconds = time.perf_counter() - applied_at
+    rb.finish()
+    logger.info(f"✅ Re-based {moved:,} rows in {apply_seconds:.2f}s ({moved / max(apply_seconds, 1e-9):,.0f} rows/s)")
+
+    counts = db.rebuild_rollups()
+    logger.info(f"📊 Rollups rebuilt: {counts} — run 'python3 sessions.py --rebuild' to redo sessions")
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
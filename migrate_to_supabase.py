@@ -1,44 +1,233 @@
+# migrate_to_supabase.py
+# Copies the local SQLite history into Postgres (Supabase, or any local
+# Postgres standing in for it), resumably and in parallel:
+#   - the source id range is split into --workers slices, each copied by its
+#     own process with its own connections
+#   - rows are read in id order, --batch at a time, so memory stays flat
+#   - each batch is COPY'd into a temporary staging table and merged into
+#     tracks with ON CONFLICT (existing rows keep theirs, but gain a missing
+#     artist_id), in the same transaction that advances the slice's checkpoint
+#     in migrate_checkpoints, so a crash or Ctrl-C resumes after the last batch
+#     that committed without skipping or double-counting anything
+#   - afterwards artists and the rollup tables are rebuilt on the
+#     target, since COPY bypasses SpotifyDatabase.add_tracks
+# Run with: python3 migrate_to_supabase.py [--source spotify_data.db] [--target URL]
+#                                          [--workers 4] [--batch 10000] [--restart]
+# --target defaults to SUPABASE_DB_URL, e.g. postgresql://postgres@localhost:5432/spotify
+# for a local stand-in. Sessions and streaks are derived data: run
+# sessions.py --rebuild against the target afterwards if you need them.
+
+import argparse
+import csv
+import io
+import logging
+import os
 import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Tuple
+
 import psycopg2
-import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-src = sqlite3.connect('spotify_data.db')
-dst = psycopg2.connect(os.getenv('SUPABASE_DB_URL'))
-
-rows = src.execute("SELECT date_played, time_played, track_id, track_name, artist_name FROM tracks").fetchall()
-print(f"Migrating {len(rows)} tracks to Supabase...")
-
-cur = dst.cursor()
-cur.execute('''
-    CREATE TABLE IF NOT EXISTS tracks (
-        id SERIAL PRIMARY KEY,
-        date_played DATE NOT NULL,
-        time_played TIME NOT NULL,
-        track_id TEXT NOT NULL,
-        track_name TEXT NOT NULL,
-        artist_name TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        UNIQUE(date_played, time_played, track_id)
-    )
-''')
-
-inserted = 0
-for row in rows:
-    try:
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(processName)s %(message)s')
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('date_played', 'time_played', 'track_id', 'track_name', 'artist_name', 'artist_id')
+
+
+def _source_conn(path: str) -> sqlite3.Connection:
+    # Read-only, so a running tracker can keep writing to the same file
+    return sqlite3.connect(f"file:{Path(path).resolve()}?mode=ro", uri=True, timeout=30)
+
+
+def _source_columns(src: sqlite3.Connection) -> str:
+    present = {row[1] for row in src.execute("PRAGMA table_info(tracks)")}
+    # Databases from before schema migration 4 have no artist_id
+    return ', '.join(c if c in present else f"NULL AS {c}" for c in COLUMNS)
+
+
+def ensure_checkpoints(dst):
+    with dst.cursor() as cur:
         cur.execute('''
-            INSERT INTO tracks (date_played, time_played, track_id, track_name, artist_name)
-            VALUES (%s, %s, %s, %s, %s)
-            ON CONFLICT DO NOTHING
-        ''', row)
-        if cur.rowcount > 0:
-            inserted += 1
-    except Exception as e:
-        print(f"  Skipped row: {e}")
-
-dst.commit()
-print(f"Done — {inserted} tracks migrated, {len(rows)-inserted} already existed or skipped")
-src.close()
-dst.close()
\ No newline at end of file
+            CREATE TABLE IF NOT EXISTS migrate_checkpoints (
+                source TEXT NOT NULL,
+                range_start BIGINT NOT NULL,
+                range_end BIGINT NOT NULL,
+                last_id BIGINT NOT NULL,
+                rows_read BIGINT NOT NULL DEFAULT 0,
+                rows_inserted BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (source, range_start, range_end)
+            )
+        ''')
+    dst.commit()
+
+
+def plan_ranges(dst, source: str, min_id: int, max_id: int, workers: int) -> List[Tuple[int, int]]:
+    """
+    Id slices for this run. A resumed run keeps the slices it started with
+    (their checkpoints only make sense for those bounds) and adds one slice
+    for rows logged since.
+    """
+    with dst.cursor() as cur:
+        cur.execute('SELECT range_start, range_end FROM migrate_checkpoints WHERE source = %s ORDER BY range_start',
+                    (source,))
+        ranges = [tuple(r) for r in cur.fetchall()]
+        if ranges:
+            if max_id > ranges[-1][1]:
+                ranges.append((ranges[-1][1] + 1, max_id))
+        else:
+            step = max(1, -(-(max_id - min_id + 1) // workers))
+            ranges = [(lo, min(lo + step - 1, max_id)) for lo in range(min_id, max_id + 1, step)]
+        for lo, hi in ranges:
+            cur.execute('''
+                INSERT INTO migrate_checkpoints (source, range_start, range_end, last_id)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (source, range_start, range_end) DO NOTHING
+            ''', (source, lo, hi, lo - 1))
+    dst.commit()
+    return ranges
+
+
+def copy_range(source_path: str, source: str, target: str, lo: int, hi: int, batch: int) -> dict:
+    """Copy source ids lo..hi, resuming from this slice's checkpoint; runs in a worker process"""
+    src = _source_conn(source_path)
+    dst = psycopg2.connect(target)
+    read = inserted = 0
+    started = time.perf_counter()
+    try:
+        columns = _source_columns(src)
+        with dst.cursor() as cur:
+            cur.execute('''
+                CREATE TEMP TABLE tracks_stage (
+                    src_id BIGINT, date_played DATE, time_played TIME, track_id TEXT,
+                    track_name TEXT, artist_name TEXT, artist_id TEXT
+                ) ON COMMIT DELETE ROWS
+            ''')
+            cur.execute('''
+                SELECT last_id FROM migrate_checkpoints
+                WHERE source = %s AND range_start = %s AND range_end = %s
+            ''', (source, lo, hi))
+            last_id = cur.fetchone()[0]
+        dst.commit()
+        if last_id >= lo:
+            logger.info(f"↻ Slice {lo}-{hi}: resuming after id {last_id}")
+
+        while last_id < hi:
+            rows = src.execute(f'''
+                SELECT id, {columns} FROM tracks
+                WHERE id > ? AND id <= ?
+                ORDER BY id
+                LIMIT ?
+            ''', (last_id, hi, batch)).fetchall()
+            # An empty read means the slice is done (ids can have gaps)
+            last_id = rows[-1][0] if rows else hi
+            with dst.cursor() as cur:
+                if rows:
+                    buf = io.StringIO()
+                    csv.writer(buf).writerows(rows)
+                    buf.seek(0)
+                    # Empty CSV fields are NULL, except in the NOT NULL text columns
+                    cur.copy_expert(f"COPY tracks_stage (src_id, {', '.join(COLUMNS)}) FROM STDIN "
+                                     "WITH (FORMAT csv, FORCE_NOT_NULL (track_id, track_name, artist_name))", buf)
+                    # DISTINCT ON: one statement may not touch the same conflict key twice
+                    cur.execute(f'''
+                        INSERT INTO tracks ({', '.join(COLUMNS)})
+                        SELECT DISTINCT ON (date_played, time_played, track_id) {', '.join(COLUMNS)}
+                        FROM tracks_stage
+                        ORDER BY date_played, time_played, track_id, src_id
+                        ON CONFLICT (date_played, time_played, track_id) DO UPDATE
+                            SET artist_id = EXCLUDED.artist_id
+                            WHERE tracks.artist_id IS NULL AND EXCLUDED.artist_id IS NOT NULL
+                        RETURNING (xmax = 0)
+                    ''')
+                    batch_inserted = sum(1 for (is_insert,) in cur.fetchall() if is_insert)
+                else:
+                    batch_inserted = 0
+                cur.execute('''
+                    UPDATE migrate_checkpoints
+                    SET last_id = %s, rows_read = rows_read + %s, rows_inserted = rows_inserted + %s,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE source = %s AND range_start = %s AND range_end = %s
+                ''', (last_id, len(rows), batch_inserted, source, lo, hi))
+            dst.commit()   # merge + checkpoint land together
+            read += len(rows)
+            inserted += batch_inserted
+            if rows:
+                logger.info(f"  slice {lo}-{hi}: through id {last_id} ({read:,} rows read)")
+    finally:
+        src.close()
+        dst.close()
+    return {'range': (lo, hi), 'read': read, 'inserted': inserted, 'seconds': time.perf_counter() - started}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Copy the SQLite history into Postgres/Supabase')
+    parser.add_argument('--source', default='spotify_data.db', help='SQLite database to copy from')
+    parser.add_argument('--target', default=os.getenv('SUPABASE_DB_URL'), help='Postgres URL (default SUPABASE_DB_URL)')
+    parser.add_argument('--workers', type=int, default=4, help='parallel copy processes')
+    parser.add_argument('--batch', type=int, default=10000, help='rows per COPY + merge transaction')
+    parser.add_argument('--restart', action='store_true', help='forget checkpoints and copy everything again')
+    args = parser.parse_args()
+    if not args.target:
+        parser.error('no --target and SUPABASE_DB_URL is not set')
+
+    # SpotifyDatabase picks its backend from config at import time; point it at the target
+    import config
+    config.SUPABASE_DB_URL = args.target
+    from database import SpotifyDatabase
+    target_db = SpotifyDatabase()   # creates / migrates the target schema
+
+    source = str(Path(args.source).resolve())
+    src = _source_conn(args.source)
+    min_id, max_id, total = src.execute("SELECT MIN(id), MAX(id), COUNT(*) FROM tracks").fetchone()
+    src.close()
+    if not total:
+        logger.info("Source has no tracks — nothing to migrate")
+        return
+
+    dst = psycopg2.connect(args.target)
+    ensure_checkpoints(dst)
+    if args.restart:
+        with dst.cursor() as cur:
+            cur.execute('DELETE FROM migrate_checkpoints WHERE source = %s', (source,))
+        dst.commit()
+    ranges = plan_ranges(dst, source, min_id, max_id, args.workers)
+    dst.close()
+    logger.info(f"🚚 Migrating {total:,} tracks from {args.source} in {len(ranges)} slices, {args.workers} workers")
+
+    started = time.perf_counter()
+    read = inserted = 0
+    failed = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(copy_range, args.source, source, args.target, lo, hi, args.batch): (lo, hi)
+                   for lo, hi in ranges}
+        for future in as_completed(futures):
+            lo, hi = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed.append((lo, hi))
+                logger.error(f"❌ Slice {lo}-{hi} failed: {e} — rerun to resume it")
+                continue
+            read += result['read']
+            inserted += result['inserted']
+            logger.info(f"✅ Slice {lo}-{hi}: {result['read']:,} read, {result['inserted']:,} new "
+                        f"in {result['seconds']:.1f}s")
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Copied {read:,} rows ({inserted:,} new, {read - inserted:,} already there) "
+                f"in {elapsed:.1f}s — {read / elapsed if elapsed else 0:,.0f} rows/s")
+    if failed:
+        raise SystemExit(1)
+
+    counts = target_db.rebuild_rollups()
+    logger.info(f"📊 Rebuilt rollups on the target: {counts}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# pipeline.py
+# One tracker run as a chain of stages:
+#   fetch -> qualify -> persist -> rank -> sync
+# Every stage keeps its last output and reports whether it changed. A stage
+# only runs when the stage before it changed (or it has never run), so a poll
+# that finds no new plays stops after fetch, and a run whose ranking comes out
+# identical never touches the Spotify playlist.
+
+import logging
+import time
+from typing import Callable, List, Optional
+
+import config
+import create_on_repeat
+import metrics
+import track_logger
+import tracing
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """A named step: run(ctx) returns its output, changed(old, new) decides if downstream must run"""
+
+    def __init__(self, name: str, run: Callable, changed: Callable = None, always: bool = False):
+        self.name = name
+        self._run = run
+        self._changed = changed or (lambda old, new: bool(new))
+        self.always = always
+        self.output = None
+        self.has_run = False
+
+    def execute(self, ctx: dict) -> bool:
+        previous = self.output
+        with metrics.STAGE_DURATION.time(stage=self.name, status='ran'), tracing.span(f"pipeline.{self.name}"):
+            self.output = self._run(ctx)
+        changed = not self.has_run or self._changed(previous, self.output)
+        self.has_run = True
+        return changed
+
+
+class Pipeline:
+    """Runs stages in order, skipping everything below the first unchanged output"""
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+
+    def run(self, ctx: dict) -> dict:
+        timings = {}
+        dirty = True
+        for stage in self.stages:
+            if not (dirty or stage.always or not stage.has_run):
+                metrics.STAGE_DURATION.observe(0, stage=stage.name, status='skipped')
+                timings[stage.name] = None
+                ctx[stage.name] = stage.output
+                continue
+            if ctx.get('on_stage'):
+                ctx['on_stage'](stage.name)
+            started = time.perf_counter()
+            dirty = stage.execute(ctx)
+            timings[stage.name] = time.perf_counter() - started
+            ctx[stage.name] = stage.output
+            if not dirty:
+                logger.info(f"Stage '{stage.name}' unchanged — skipping downstream stages")
+        return timings
+
+    def stage(self, name: str) -> Optional[Stage]:
+        return next((s for s in self.stages if s.name == name), None)
+
+
+# ── Tracker stages ────────────────────────────────────────────────────────────
+def _fetch(ctx):
+    return track_logger.fetch_recent_items(ctx['sp'], ctx['db'])
+
+
+def _qualify(ctx):
+    items, last_stored_local = ctx['fetch']
+    return track_logger.qualify_items(items, last_stored_local) if items else []
+
+
+def _persist(ctx):
+    tracks = ctx['qualify']
+    return track_logger.persist_tracks(ctx['db'], tracks) if tracks else 0
+
+
+def _rank(ctx):
+    return ctx['db'].get_playlist_tracks(config.PLAYLIST_SIZE)
+
+
+def _sync(ctx):
+    runtime = ctx['runtime']
+    if not ctx['rank']:
+        logger.error("No songs found to add to playlist")
+        return None
+    # Re-check right before the playlist write in case the lease lapsed mid-run
+    if runtime.leader is not None and not runtime.leader.acquire():
+        logger.warning("Leadership lost during the run — skipping playlist sync")
+        return None
+    runtime.playlist_id = create_on_repeat.create_playlist(
+        runtime.sp, runtime.user_id, runtime.db, runtime.playlist_id, playlist_songs=ctx['rank'])
+    return runtime.playlist_id
+
+
+class _SyncStage(Stage):
+    # A skipped or failed sync leaves the playlist stale; retry it next run
+    def execute(self, ctx):
+        changed = super().execute(ctx)
+        if self.output is None:
+            self.has_run = False
+        return changed
+
+
+def tracker_pipeline() -> Pipeline:
+    return Pipeline([
+        Stage('fetch', _fetch, changed=lambda old, new: bool(new[0]), always=True),
+        Stage('qualify', _qualify),
+        Stage('persist', _persist),
+        Stage('rank', _rank, changed=lambda old, new: old != new),
+        _SyncStage('sync', _sync),
+    ])
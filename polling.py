@@ -0,0 +1,90 @@
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class PlayRateModel:
+    """
+    Predicts plays per minute from an hour-of-week profile of recent history,
+    blended with the rate actually observed over the last RECENT_RATE_MINUTES.
+
+    Used to pick the next poll time: Spotify's recently-played endpoint only
+    returns the last LIMIT_SONGS plays, so anything older than that at poll
+    time is lost. We poll just before the expected play count reaches that.
+    """
+
+    def __init__(self, weeks: int = None, recent_minutes: int = None):
+        self.weeks = weeks or config.RATE_PROFILE_WEEKS
+        self.recent_minutes = recent_minutes or config.RECENT_RATE_MINUTES
+        self.profile = [[0.0] * 24 for _ in range(7)]   # [weekday][hour] -> plays/min
+        self.recent_rate = 0.0
+        self.refreshed_at: Optional[datetime] = None
+
+    def refresh(self, db, now: datetime = None):
+        now = now or datetime.now()
+        since = now - timedelta(weeks=self.weeks)
+        p = db._placeholder()
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT CAST(date_played AS TEXT), CAST(time_played AS TEXT)
+                FROM tracks
+                WHERE date_played >= {p}
+            ''', (since.strftime('%Y-%m-%d'),))
+            rows = cursor.fetchall()
+        self.fit([datetime.fromisoformat(f"{d}T{str(t)[:8]}") for d, t in rows], now)
+
+    def fit(self, played: List[datetime], now: datetime):
+        counts = [[0] * 24 for _ in range(7)]
+        recent_cutoff = now - timedelta(minutes=self.recent_minutes)
+        recent = 0
+        for ts in played:
+            counts[ts.weekday()][ts.hour] += 1
+            if recent_cutoff <= ts <= now:
+                recent += 1
+
+        # Each hour-of-week slot occurs once per week of covered history
+        span_days = (now - min(played)).total_seconds() / 86400 if played else 0
+        occurrences = min(self.weeks, max(1.0, span_days / 7))
+        self.profile = [[c / (occurrences * 60) for c in day] for day in counts]
+        self.recent_rate = recent / self.recent_minutes
+        self.refreshed_at = now
+
+    def rate_at(self, when: datetime) -> float:
+        return self.profile[when.weekday()][when.hour]
+
+    def active_hours(self, min_rate: float = None) -> List[int]:
+        """Hours of the day whose average rate across weekdays exceeds min_rate"""
+        min_rate = min_rate if min_rate is not None else 1 / 60   # one play an hour
+        return [h for h in range(24) if sum(day[h] for day in self.profile) / 7 > min_rate]
+
+    def next_poll_delay(self, now: datetime = None, capacity: int = None) -> timedelta:
+        """
+        Time until the expected number of new plays reaches the safe share of
+        the recently-played window, integrating the profile hour by hour.
+        """
+        now = now or datetime.now()
+        capacity = capacity or config.LIMIT_SONGS
+        budget = capacity * config.POLL_SAFETY
+        min_delay = timedelta(minutes=config.POLL_MIN_MINUTES)
+        max_delay = timedelta(minutes=config.POLL_MAX_MINUTES)
+
+        expected = 0.0
+        t = now
+        while t - now < max_delay:
+            slot_end = min(t.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1), now + max_delay)
+            rate = self.rate_at(t)
+            if t == now:
+                rate = max(rate, self.recent_rate)   # trust a burst happening right now
+            minutes = (slot_end - t).total_seconds() / 60
+            if rate > 0 and expected + rate * minutes >= budget:
+                delay = t + timedelta(minutes=(budget - expected) / rate) - now
+                return max(min_delay, delay)
+            expected += rate * minutes
+            t = slot_end
+        return max_delay
@@ -0,0 +1,355 @@
+# query_api.py
+# Read-only HTTP API over the rollup tables, so the dashboard and other local
+# clients share one warm cache instead of each running their own SQL.
+#   GET /top-tracks    ?range=30d&limit=50&user=...   (track_daily)
+#   GET /top-artists   ?range=...&limit=...           (track_daily)
+#   GET /recent        ?range=...&limit=...           (tracks, newest first)
+#   GET /activity      ?range=...                     (activity_cube)
+#   GET /stats         ?range=...                     (activity_cube + track_daily)
+# range: 7d | 12w | all | YYYY-MM-DD..YYYY-MM-DD (default 30d, ending today)
+# user:  omitted for the main database, or a name from config.QUERY_API_USERS
+#
+# Responses are JSON, kept in memory per (user, endpoint, resolved params)
+# until that user's data generation (see database.bump_generation) changes. Each carries an
+# ETag, so If-None-Match revalidation returns 304 with no body, and the body
+# is gzipped once per entry for clients sending Accept-Encoding: gzip.
+# Run with: python3 query_api.py [--host 127.0.0.1] [--port 9109]
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import config
+import metrics
+from database import SpotifyDatabase, activity_summary, data_generation, date_range_clause
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_RANGE = '30d'
+DEFAULT_LIMIT = 50
+GZIP_MIN_BYTES = 512   # smaller bodies aren't worth the CPU
+_RANGE_RE = re.compile(r'^(\d+)([dw])$')
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def parse_range(value: Optional[str], today: date = None) -> Tuple[Optional[str], Optional[str]]:
+    """range parameter -> inclusive (start, end) ISO dates; None is an open end"""
+    value = (value or DEFAULT_RANGE).strip().lower()
+    today = today or date.today()
+    if value == 'all':
+        return None, None
+    m = _RANGE_RE.match(value)
+    if m:
+        days = int(m.group(1)) * (7 if m.group(2) == 'w' else 1)
+        if days < 1:
+            raise BadRequest("range must cover at least one day")
+        return str(today - timedelta(days=days - 1)), str(today)
+    if '..' in value:
+        start, end = value.split('..', 1)
+        try:
+            start = str(datetime.strptime(start, '%Y-%m-%d').date()) if start else None
+            end = str(datetime.strptime(end, '%Y-%m-%d').date()) if end else None
+        except ValueError:
+            raise BadRequest(f"bad date in range {value!r}; use YYYY-MM-DD..YYYY-MM-DD")
+        if start and end and start > end:
+            raise BadRequest("range start is after its end")
+        return start, end
+    raise BadRequest(f"bad range {value!r}; use e.g. 7d, 12w, all or 2025-01-01..2025-01-31")
+
+
+def parse_limit(value: Optional[str]) -> int:
+    try:
+        limit = int(value) if value else DEFAULT_LIMIT
+    except ValueError:
+        raise BadRequest(f"limit must be an integer, got {value!r}")
+    if not 1 <= limit <= config.QUERY_API_MAX_LIMIT:
+        raise BadRequest(f"limit must be between 1 and {config.QUERY_API_MAX_LIMIT}")
+    return limit
+
+
+def accepts_gzip(header: Optional[str]) -> bool:
+    """Accept-Encoding allows gzip: listed (or covered by *) with a q-value above 0"""
+    weights = {}
+    for item in (header or '').split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    q = weights.get('gzip', weights.get('x-gzip', weights.get('*', 0.0)))
+    return q > 0
+
+
+# ── Queries ───────────────────────────────────────────────────────────────────
+def _rows(cursor, names):
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def top_tracks(conn, p, start, end, limit):
+    where, params = date_range_clause(p, start, end)
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT track_id, MAX(track_name), MAX(artist_name), SUM(plays) AS total
+        FROM track_daily {where}
+        GROUP BY track_id
+        ORDER BY total DESC, track_id
+        LIMIT {p}
+    ''', params + [limit])
+    return _rows(cursor, ('track_id', 'track_name', 'artist_name', 'plays'))
+
+
+def top_artists(conn, p, start, end, limit):
+    where, params = date_range_clause(p, start, end)
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT artist_name, MAX(artist_id), SUM(plays) AS total, COUNT(DISTINCT track_id)
+        FROM track_daily {where}
+        GROUP BY artist_name
+        ORDER BY total DESC, artist_name
+        LIMIT {p}
+    ''', params + [limit])
+    return _rows(cursor, ('artist_name', 'artist_id', 'plays', 'unique_tracks'))
+
+
+def recent(conn, p, start, end, limit):
+    # Raw plays have no rollup; idx_played_at serves this newest-first walk
+    where, params = date_range_clause(p, start, end)
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT CAST(date_played AS TEXT), CAST(time_played AS TEXT), track_id, track_name, artist_name
+        FROM tracks {where}
+        ORDER BY date_played DESC, time_played DESC, id DESC
+        LIMIT {p}
+    ''', params + [limit])
+    return _rows(cursor, ('date_played', 'time_played', 'track_id', 'track_name', 'artist_name'))
+
+
+def activity(conn, p, start, end, limit):
+    res = activity_summary(conn, p, start, end)
+    return {
+        'hourly': [{'hour': h, 'plays': n} for h, n in res['hourly']],
+        'daily': [{'date': d, 'plays': n} for d, n in res['daily']],
+        'heatmap': [{'dow': d, 'hour': h, 'plays': n} for d, h, n in res['heatmap']],
+    }
+
+
+def stats(conn, p, start, end, limit):
+    where, params = date_range_clause(p, start, end)
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT SUM(plays), CAST(MIN(date_played) AS TEXT), CAST(MAX(date_played) AS TEXT)
+        FROM activity_cube {where}
+    ''', params)
+    total, first, last = cursor.fetchone()
+    cursor.execute(f"SELECT COUNT(DISTINCT track_id), COUNT(DISTINCT artist_name) FROM track_daily {where}", params)
+    unique_tracks, artists = cursor.fetchone()
+    return {'total': total or 0, 'unique_tracks': unique_tracks, 'artists': artists, 'from': first, 'to': last}
+
+
+ENDPOINTS = {
+    '/top-tracks': top_tracks,
+    '/top-artists': top_artists,
+    '/recent': recent,
+    '/activity': activity,
+    '/stats': stats,
+}
+
+
+# ── Cache ─────────────────────────────────────────────────────────────────────
+class _Entry:
+    __slots__ = ('version', 'body', 'gzipped', 'etag')
+
+    def __init__(self, version, payload):
+        self.version = version
+        self.body = json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
+        self.gzipped = gzip.compress(self.body, 6) if len(self.body) >= GZIP_MIN_BYTES else None
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:20] + '"'
+
+
+class QueryService:
+    """Per-user databases, their data versions, and an LRU of rendered responses"""
+
+    def __init__(self, users: Dict[str, str] = None):
+        self.users = config.QUERY_API_USERS if users is None else users
+        self._dbs: Dict[str, SpotifyDatabase] = {}
+        self._versions: Dict[str, Tuple[float, int]] = {}
+        self._cache: 'OrderedDict[tuple, _Entry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[tuple, threading.Lock] = {}
+
+    def database(self, user: str) -> SpotifyDatabase:
+        if user not in self._dbs:
+            if user and user not in self.users:
+                raise KeyError(user)
+            # Extra users are local SQLite files; on Postgres every user shares SUPABASE_DB_URL
+            db = SpotifyDatabase(self.users[user]) if user else SpotifyDatabase()
+            with self._lock:
+                self._dbs.setdefault(user, db)
+        return self._dbs[user]
+
+    def version(self, user: str, db: SpotifyDatabase) -> int:
+        """The database's data generation, re-read at most every QUERY_API_VERSION_SECONDS"""
+        checked = self._versions.get(user)
+        if checked and time.monotonic() - checked[0] < config.QUERY_API_VERSION_SECONDS:
+            return checked[1]
+        with db.get_connection() as conn:
+            version = data_generation(conn)
+        self._versions[user] = (time.monotonic(), version)
+        return version
+
+    def get(self, path: str, user: str, start, end, limit) -> Tuple[_Entry, bool]:
+        """Cached response for a request, and whether it was a cache hit"""
+        db = self.database(user)
+        version = self.version(user, db)
+        key = (user, path, start, end, limit)
+        entry = self._lookup(key, version)
+        if entry:
+            return entry, True
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # Concurrent misses for the same key wait for one query instead of each running it
+        with key_lock:
+            entry = self._lookup(key, version)
+            if entry:
+                return entry, True
+            with db.get_connection() as conn:
+                payload = ENDPOINTS[path](conn, db._placeholder(), start, end, limit)
+            entry = _Entry(version, payload)
+            with self._lock:
+                self._cache[key] = entry
+                self._cache.move_to_end(key)
+                while len(self._cache) > config.QUERY_API_CACHE_ENTRIES:
+                    old, _ = self._cache.popitem(last=False)
+                    self._key_locks.pop(old, None)
+        return entry, False
+
+    def _lookup(self, key, version) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or entry.version != version:
+                return None
+            self._cache.move_to_end(key)
+            return entry
+
+
+# ── HTTP ──────────────────────────────────────────────────────────────────────
+class _Handler(BaseHTTPRequestHandler):
+    service: QueryService = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        endpoint = url.path.rstrip('/') or '/'
+        label = endpoint if endpoint in ENDPOINTS else 'other'
+        with metrics.QUERY_API_LATENCY.time(endpoint=label):
+            self._serve(endpoint, label, parse_qs(url.query))
+
+    def _serve(self, endpoint, label, query):
+        if endpoint not in ENDPOINTS:
+            self._error(404, f"unknown endpoint; try one of {', '.join(ENDPOINTS)}", label)
+            return
+        arg = lambda name: (query.get(name) or [None])[-1]
+        try:
+            start, end = parse_range(arg('range'))
+            limit = parse_limit(arg('limit'))
+            entry, hit = self.service.get(endpoint, arg('user') or '', start, end, limit)
+        except BadRequest as e:
+            self._error(400, str(e), label)
+            return
+        except KeyError:
+            self._error(404, f"unknown user {arg('user')!r}", label)
+            return
+        except Exception as e:
+            logger.exception(f"Query API {endpoint} failed")
+            self._error(500, type(e).__name__, label)
+            return
+
+        tags = [t.strip() for t in (self.headers.get('If-None-Match') or '').split(',')]
+        if entry.etag in tags or '*' in tags:
+            metrics.QUERY_API_REQUESTS.inc(endpoint=label, outcome='not_modified')
+            self.send_response(304)
+            self._cache_headers(entry)
+            self.end_headers()
+            return
+
+        metrics.QUERY_API_REQUESTS.inc(endpoint=label, outcome='hit' if hit else 'miss')
+        body = entry.body
+        use_gzip = entry.gzipped is not None and accepts_gzip(self.headers.get('Accept-Encoding'))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self._cache_headers(entry)
+        if use_gzip:
+            body = entry.gzipped
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _cache_headers(self, entry):
+        self.send_header('ETag', entry.etag)
+        self.send_header('Cache-Control', 'no-cache')   # clients may keep it, but revalidate
+        self.send_header('Vary', 'Accept-Encoding')
+
+    def _error(self, status, message, label):
+        metrics.QUERY_API_REQUESTS.inc(endpoint=label, outcome='error')
+        body = json.dumps({'error': message}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # one line per request would drown everything else
+
+
+def make_server(host: str = None, port: int = None, service: QueryService = None) -> ThreadingHTTPServer:
+    """Bound (not yet serving) server; port 0 picks a free port"""
+    handler = type('QueryHandler', (_Handler,), {'service': service or QueryService()})
+    host = host or config.QUERY_API_HOST
+    port = config.QUERY_API_PORT if port is None else port
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve read-only listening stats over HTTP')
+    parser.add_argument('--host', default=None, help=f'bind address (default {config.QUERY_API_HOST})')
+    parser.add_argument('--port', type=int, default=None, help=f'port (default {config.QUERY_API_PORT})')
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port)
+    host, port = server.server_address[:2]
+    logger.info(f"🌐 Query API on http://{host}:{port} ({', '.join(ENDPOINTS)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("🛑 Query API stopped")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+# replication.py
+# Offline-first replication between the local SQLite replica and Supabase.
+# With SPOTIFY_LOCAL_FIRST set (config.LOCAL_FIRST), ingest, the dashboard and
+# the query API all use spotify_data.db; this module keeps it in step with
+# the remote database (config.REMOTE_DB_URL):
+#   push  local tracks rows above the 'push' high-water mark go up SYNC_BATCH
+#         at a time in one remote transaction per cycle, merged on the natural
+#         key so a re-send is a no-op; the remote rollups are refreshed once,
+#         for every bucket the cycle touched, before that transaction commits
+#   pull  remote rows above the 'pull' mark come down through add_tracks, so
+#         local rollups stay exact, then the sketch and sessions catch up.
+#         Serial ids can commit out of order, so ids a pull steps over are
+#         kept in sync_gaps and re-checked each cycle until they show up or
+#         are SYNC_GAP_SECONDS old (rolled back, or burned by ON CONFLICT);
+#         rows we pushed ourselves come back too and are ignored as duplicates
+# The remote is migrated to the replica's schema version on first connect.
+# Marks live in the local sync_state table and only move after the remote
+# commit, so an interrupted cycle repeats work instead of losing rows.
+# metrics.SPOOL_DEPTH is the number of local rows not yet pushed.
+# The scheduler runs a cycle every SYNC_INTERVAL_SECONDS; by hand:
+#   python3 replication.py [--loop]
+
+import argparse
+import logging
+import time
+from typing import Dict, Optional
+
+import psycopg2
+import psycopg2.extras
+
+import config
+import database
+import heavy_hitters
+import metrics
+import sessions
+from database import SpotifyDatabase, refresh_rollups
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COLUMNS = 'date_played, time_played, track_id, track_name, artist_name, artist_id'
+
+
+class Replicator:
+
+    def __init__(self, db: SpotifyDatabase = None, remote_url: str = None):
+        if database.DB_BACKEND != 'sqlite':
+            raise RuntimeError("Replication runs against the local replica — set SPOTIFY_LOCAL_FIRST=1")
+        self.db = db or SpotifyDatabase()
+        self.remote_url = remote_url or config.REMOTE_DB_URL
+        if not self.remote_url:
+            raise RuntimeError("No remote database — set SUPABASE_DB_URL")
+        self._remote = None
+
+    # ── Local state ──────────────────────────────────────────────────────────
+    def mark(self, name: str) -> int:
+        with self.db.get_connection() as conn:
+            row = conn.execute('SELECT value FROM sync_state WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else 0
+
+    def _set_mark(self, conn, name: str, value: int):
+        conn.execute('''
+            INSERT INTO sync_state (name, value) VALUES (?, ?)
+            ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value
+        ''', (name, value))
+
+    def spool_depth(self) -> int:
+        with self.db.get_connection() as conn:
+            depth = conn.execute('SELECT COUNT(*) FROM tracks WHERE id > ?', (self.mark('push'),)).fetchone()[0]
+        metrics.SPOOL_DEPTH.set(depth)
+        return depth
+
+    def remote(self):
+        if self._remote is None or self._remote.closed:
+            conn = psycopg2.connect(self.remote_url, connect_timeout=5)
+            # The remote may be older than this code (or brand new): bring it
+            # to the same schema version as the replica before any row moves
+            try:
+                applied = database.migrate(conn, 'postgres')
+            except Exception:
+                conn.close()
+                raise
+            if applied:
+                logger.info(f"🔧 Remote schema migrated to v{applied[-1]}")
+            self._remote = conn
+        return self._remote
+
+    def close(self):
+        if self._remote is not None:
+            self._remote.close()
+            self._remote = None
+
+    # ── Push ─────────────────────────────────────────────────────────────────
+    def _spooled(self, after: int):
+        with self.db.get_connection() as conn:
+            return conn.execute(f'''
+                SELECT id, {COLUMNS} FROM tracks WHERE id > ? ORDER BY id LIMIT ?
+            ''', (after, config.SYNC_BATCH)).fetchall()
+
+    def push(self) -> int:
+        """Send local rows above the push mark; returns rows sent"""
+        last = self.mark('push')
+        rows = self._spooled(last)
+        if not rows:
+            return 0
+        sent, new, buckets = 0, 0, set()
+        remote = self.remote()
+        with remote.cursor() as cur:
+            while rows:
+                written = psycopg2.extras.execute_values(cur, f'''
+                    INSERT INTO tracks ({COLUMNS}) VALUES %s
+                    ON CONFLICT (date_played, time_played, track_id) DO UPDATE
+                        SET artist_id = EXCLUDED.artist_id
+                        WHERE tracks.artist_id IS NULL AND EXCLUDED.artist_id IS NOT NULL
+                    RETURNING CAST(date_played AS TEXT), EXTRACT(HOUR FROM time_played)::int
+                ''', [r[1:] for r in rows], page_size=500, fetch=True)
+                buckets.update((d, h) for d, h in written)
+                new += len(written)
+                sent += len(rows)
+                last = rows[-1][0]
+                rows = self._spooled(last)
+            if buckets:
+                refresh_rollups(cur, '%s', buckets, backend='postgres')
+        remote.commit()
+        with self.db.get_connection() as conn:
+            self._set_mark(conn, 'push', last)
+        logger.info(f"⬆ Pushed {sent} rows ({new} new remotely), through local id {last}")
+        return sent
+
+    # ── Pull ─────────────────────────────────────────────────────────────────
+    def _fetch_remote(self, where: str, params: list, limit: int = None):
+        if limit:
+            params = params + [limit]
+        with self.remote().cursor() as cur:
+            cur.execute(f'''
+                SELECT id, CAST(date_played AS TEXT), CAST(time_played AS TEXT),
+                       track_id, track_name, artist_name, artist_id
+                FROM tracks WHERE {where} ORDER BY id {'LIMIT %s' if limit else ''}
+            ''', params)
+            rows = cur.fetchall()
+        self.remote().commit()
+        return rows
+
+    def _pull_gaps(self) -> int:
+        """Re-check ids earlier pulls stepped over; returns rows new to the replica"""
+        cutoff = time.time() - config.SYNC_GAP_SECONDS
+        with self.db.get_connection() as conn:
+            expired = conn.execute('DELETE FROM sync_gaps WHERE seen_at < ?', (cutoff,)).rowcount
+            gaps = conn.execute('SELECT lo, hi, seen_at FROM sync_gaps ORDER BY lo').fetchall()
+        if expired:
+            logger.info(f"Wrote off {expired} remote id gaps older than {config.SYNC_GAP_SECONDS}s")
+        if not gaps:
+            return 0
+        rows = self._fetch_remote(
+            'EXISTS (SELECT 1 FROM unnest(%s::bigint[], %s::bigint[]) AS g(lo, hi) WHERE id BETWEEN g.lo AND g.hi)',
+            [[g[0] for g in gaps], [g[1] for g in gaps]])
+        if not rows:
+            return 0
+        inserted = self._apply(rows)
+        found = sorted(r[0] for r in rows)
+        with self.db.get_connection() as conn:
+            for lo, hi, seen_at in gaps:
+                inside = [i for i in found if lo <= i <= hi]
+                if not inside:
+                    continue
+                conn.execute('DELETE FROM sync_gaps WHERE lo = ?', (lo,))
+                self._add_gaps(conn, lo - 1, inside + [hi + 1], seen_at)
+        return inserted
+
+    def _add_gaps(self, conn, prev: int, ids, seen_at: float):
+        """Record the runs of ids missing between prev and each of ids in turn"""
+        for i in ids:
+            if i > prev + 1:
+                conn.execute('INSERT INTO sync_gaps (lo, hi, seen_at) VALUES (?, ?, ?)', (prev + 1, i - 1, seen_at))
+            prev = i
+
+    def pull(self) -> int:
+        """Fetch remote rows above the pull mark, and late ones below it; returns rows new to the replica"""
+        pulled = self._pull_gaps()
+        last = self.mark('pull')
+        while True:
+            rows = self._fetch_remote('id > %s', [last], limit=config.SYNC_BATCH)
+            if not rows:
+                break
+            pulled += self._apply(rows)
+            with self.db.get_connection() as conn:
+                self._add_gaps(conn, last, [r[0] for r in rows], time.time())
+                self._set_mark(conn, 'pull', rows[-1][0])
+            last = rows[-1][0]
+            if len(rows) < config.SYNC_BATCH:
+                break
+        if pulled:
+            try:
+                heavy_hitters.refresh(self.db)
+            except Exception as e:
+                logger.warning(f"Could not update heavy-hitters sketch: {e}")
+            try:
+                sessions.update(self.db)
+            except Exception as e:
+                logger.warning(f"Could not update listening sessions: {e}")
+        return pulled
+
+    def _apply(self, rows) -> int:
+        with self.db.get_connection() as conn:
+            before = conn.execute('SELECT COALESCE(MAX(id), 0) FROM tracks').fetchone()[0]
+        spool_empty = self.mark('push') >= before
+        inserted = self.db.add_tracks([r[1:] for r in rows])
+        if inserted and spool_empty:
+            with self.db.get_connection() as conn:
+                after = conn.execute('SELECT MAX(id) FROM tracks').fetchone()[0]
+                # Every new local id came from this pull (no ingest raced it),
+                # so there is nothing to push back
+                if after - before == inserted:
+                    self._set_mark(conn, 'push', after)
+        if inserted:
+            logger.info(f"⬇ Pulled {inserted} rows from other nodes")
+        return inserted
+
+    def sync_once(self) -> Dict:
+        """One push + pull cycle; remote failures are logged and retried next cycle"""
+        started = time.perf_counter()
+        stats = {'pushed': 0, 'pulled': 0, 'error': None}
+        try:
+            stats['pushed'] = self.push()
+            stats['pulled'] = self.pull()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            stats['error'] = str(e).strip()
+            logger.warning(f"⚠️ Replication paused, remote unavailable: {stats['error']}")
+            self.close()
+        except psycopg2.Error as e:
+            # Reachable but rejecting our SQL: a schema or data problem that
+            # retrying will not fix, so say so instead of calling it an outage
+            stats['error'] = str(e).strip()
+            logger.error(f"❌ Replication failed, remote schema error ({type(e).__name__}): {stats['error']}")
+            self.close()
+        stats['spool'] = self.spool_depth()
+        stats['duration'] = time.perf_counter() - started
+        return stats
+
+
+_replicator: Optional[Replicator] = None
+
+
+def sync_once() -> Dict:
+    global _replicator
+    if _replicator is None:
+        _replicator = Replicator()
+    return _replicator.sync_once()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync the local replica with Supabase')
+    parser.add_argument('--loop', action='store_true', help=f'repeat every {config.SYNC_INTERVAL_SECONDS}s')
+    args = parser.parse_args()
+    while True:
+        stats = sync_once()
+        logger.info(f"🔄 Sync: {stats['pushed']} pushed, {stats['pulled']} pulled, "
+                    f"{stats['spool']} waiting ({stats['duration']:.1f}s)")
+        if not args.loop:
+            break
+        time.sleep(config.SYNC_INTERVAL_SECONDS)
+
+
+if __name__ == '__main__':
+    main()
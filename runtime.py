@@ -0,0 +1,138 @@
+import logging
+import os
+import time
+from datetime import datetime
+
+import requests
+import spotipy
+from requests.adapters import HTTPAdapter
+from spotipy.oauth2 import SpotifyOAuth
+from urllib3.util.retry import Retry
+
+import metrics
+import pipeline
+import tracing
+from database import SpotifyDatabase
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SCOPE = 'playlist-modify-public user-read-currently-playing user-read-playback-state user-read-recently-played'
+TOKEN_REFRESH_MARGIN = 300   # refresh the access token this many seconds before expiry
+
+
+def build_auth_manager():
+    return SpotifyOAuth(
+        client_id=os.getenv('SPOTIPY_CLIENT_ID'),
+        client_secret=os.getenv('SPOTIPY_CLIENT_SECRET'),
+        redirect_uri=os.getenv('SPOTIPY_REDIRECT_URI'),
+        scope=SCOPE
+    )
+
+
+def build_session(*hooks) -> requests.Session:
+    """
+    requests session for the Spotify client with response hooks installed,
+    retrying as spotipy's own session does (429 and 5xx, honouring Retry-After)
+    """
+    session = requests.Session()
+    retry = Retry(total=spotipy.Spotify.max_retries, connect=None, read=False,
+                  allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+                  status=spotipy.Spotify.max_retries, backoff_factor=0.3,
+                  status_forcelist=spotipy.Spotify.default_retry_codes)
+    adapter = HTTPAdapter(max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.hooks['response'].extend(hooks)
+    return session
+
+
+class SpotifyRuntime:
+    """
+    Long-lived state for repeated tracker runs: one Spotify client, the user
+    profile fetched once, a persistent database connection and the On Repeat
+    playlist id. Each tick() only does the incremental fetch-and-sync work.
+    """
+
+    def __init__(self, db: SpotifyDatabase = None, auth: str = None, api_url: str = None,
+                 requests_timeout: int = 5):
+        # A fixed access token skips OAuth, and api_url replaces the Web API
+        # base URL (both for runs against fake_spotify.py)
+        self.auth_manager = None if auth else build_auth_manager()
+        session = build_session(self._count_call, metrics.observe_api_response)
+        self.sp = spotipy.Spotify(auth=auth, auth_manager=self.auth_manager, requests_session=session,
+                                  requests_timeout=requests_timeout)
+        if api_url:
+            self.sp.prefix = f"{api_url.rstrip('/')}/v1/"
+        self.db = db or SpotifyDatabase(persistent=True)
+        self.user = None
+        self.playlist_id = None
+        self.api_calls = 0
+        # Set by the scheduler when several instances may run (see leader.py)
+        self.leader = None
+        # Kept across ticks so unchanged stage outputs can skip downstream work
+        self.pipeline = pipeline.tracker_pipeline()
+
+    def _count_call(self, response, *args, **kwargs):
+        self.api_calls += 1
+
+    @property
+    def user_id(self):
+        return self.user['id']
+
+    def connect(self) -> bool:
+        """Authenticate and cache the user profile (the only current_user call)"""
+        try:
+            self.user = self.sp.current_user()
+            if not self.user:
+                raise Exception("Failed to get user info")
+            logger.info(f"Authenticated as {self.user.get('display_name') or self.user['id']}")
+            return True
+        except spotipy.SpotifyException as e:
+            logger.error(f"Spotify authentication failed: {e}")
+        except Exception as e:
+            logger.error(f"Authentication error: {e}")
+        return False
+
+    def ensure_fresh_token(self):
+        """Refresh proactively so a tick never stalls on an expired token mid-run"""
+        if self.auth_manager is None:
+            return
+        token_info = self.auth_manager.get_cached_token()
+        if not token_info or 'refresh_token' not in token_info:
+            return
+        remaining = token_info['expires_at'] - int(time.time())
+        if remaining < TOKEN_REFRESH_MARGIN:
+            logger.info(f"Access token expires in {remaining}s — refreshing")
+            self.auth_manager.refresh_access_token(token_info['refresh_token'])
+
+    def tick(self, on_stage=None) -> dict:
+        """
+        One incremental run through the staged pipeline (fetch, qualify, persist,
+        rank, sync); on_stage(name) is called as each stage starts
+        """
+        if self.user is None and not self.connect():
+            raise RuntimeError("Spotify authentication failed")
+        self.ensure_fresh_token()
+
+        started = time.perf_counter()
+        calls_before = self.api_calls
+
+        ctx = {'runtime': self, 'sp': self.sp, 'db': self.db, 'on_stage': on_stage}
+        with tracing.profile_run('tick'):
+            timings = self.pipeline.run(ctx)
+            logger.debug('Logging the tracks - done ✅')
+
+        stats = {
+            'finished_at': datetime.now(),
+            'duration': time.perf_counter() - started,
+            'api_calls': self.api_calls - calls_before,
+            'logged': bool(timings.get('persist') is not None and ctx.get('persist')),
+            'stages': timings,
+        }
+        stage_report = ', '.join(f"{name} {t:.2f}s" if t is not None else f"{name} skipped" for name, t in timings.items())
+        logger.info(f"Tick finished in {stats['duration']:.2f}s with {stats['api_calls']} Spotify API calls ({stage_report})")
+        return stats
+
+    def close(self):
+        self.db.close()
@@ -10,7 +10,12 @@ from pathlib import Path
 # Import your existing modules
 try:
     from main import main as run_spotify_tracker
-    from config import TRACK_LOG_FILE
+    from runtime import SpotifyRuntime
+    from polling import PlayRateModel
+    import metrics
+    import leader
+    import config
+    import jobs
 except ImportError:
     print("❌ Error: Cannot import main modules. Make sure main.py and config.py exist.")
     sys.exit(1)
@@ -24,6 +29,13 @@ class SpotifyScheduler:
         self.successful_runs = 0
         self.failed_runs = 0
         self.start_time = datetime.now()
+        # Long-lived client/user/DB context, built on the first run
+        self.runtime = None
+        # Only the elected instance runs jobs for a user (see leader.py)
+        self.leader = None
+        self.last_sync = None
+        # Woken by jobs.JobQueue.enqueue from any process (see jobs.py)
+        self.job_signal = jobs.JobSignal()
         
     def setup_logging(self):
         """Configure logging for scheduler"""
@@ -40,19 +52,43 @@ class SpotifyScheduler:
         )
         self.logger = logging.getLogger("SpotifyScheduler")
         
+    def is_leader(self):
+        """Connect if needed and take/renew this user's lease; standbys skip the run"""
+        try:
+            if self.runtime is None:
+                self.runtime = SpotifyRuntime()
+            if self.leader is None:
+                if not self.runtime.connect():
+                    return False
+                self.leader = leader.for_user(self.runtime.user_id)
+                self.runtime.leader = self.leader
+            return self.leader.acquire()
+        except Exception as e:
+            self.logger.error(f"Leader election failed: {e}")
+            return False
+
     def run_tracker(self):
         """Execute the main tracking function with error handling"""
+        if not self.is_leader():
+            self.logger.info("⏸ Standby — another instance is running jobs for this user")
+            return
+
         run_start = datetime.now()
         self.runs_today += 1
         
         self.logger.info(f"🚀 Starting tracker run #{self.runs_today}")
         
         try:
-            # Run your existing main function
-            run_spotify_tracker()
+            if self.runtime is None:
+                self.runtime = SpotifyRuntime()
+
+            # Run your existing main function with the shared runtime
+            run_spotify_tracker(self.runtime)
             
             self.successful_runs += 1
             run_duration = (datetime.now() - run_start).total_seconds()
+            metrics.RUN_DURATION.observe(run_duration, status='success')
+            metrics.RUNS.inc(status='success')
             
             self.logger.info(f"✅ Run #{self.runs_today} completed successfully in {run_duration:.1f}s")
             
@@ -62,15 +98,60 @@ class SpotifyScheduler:
         except Exception as e:
             self.failed_runs += 1
             self.logger.error(f"❌ Run #{self.runs_today} failed: {str(e)}")
+            metrics.RUN_DURATION.observe((datetime.now() - run_start).total_seconds(), status='failure')
+            metrics.RUNS.inc(status='failure')
+            # Start from a fresh client and connection next time
+            if self.runtime is not None:
+                self.runtime.close()
+                self.runtime = None
+                if self.leader is not None:
+                    self.leader.release()
+                    self.leader = None
             
             # Optional: Send notification about failure
             self.handle_failure(e)
     
+    def run_queued_jobs(self):
+        """Run ingest jobs queued from the dashboard (see jobs.py); leader only"""
+        if self.runtime is None or self.leader is None or not self.leader.is_leader:
+            return
+        try:
+            if jobs.run_pending(self.runtime):
+                self.check_data_growth()
+        except Exception as e:
+            self.logger.error(f"Queued job processing failed: {e}")
+
+    def run_replication(self):
+        """Push/pull the local replica every SYNC_INTERVAL_SECONDS (see replication.py)"""
+        if not config.LOCAL_FIRST or not config.REMOTE_DB_URL:
+            return
+        if self.last_sync and (datetime.now() - self.last_sync).total_seconds() < config.SYNC_INTERVAL_SECONDS:
+            return
+        self.last_sync = datetime.now()
+        try:
+            import replication
+            stats = replication.sync_once()
+            if stats['pushed'] or stats['pulled']:
+                self.logger.info(f"🔄 Synced with Supabase: {stats['pushed']} pushed, {stats['pulled']} pulled, {stats['spool']} waiting")
+        except Exception as e:
+            self.logger.error(f"Replication failed: {e}")
+
+    def seconds_until_sync(self):
+        """Seconds until run_replication is due; None when replication is off"""
+        if not config.LOCAL_FIRST or not config.REMOTE_DB_URL:
+            return None
+        if self.last_sync is None:
+            return 0
+        return config.SYNC_INTERVAL_SECONDS - (datetime.now() - self.last_sync).total_seconds()
+
     def check_data_growth(self):
         from database import SpotifyDatabase
-        db = SpotifyDatabase()
-        conn = db.conn
-        count = conn.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+        db = self.runtime.db if self.runtime is not None else SpotifyDatabase()
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM tracks")
+            count = cursor.fetchone()[0]
+        metrics.TRACKS_TOTAL.set(count)
         self.logger.info(f"📊 Current track count: {count}")
     
     def handle_failure(self, error):
@@ -117,8 +198,10 @@ class SpotifyScheduler:
     def start(self):
         """Start the scheduler loop"""
         self.logger.info("🎵 Starting Spotify Tracker Scheduler...")
-        self.logger.info(f"💾 Data will be saved to: {TRACK_LOG_FILE}")
+        self.logger.info(f"💾 Data will be saved to: {'Supabase' if config.SUPABASE_DB_URL else config.DATABASE_PATH}"
+                         f"{' (replicated to Supabase)' if config.LOCAL_FIRST and config.REMOTE_DB_URL else ''}")
         
+        metrics.start_server()
         self.setup_schedules()
         
         # Run once immediately to test
@@ -127,60 +210,81 @@ class SpotifyScheduler:
         
         self.logger.info("⏰ Scheduler is now running. Press Ctrl+C to stop.")
         
+        last_status = datetime.now()
         try:
             while True:
                 schedule.run_pending()
-                time.sleep(60)  # Check every minute
-                
+
                 # Print status every hour
-                if datetime.now().minute == 0:
+                if (datetime.now() - last_status).total_seconds() >= 3600:
                     self.print_status()
+                    last_status = datetime.now()
+
+                # Sleep until the next scheduled run or replication cycle,
+                # or until the dashboard enqueues a job
+                idle = schedule.idle_seconds()
+                waits = [w for w in (idle if idle is not None else 60, self.seconds_until_sync()) if w is not None]
+                self.job_signal.wait(max(min(waits), 1))
+                self.run_queued_jobs()
+                self.run_replication()
                     
         except KeyboardInterrupt:
             self.logger.info("\n🛑 Scheduler stopped by user")
             self.print_status()
+            if self.leader is not None:
+                self.leader.release()   # hand over immediately instead of waiting for expiry
+            self.job_signal.close()
         except Exception as e:
             self.logger.error(f"💥 Scheduler crashed: {e}")
             raise
 
 # Enhanced version with smart scheduling
 class SmartSpotifyScheduler(SpotifyScheduler):
-    """Intelligent scheduler that adapts based on listening patterns"""
+    """
+    Rate-predictive scheduler: after every run it re-estimates plays per
+    minute (hour-of-week profile + the rate observed right now) and schedules
+    the next run just before the 50-play recently-played window could overflow.
+    """
     
     def __init__(self):
         super().__init__()
+        self.rate_model = PlayRateModel()
         self.listening_hours = self.detect_listening_patterns()
     
+    def refresh_rate_model(self):
+        from database import SpotifyDatabase
+        db = self.runtime.db if self.runtime is not None else SpotifyDatabase()
+        try:
+            self.rate_model.refresh(db)
+        except Exception as e:
+            self.logger.warning(f"Could not refresh play-rate model: {e}")
+
     def detect_listening_patterns(self):
         """Analyze existing data to determine when user typically listens"""
-        from database import SpotifyDatabase
-        import sqlite3
-        db = SpotifyDatabase()
-        rows = db.conn.execute("SELECT time_played FROM tracks").fetchall()
-        if len(rows) < 10:
-            return list(range(7, 24))
-        hours = [int(r[0].split(":")[0]) for r in rows if r[0]]
-        from collections import Counter
-        counts = Counter(hours)
-        threshold = len(rows) * 0.05
-        active = sorted([h for h, c in counts.items() if c > threshold])
-        return active or list(range(7, 24))
-        
+        self.refresh_rate_model()
+        return self.rate_model.active_hours() or list(range(7, 24))
+
+    def plan_next_run(self):
+        """(Re)schedule the single adaptive job from the current rate estimate"""
+        delay = self.rate_model.next_poll_delay()
+        schedule.clear('adaptive')
+        schedule.every(max(int(delay.total_seconds()), 1)).seconds.do(self.run_tracker).tag('adaptive')
+        self.logger.info(
+            f"📈 Next run in {delay.total_seconds() / 60:.1f} min "
+            f"(now {self.rate_model.recent_rate * 60:.1f} plays/h, "
+            f"profile {self.rate_model.rate_at(datetime.now()) * 60:.1f} plays/h)"
+        )
+
+    def run_tracker(self):
+        """Run, then re-plan the next run from the freshly logged plays"""
+        super().run_tracker()
+        self.refresh_rate_model()
+        self.plan_next_run()
     
     def setup_schedules(self):
-        """Set up schedules based on detected listening patterns"""
+        """Set up the first adaptive run; each run plans the next one"""
         schedule.clear()
-        
-        current_hour = datetime.now().hour
-        
-        if current_hour in self.listening_hours:
-            # Frequent checks during active hours
-            schedule.every(15).minutes.do(self.run_tracker).tag('active')
-            self.logger.info("📈 Using frequent schedule (active hours) - every 15 minutes")
-        else:
-            # Less frequent during inactive hours
-            schedule.every(60).minutes.do(self.run_tracker).tag('inactive')
-            self.logger.info("📉 Using reduced schedule (inactive hours) - every 60 minutes")
+        self.plan_next_run()
 
 # Command-line interface
 def main():
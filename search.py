@@ -0,0 +1,207 @@
+# search.py
+# Server-side search + keyset pagination for the dashboard's long lists.
+#   - name matching uses the tracks_fts FTS5 trigram index on SQLite and the
+#     pg_trgm GIN indexes on Postgres (both created by database migration 5,
+#     when the build allows; otherwise a LIKE scan), so "contains" searches
+#     cover the whole history, not the first 200 rows
+#   - pages continue from the last row of the previous page (a cursor tuple)
+#     instead of OFFSET, so page N costs the same as page 1
+#   - the play-count chart ranks the track_totals rollup (one row per track),
+#     not a GROUP BY over every play
+#
+# Functions take a DB-API connection plus its backend ('postgres' | 'sqlite')
+# so both SpotifyDatabase and the dashboard's SQLAlchemy engine can use them,
+# and return (rows as dicts, cursor for the next page or None).
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TRIGRAM_MIN = 3   # FTS5 trigram queries need at least 3 characters
+
+CHART_SORTS = {
+    # sort key -> (ORDER BY, keyset columns, comparison); 'plays' mixes
+    # directions, so its keyset is spelled out in top_tracks_page
+    'plays':     ('plays DESC, track_id ASC', ('plays', 'track_id'), None),
+    'name_asc':  ('track_name ASC, track_id ASC', ('track_name', 'track_id'), '>'),
+    'name_desc': ('track_name DESC, track_id DESC', ('track_name', 'track_id'), '<'),
+}
+
+RECENT_SORTS = {
+    'newest':   ('date_played DESC, time_played DESC, id DESC', ('date_played', 'time_played', 'id'), '<'),
+    'oldest':   ('date_played ASC, time_played ASC, id ASC', ('date_played', 'time_played', 'id'), '>'),
+    'name_asc': ('track_name ASC, id ASC', ('track_name', 'id'), '>'),
+}
+
+
+def _placeholder(backend: str) -> str:
+    return '%s' if backend == 'postgres' else '?'
+
+
+def _like_pattern(query: str) -> str:
+    escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def _has_fts(conn) -> bool:
+    """Whether migration 5 managed to create tracks_fts (it needs FTS5 + SQLite 3.34+)"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tracks_fts'")
+    return cursor.fetchone() is not None
+
+
+def _match_clause(conn, backend: str, query: str, p: str) -> Tuple[str, list]:
+    """WHERE fragment selecting tracks rows whose track or artist name contains query"""
+    if backend == 'sqlite' and len(query) >= TRIGRAM_MIN and _has_fts(conn):
+        phrase = '"' + query.replace('"', '""') + '"'
+        return f"id IN (SELECT rowid FROM tracks_fts WHERE tracks_fts MATCH {p})", [phrase]
+    if backend == 'postgres':
+        # ILIKE with a leading wildcard is served by the gin_trgm_ops indexes
+        pattern = _like_pattern(query)
+        return f"(track_name ILIKE {p} ESCAPE '\\' OR artist_name ILIKE {p} ESCAPE '\\')", [pattern, pattern]
+    # Too short for trigrams, or no FTS5 index; plain scan
+    pattern = _like_pattern(query.lower())
+    return (f"(LOWER(track_name) LIKE {p} ESCAPE '\\' OR LOWER(artist_name) LIKE {p} ESCAPE '\\')",
+            [pattern, pattern])
+
+
+def _keyset(columns: Tuple[str, ...], op: str, cursor: Optional[Tuple], p: str) -> Tuple[str, list]:
+    if cursor is None:
+        return '', []
+    cols = ', '.join(columns)
+    marks = ', '.join([p] * len(columns))
+    return f"AND ({cols}) {op} ({marks})", list(cursor)
+
+
+def _fetch_page(conn, sql: str, params: list, limit: int, key_columns: Tuple[str, ...]):
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    names = [d[0] for d in cursor.description]
+    rows = [dict(zip(names, r)) for r in cursor.fetchall()]
+    # One extra row was requested to know whether another page exists
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = tuple(rows[-1][c] for c in key_columns)
+    return rows, next_cursor
+
+
+def _after(p: str) -> str:
+    """Tracks ranked after (plays, track_id) in the plays DESC, track_id ASC ranking"""
+    return f"(plays < {p} OR (plays = {p} AND track_id > {p}))"
+
+
+def _span_ranks(conn, p: str, cursor: Optional[Tuple], rows: List[Dict]) -> Dict[str, int]:
+    """
+    Ranks of a search page's tracks, numbering only the stretch of the ranking
+    between the previous page's last row (whose rank the cursor carries) and
+    this page's last row
+    """
+    base, where, params = 0, [], []
+    if cursor is not None:
+        plays, track_id, base = cursor
+        where.append(_after(p))
+        params += [plays, plays, track_id]
+    last = rows[-1]
+    where.append(f"NOT {_after(p)}")
+    params += [last['plays'], last['plays'], last['track_id']]
+    ids = [r['track_id'] for r in rows]
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT track_id, rank FROM (
+            SELECT track_id, ROW_NUMBER() OVER (ORDER BY plays DESC, track_id ASC) AS rank
+            FROM track_totals
+            WHERE {' AND '.join(where)}
+        ) span
+        WHERE track_id IN ({', '.join([p] * len(ids))})
+    ''', params + ids)
+    return {track_id: base + rank for track_id, rank in cursor.fetchall()}
+
+
+def top_tracks_page(conn, backend: str, query: str = '', sort: str = 'plays', min_plays: int = 1,
+                    cursor: Optional[Tuple] = None, limit: int = 50) -> Tuple[List[Dict], Optional[Tuple]]:
+    """
+    One page of the play-count ranking. rank is the track's position in the
+    full ranking, whatever the search or sort, so numbering stays stable.
+    """
+    p = _placeholder(backend)
+    order, key_columns, op = CHART_SORTS[sort]
+    match_sql, params = ('', [])
+    query = (query or '').strip()
+    if query:
+        clause, match_params = _match_clause(conn, backend, query, p)
+        match_sql = f"AND track_id IN (SELECT track_id FROM tracks WHERE {clause})"
+        params += match_params
+
+    # track_totals holds one row per track (kept by database.refresh_rollups)
+    if sort != 'plays':
+        # Alphabetical pages still need each track's place in the play ranking
+        keyset_sql, keyset_params = _keyset(key_columns, op, cursor, p)
+        sql = f'''
+            WITH ranked AS (
+                SELECT track_id, track_name, artist_name, plays,
+                       ROW_NUMBER() OVER (ORDER BY plays DESC, track_id ASC) AS rank
+                FROM track_totals
+            )
+            SELECT rank, track_id, track_name, artist_name, plays
+            FROM ranked
+            WHERE plays >= {p} {match_sql} {keyset_sql}
+            ORDER BY {order}
+            LIMIT {p}
+        '''
+        return _fetch_page(conn, sql, [min_plays] + params + keyset_params + [limit + 1], limit, key_columns)
+
+    # The ranking itself: continue from the cursor down idx_track_totals_rank,
+    # carrying the last rank so nothing is renumbered from the top
+    keyset_sql, keyset_params, base = '', [], 0
+    if cursor is not None:
+        keyset_sql = f"AND {_after(p)}"
+        keyset_params = [cursor[0], cursor[0], cursor[1]]
+        base = cursor[2]
+    sql = f'''
+        SELECT track_id, track_name, artist_name, plays
+        FROM track_totals
+        WHERE plays >= {p} {match_sql} {keyset_sql}
+        ORDER BY {order}
+        LIMIT {p}
+    '''
+    rows, next_cursor = _fetch_page(conn, sql, [min_plays] + params + keyset_params + [limit + 1], limit, key_columns)
+    if not rows:
+        return rows, None
+    # Without a search the page is a contiguous stretch of the ranking
+    ranks = (_span_ranks(conn, p, cursor, rows) if query
+             else {row['track_id']: base + i + 1 for i, row in enumerate(rows)})
+    rows = [{'rank': ranks[row['track_id']], **row} for row in rows]
+    if next_cursor is not None:
+        next_cursor = next_cursor + (rows[-1]['rank'],)
+    return rows, next_cursor
+
+
+def recent_plays_page(conn, backend: str, query: str = '', sort: str = 'newest',
+                      cursor: Optional[Tuple] = None, limit: int = 50) -> Tuple[List[Dict], Optional[Tuple]]:
+    """One page of the play history, newest first by default"""
+    p = _placeholder(backend)
+    order, key_columns, op = RECENT_SORTS[sort]
+    where, params = 'TRUE' if backend == 'postgres' else '1 = 1', []
+    query = (query or '').strip()
+    if query:
+        where, params = _match_clause(conn, backend, query, p)
+    keyset_sql, keyset_params = _keyset(key_columns, op, cursor, p)
+
+    sql = f'''
+        SELECT id, date_played, time_played, track_id, track_name, artist_name
+        FROM tracks
+        WHERE {where} {keyset_sql}
+        ORDER BY {order}
+        LIMIT {p}
+    '''
+    rows, next_cursor = _fetch_page(conn, sql, params + keyset_params + [limit + 1], limit, key_columns)
+    for row in rows:
+        row['date_played'] = str(row['date_played'])
+        row['time_played'] = str(row['time_played'])
+    if next_cursor is not None:
+        next_cursor = tuple(str(v) if c in ('date_played', 'time_played') else v
+                            for c, v in zip(key_columns, next_cursor))
+    return rows, next_cursor
@@ -0,0 +1,371 @@
+# sessions.py
+# Incremental sessionization and repeat-streak detection over the play log.
+# Runs after every ingest (see track_logger.persist_tracks); to rebuild from scratch:
+#   python3 sessions.py --rebuild
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import config
+import database
+from database import SpotifyDatabase
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TS_FORMAT = '%Y-%m-%d %H:%M:%S'
+FLUSH_EVERY = 1000
+
+
+def _parse_ts(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    return datetime.strptime(str(value)[:19], TS_FORMAT)
+
+
+def _fmt_ts(value: datetime) -> str:
+    return value.strftime(TS_FORMAT)
+
+
+class Sessionizer:
+    """
+    Single linear pass over plays logged since the stored cursor.
+
+    - A session is a run of plays with no gap longer than SESSION_GAP_MINUTES.
+    - A 'consecutive' streak is the same track STREAK_MIN_PLAYS+ times in a
+      row within one session.
+    - A 'window' streak is a chain of REPEAT_MIN_PLAYS+ plays of one track
+      where each play is at most REPEAT_WINDOW_HOURS after the previous one.
+
+    The open session, the running streak and the live per-track chains are
+    persisted in session_state / track_repeat_state, so the next run picks up
+    exactly where this one stopped. Plays that arrive older than the cursor
+    (imports, replication) rewind it to the last quiet gap before them, where
+    no session or chain is open, and everything from there is redone.
+    """
+
+    def __init__(self, db: SpotifyDatabase = None):
+        self.db = db or SpotifyDatabase()
+        self.p = self.db._placeholder()
+        self.session_gap = timedelta(minutes=config.SESSION_GAP_MINUTES)
+        self.repeat_window = timedelta(hours=config.REPEAT_WINDOW_HOURS)
+
+    # ── State ────────────────────────────────────────────────────────────────
+    def _load_state(self, cursor):
+        cursor.execute('''
+            SELECT last_row_id, CAST(last_played_at AS TEXT), session_id, streak_track_id,
+                   CAST(streak_started_at AS TEXT), streak_plays, streak_id
+            FROM session_state WHERE id = 1
+        ''')
+        row = cursor.fetchone()
+        if row:
+            self.last_row_id, last_played, self.session_id, self.streak_track_id, \
+                streak_started, self.streak_plays, self.streak_id = row
+            self.last_played = _parse_ts(last_played)
+            self.streak_started = _parse_ts(streak_started)
+        else:
+            self.last_row_id, self.last_played, self.session_id = 0, None, None
+            self.streak_track_id, self.streak_started, self.streak_plays, self.streak_id = None, None, 0, None
+
+        self.session = None
+        if self.session_id is not None:
+            cursor.execute(f'''
+                SELECT CAST(started_at AS TEXT), plays FROM listening_sessions WHERE id = {self.p}
+            ''', (self.session_id,))
+            row = cursor.fetchone()
+            if row:
+                self.session = {'started_at': _parse_ts(row[0]), 'ended_at': self.last_played, 'plays': row[1]}
+            else:
+                self.session_id = None
+
+        cursor.execute('''
+            SELECT track_id, CAST(chain_started_at AS TEXT), CAST(last_played_at AS TEXT), chain_plays, streak_id
+            FROM track_repeat_state
+        ''')
+        self.chains = {
+            track_id: {'started_at': _parse_ts(started), 'last_played': _parse_ts(last),
+                       'plays': plays, 'streak_id': streak_id}
+            for track_id, started, last, plays, streak_id in cursor.fetchall()
+        }
+
+    def _save_state(self, cursor):
+        p = self.p
+        cursor.execute('DELETE FROM session_state WHERE id = 1')
+        cursor.execute(f'''
+            INSERT INTO session_state (id, last_row_id, last_played_at, session_id, streak_track_id,
+                                       streak_started_at, streak_plays, streak_id)
+            VALUES (1, {p}, {p}, {p}, {p}, {p}, {p}, {p})
+        ''', (self.last_row_id, _fmt_ts(self.last_played) if self.last_played else None, self.session_id,
+              self.streak_track_id, _fmt_ts(self.streak_started) if self.streak_started else None,
+              self.streak_plays, self.streak_id))
+
+        self._prune_chains()
+        cursor.execute('DELETE FROM track_repeat_state')
+        cursor.executemany(f'''
+            INSERT INTO track_repeat_state (track_id, chain_started_at, last_played_at, chain_plays, streak_id)
+            VALUES ({p}, {p}, {p}, {p}, {p})
+        ''', [(track_id, _fmt_ts(c['started_at']), _fmt_ts(c['last_played']), c['plays'], c['streak_id'])
+              for track_id, c in self.chains.items()])
+
+    def _rewind_point(self, cursor, start_id: int) -> Optional[datetime]:
+        """
+        None if every new play is at or after the cursor; otherwise the first
+        play after the last gap longer than both SESSION_GAP_MINUTES and
+        REPEAT_WINDOW_HOURS before the earliest late play (or the first play)
+        """
+        if self.last_played is None:
+            return None
+        cursor.execute(f'''
+            SELECT CAST(date_played AS TEXT), CAST(time_played AS TEXT) FROM tracks
+            WHERE id > {self.p} ORDER BY date_played, time_played LIMIT 1
+        ''', (start_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        earliest = _parse_ts(f"{row[0]} {str(row[1])[:8]}")
+        if earliest >= self.last_played:
+            return None
+        quiet = max(self.session_gap, self.repeat_window)
+        # Walk back through idx_played_at until the history goes quiet
+        walker = self.db.stream_cursor(cursor.connection, 'sessionize_rewind')
+        walker.execute(f'''
+            SELECT CAST(date_played AS TEXT), CAST(time_played AS TEXT) FROM tracks
+            WHERE date_played <= {self.p}
+            ORDER BY date_played DESC, time_played DESC
+        ''', (earliest.strftime('%Y-%m-%d'),))
+        after = earliest
+        try:
+            while True:
+                rows = walker.fetchmany(FLUSH_EVERY)
+                if not rows:
+                    return after
+                for date_played, time_played in rows:
+                    ts = _parse_ts(f"{date_played} {str(time_played)[:8]}")
+                    if ts > earliest:
+                        continue
+                    if after - ts > quiet:
+                        return after
+                    after = ts
+        finally:
+            walker.close()
+
+    def _rewind(self, cursor, since: datetime):
+        """Forget sessions, streaks and chain state from since on; nothing before it is still open"""
+        for table in ('listening_sessions', 'repeat_streaks'):
+            cursor.execute(f"DELETE FROM {table} WHERE started_at >= {self.p}", (_fmt_ts(since),))
+        cursor.execute('DELETE FROM track_repeat_state')
+        self.last_played, self.session, self.session_id = None, None, None
+        self.streak_track_id, self.streak_started, self.streak_plays, self.streak_id = None, None, 0, None
+        self.chains = {}
+
+    def _prune_chains(self):
+        if self.last_played is None:
+            return
+        cutoff = self.last_played - self.repeat_window
+        self.chains = {k: c for k, c in self.chains.items() if c['last_played'] >= cutoff}
+
+    # ── Writes ───────────────────────────────────────────────────────────────
+    def _insert_returning_id(self, cursor, sql: str, params) -> int:
+        if database.DB_BACKEND == 'postgres':
+            cursor.execute(sql + ' RETURNING id', params)
+            return cursor.fetchone()[0]
+        cursor.execute(sql, params)
+        return cursor.lastrowid
+
+    def _new_session(self, cursor, ts: datetime):
+        self.session_id = self._insert_returning_id(cursor, f'''
+            INSERT INTO listening_sessions (started_at, ended_at, plays) VALUES ({self.p}, {self.p}, 0)
+        ''', (_fmt_ts(ts), _fmt_ts(ts)))
+        self.session = {'started_at': ts, 'ended_at': ts, 'plays': 0}
+        self.sessions_created += 1
+
+    def _record_streak(self, cursor, kind: str, streak_id: Optional[int], play: Dict,
+                       started_at: datetime, plays: int) -> int:
+        if streak_id is None:
+            streak_id = self._insert_returning_id(cursor, f'''
+                INSERT INTO repeat_streaks (track_id, track_name, artist_name, kind, started_at, ended_at, plays)
+                VALUES ({self.p}, {self.p}, {self.p}, {self.p}, {self.p}, {self.p}, {self.p})
+            ''', (play['track_id'], play['track_name'], play['artist_name'], kind,
+                  _fmt_ts(started_at), _fmt_ts(play['ts']), plays))
+            self.streaks_created += 1
+        else:
+            self.dirty_streaks[streak_id] = (_fmt_ts(play['ts']), plays)
+        return streak_id
+
+    def _flush(self, cursor):
+        p = self.p
+        if self.dirty_sessions:
+            cursor.executemany(f'''
+                UPDATE listening_sessions
+                SET ended_at = {p}, plays = {p}, duration_seconds = {p},
+                    unique_tracks = (
+                        SELECT COUNT(DISTINCT track_id) FROM tracks
+                        WHERE date_played BETWEEN {p} AND {p}
+                          AND CAST(date_played AS TEXT) || ' ' || CAST(time_played AS TEXT) BETWEEN {p} AND {p}
+                    )
+                WHERE id = {p}
+            ''', [(_fmt_ts(s['ended_at']), s['plays'], int((s['ended_at'] - s['started_at']).total_seconds()),
+                   s['started_at'].strftime('%Y-%m-%d'), s['ended_at'].strftime('%Y-%m-%d'),
+                   _fmt_ts(s['started_at']), _fmt_ts(s['ended_at']), session_id)
+                  for session_id, s in self.dirty_sessions.items()])
+            self.dirty_sessions = {}
+        if self.dirty_streaks:
+            cursor.executemany(f'''
+                UPDATE repeat_streaks SET ended_at = {p}, plays = {p} WHERE id = {p}
+            ''', [(ended, plays, streak_id) for streak_id, (ended, plays) in self.dirty_streaks.items()])
+            self.dirty_streaks = {}
+
+    # ── Pass ─────────────────────────────────────────────────────────────────
+    def _process(self, cursor, play: Dict):
+        ts = play['ts']
+
+        # Sessions
+        if self.session is None or ts - self.last_played > self.session_gap:
+            self._new_session(cursor, ts)
+            self.streak_track_id, self.streak_plays, self.streak_id = None, 0, None
+        self.session['plays'] += 1
+        self.session['ended_at'] = ts
+        self.dirty_sessions[self.session_id] = self.session
+
+        # Back-to-back streaks (reset by a new session above)
+        if play['track_id'] == self.streak_track_id:
+            self.streak_plays += 1
+        else:
+            self.streak_track_id, self.streak_started, self.streak_plays, self.streak_id = \
+                play['track_id'], ts, 1, None
+        if self.streak_plays >= config.STREAK_MIN_PLAYS:
+            self.streak_id = self._record_streak(cursor, 'consecutive', self.streak_id, play,
+                                                 self.streak_started, self.streak_plays)
+
+        # Windowed repeats
+        chain = self.chains.get(play['track_id'])
+        if chain and ts - chain['last_played'] <= self.repeat_window:
+            chain['plays'] += 1
+            chain['last_played'] = ts
+        else:
+            chain = self.chains[play['track_id']] = {'started_at': ts, 'last_played': ts,
+                                                     'plays': 1, 'streak_id': None}
+        if chain['plays'] >= config.REPEAT_MIN_PLAYS:
+            chain['streak_id'] = self._record_streak(cursor, 'window', chain['streak_id'], play,
+                                                     chain['started_at'], chain['plays'])
+
+        self.last_played = ts
+
+    def run(self) -> Dict:
+        """Process every play logged since the last run; returns a summary"""
+        self.sessions_created = self.streaks_created = 0
+        self.dirty_sessions, self.dirty_streaks = {}, {}
+        processed = late = 0
+
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            self._load_state(cursor)
+            start_id = self.last_row_id
+            max_id = start_id
+            cursor_ts = self.last_played
+
+            since = self._rewind_point(cursor, start_id)
+            if since is not None:
+                logger.info(f"↺ Plays arrived older than the session cursor ({_fmt_ts(cursor_ts)}) "
+                            f"— re-sessionizing from {_fmt_ts(since)}")
+                self._rewind(cursor, since)
+                where, params = (f"(date_played > {self.p} OR (date_played = {self.p} AND time_played >= {self.p}))",
+                                 (since.strftime('%Y-%m-%d'), since.strftime('%Y-%m-%d'), since.strftime('%H:%M:%S')))
+            else:
+                where, params = f"id > {self.p}", (start_id,)
+
+            # Separate cursor for the read so the writes above don't reset it.
+            # Rows are inserted newest-first per batch, so order by play time.
+            reader = self.db.stream_cursor(conn, 'sessionize')
+            reader.execute(f'''
+                SELECT id, CAST(date_played AS TEXT), CAST(time_played AS TEXT),
+                       track_id, track_name, artist_name
+                FROM tracks
+                WHERE {where}
+                ORDER BY date_played, time_played, id
+            ''', params)
+
+            while True:
+                rows = reader.fetchmany(FLUSH_EVERY)
+                if not rows:
+                    break
+                for row_id, date_played, time_played, track_id, track_name, artist_name in rows:
+                    max_id = max(max_id, row_id)
+                    ts = _parse_ts(f"{date_played} {str(time_played)[:8]}")
+                    if row_id > start_id and cursor_ts is not None and ts < cursor_ts:
+                        late += 1   # folded in by the rewind above
+                    self._process(cursor, {'ts': ts, 'track_id': track_id,
+                                           'track_name': track_name, 'artist_name': artist_name})
+                    processed += 1
+                self._flush(cursor)
+                self._prune_chains()
+
+            self.last_row_id = max_id
+            if processed or max_id != start_id:
+                self._save_state(cursor)
+            conn.commit()
+
+        logger.info(f"Sessionized {processed} plays: {self.sessions_created} new sessions, {self.streaks_created} new streaks")
+        return {'processed': processed, 'late': late, 'sessions_created': self.sessions_created,
+                'streaks_created': self.streaks_created}
+
+    def rebuild(self) -> Dict:
+        """Drop all derived session data and reprocess the full history"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            for table in ('listening_sessions', 'repeat_streaks', 'track_repeat_state', 'session_state'):
+                cursor.execute(f'DELETE FROM {table}')
+            conn.commit()
+        return self.run()
+
+
+def update(db: SpotifyDatabase = None) -> Dict:
+    return Sessionizer(db).run()
+
+
+def songs_on_repeat(db: SpotifyDatabase = None, days: int = 7, limit: int = 20) -> List[tuple]:
+    """
+    (track_id, track_name, artist_name, repeat_plays, longest_streak) for tracks
+    with a repeat streak ending in the last `days` days, most repeated first
+    """
+    db = db or SpotifyDatabase()
+    p = db._placeholder()
+    since = _fmt_ts(datetime.now() - timedelta(days=days))
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT track_id, track_name, artist_name,
+                   SUM(CASE WHEN kind = 'window' THEN plays ELSE 0 END) AS repeat_plays,
+                   MAX(CASE WHEN kind = 'consecutive' THEN plays ELSE 0 END) AS longest_streak
+            FROM repeat_streaks
+            WHERE ended_at >= {p}
+            GROUP BY track_id, track_name, artist_name
+            ORDER BY repeat_plays DESC, longest_streak DESC, track_name ASC
+            LIMIT {p}
+        ''', (since, limit))
+        return cursor.fetchall()
+
+
+def recent_sessions(db: SpotifyDatabase = None, limit: int = 20) -> List[tuple]:
+    """(started_at, ended_at, plays, unique_tracks, duration_seconds), newest first"""
+    db = db or SpotifyDatabase()
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT CAST(started_at AS TEXT), CAST(ended_at AS TEXT), plays, unique_tracks, duration_seconds
+            FROM listening_sessions
+            ORDER BY started_at DESC
+            LIMIT {db._placeholder()}
+        ''', (limit,))
+        return cursor.fetchall()
+
+
+if __name__ == '__main__':
+    import sys
+    sessionizer = Sessionizer()
+    summary = sessionizer.rebuild() if '--rebuild' in sys.argv else sessionizer.run()
+    print(f"Processed {summary['processed']} plays "
+          f"({summary['sessions_created']} new sessions, {summary['streaks_created']} new streaks)")
+    for track_id, track_name, artist_name, repeat_plays, longest in songs_on_repeat(sessionizer.db):
+        print(f"  🔁 {track_name} — {artist_name}: {repeat_plays} plays on repeat, longest streak {longest}")
@@ -0,0 +1,107 @@
+# synthetic.py
+# Seeded synthetic listening history for benchmarks and load tests.
+#   - tracks come from a Zipf-distributed catalogue (a few favourites, a long
+#     tail) and artists are Zipfian over the catalogue as well
+#   - plays arrive in sessions whose start hours follow a daily listening
+#     curve (quiet nights, evening peak, busier weekends); track lengths vary,
+#     some plays are skips, and now and then a track goes on repeat
+#   - the same seed always yields the same history, in time order, as
+#     (date, time, track_id, track_name, artist_name, artist_id) rows
+# Large histories are generated lazily, so 10M plays never sit in memory.
+
+import csv
+import itertools
+import random
+import string
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Tuple
+
+ZIPF_EXPONENT = 1.07
+# Relative chance of a session starting in each hour of the day
+HOUR_WEIGHTS = [2, 1, 0.5, 0.3, 0.3, 0.5, 2, 5, 7, 6, 5, 5, 6, 5, 5, 6, 7, 8, 9, 10, 10, 9, 7, 4]
+WEEKDAY_FACTOR = [0.9, 0.9, 0.95, 1.0, 1.1, 1.3, 1.25]   # Monday .. Sunday
+MEAN_SESSION_TRACKS = 14
+SKIP_RATE = 0.15
+REPEAT_RATE = 0.01          # chance a play starts an on-repeat streak
+_BASE62 = string.digits + string.ascii_letters
+
+Play = Tuple[str, str, str, str, str, str]
+
+
+def spotify_id(rng: random.Random) -> str:
+    return ''.join(rng.choice(_BASE62) for _ in range(22))
+
+
+def zipf_cum_weights(n: int) -> List[float]:
+    return list(itertools.accumulate(1 / (rank + 1) ** ZIPF_EXPONENT for rank in range(n)))
+
+
+def catalogue(num_tracks: int, rng: random.Random) -> List[Tuple[str, str, str, str]]:
+    """(track_id, track_name, artist_name, artist_id), most popular first"""
+    num_artists = max(10, num_tracks // 8)
+    artists = [(f"Artist {i}", spotify_id(rng)) for i in range(num_artists)]
+    owners = rng.choices(artists, cum_weights=zipf_cum_weights(num_artists), k=num_tracks)
+    return [(spotify_id(rng), f"Track {i}", name, aid) for i, (name, aid) in enumerate(owners)]
+
+
+def catalogue_size(num_plays: int) -> int:
+    # Distinct tracks grow sub-linearly with history: ~1k at 10k plays, ~180k at 10M
+    return max(200, int(num_plays ** 0.75))
+
+
+def plays_per_day(num_plays: int) -> float:
+    # Enough days for a realistic spread, but never more than ~3 years of history
+    return max(40.0, num_plays / (3 * 365))
+
+
+def generate(num_plays: int, seed: int = 42, start: datetime = datetime(2024, 1, 1),
+             per_day: float = None) -> Iterator[Play]:
+    """num_plays plays from start onwards, about per_day a day (default plays_per_day(num_plays))"""
+    rng = random.Random(seed)
+    tracks = catalogue(catalogue_size(num_plays), rng)
+    cum_weights = zipf_cum_weights(len(tracks))
+    per_day = per_day or plays_per_day(num_plays)
+    hours = list(range(24))
+
+    emitted = 0
+    day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    clock = start
+    while emitted < num_plays:
+        target = per_day * WEEKDAY_FACTOR[day.weekday()] * rng.uniform(0.5, 1.5)
+        starts = sorted(day + timedelta(hours=h, seconds=rng.randrange(3600))
+                        for h in rng.choices(hours, weights=HOUR_WEIGHTS, k=max(1, round(target / MEAN_SESSION_TRACKS))))
+        for session_start in starts:
+            clock = max(clock, session_start)
+            length = max(1, int(rng.expovariate(1 / MEAN_SESSION_TRACKS)))
+            picks = rng.choices(tracks, cum_weights=cum_weights, k=length)
+            for track in picks:
+                repeats = rng.randint(3, 6) if rng.random() < REPEAT_RATE else 1
+                for _ in range(repeats):
+                    if emitted >= num_plays:
+                        return
+                    yield (clock.strftime('%Y-%m-%d'), clock.strftime('%H:%M:%S')) + track
+                    emitted += 1
+                    played = rng.uniform(10, 40) if rng.random() < SKIP_RATE else max(60.0, rng.gauss(210, 45))
+                    clock += timedelta(seconds=int(played))
+        day += timedelta(days=1)
+
+
+def batches(rows: Iterable, size: int) -> Iterator[list]:
+    it = iter(rows)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_csv(path: str, rows: Iterable[Play]) -> int:
+    """Rows in track_log.csv's layout, as read by SpotifyDatabase.import_from_csv"""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Date', 'Time', 'Track ID', 'Track Name', 'Artist Name'])
+        for row in rows:
+            writer.writerow(row[:5])
+            count += 1
+    return count
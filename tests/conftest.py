@@ -0,0 +1,32 @@
+# Shared fixtures: every test gets its own SQLite database under tmp_path.
+# The backend is chosen when database.py is first imported, so the Supabase
+# URL is cleared here, before any test module imports it.
+
+import os
+import sys
+from pathlib import Path
+
+os.environ['SUPABASE_DB_URL'] = ''
+os.environ.pop('SPOTIFY_LOCAL_FIRST', None)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+import synthetic
+
+
+@pytest.fixture
+def db(tmp_path):
+    from database import SpotifyDatabase
+    return SpotifyDatabase(str(tmp_path / 'spotify_data.db'))
+
+
+@pytest.fixture
+def plays():
+    """A few months of synthetic history, repeats and skips included"""
+    return list(synthetic.generate(3000, seed=7))
+
+
+def query(db, sql, params=()):
+    with db.get_connection() as conn:
+        return sorted(conn.execute(sql, params).fetchall())
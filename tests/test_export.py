@@ -0,0 +1,46 @@
+# export.month_tokens is the incremental export's change token: it must move
+# for any edit to a month, count-preserving ones included, and only for it.
+
+import pytest
+
+import export
+
+
+def months(plays):
+    return sorted({play[0][:7] for play in plays})
+
+
+def test_tokens_cover_every_month(db, plays):
+    db.add_tracks(plays)
+    tokens = export.month_tokens(db)
+    assert sorted(tokens) == months(plays)
+    assert len(set(tokens.values())) == len(tokens)
+
+
+def test_retimed_row_changes_only_its_month(db, plays):
+    db.add_tracks(plays)
+    before = export.month_tokens(db)
+    with db.get_connection() as conn:
+        row_id, date_played = conn.execute('SELECT id, date_played FROM tracks ORDER BY id LIMIT 1').fetchone()
+        conn.execute("UPDATE tracks SET time_played = '23:59:58' WHERE id = ?", (row_id,))
+    after = export.month_tokens(db)
+    changed = {month for month in before if before[month] != after[month]}
+    assert changed == {date_played[:7]}
+
+
+def test_export_rewrites_only_changed_months(db, plays, tmp_path):
+    pytest.importorskip('pyarrow')
+    db.add_tracks(plays)
+    out = tmp_path / 'exports'
+    first = export.export_all(db, str(out))
+    assert first['written'] == months(plays)
+    assert first['rows'] > len(plays)
+    assert export.export_all(db, str(out))['written'] == []
+
+    last_month = months(plays)[-1]
+    with db.get_connection() as conn:
+        conn.execute('DELETE FROM tracks WHERE id = (SELECT MAX(id) FROM tracks WHERE date_played >= ?)',
+                     (f'{last_month}-01',))
+    again = export.export_all(db, str(out))
+    assert again['written'] == [last_month]
+    assert again['skipped'] == len(months(plays)) - 1
@@ -0,0 +1,74 @@
+# Space-Saving bounds: every estimate brackets the exact count, heavy tracks
+# are never evicted, and the persisted sketch survives incremental syncs.
+
+from collections import Counter
+
+import pytest
+
+import config
+import heavy_hitters
+from heavy_hitters import HeavyHitters, SpaceSaving
+
+CAPACITY = 25   # far below the catalogue, so counters are evicted
+
+
+@pytest.fixture(autouse=True)
+def small_sketch(monkeypatch):
+    monkeypatch.setattr(config, 'SKETCH_CAPACITY', CAPACITY)
+
+
+def test_space_saving_brackets_exact_counts(plays):
+    sketch = SpaceSaving(CAPACITY)
+    exact = Counter(play[2] for play in plays)
+    for play in plays:
+        sketch.update(play[2])
+    assert sketch.total == len(plays)
+    assert len(sketch.counters) == CAPACITY
+    for key, count, error, _ in sketch.top():
+        assert count - error <= exact[key] <= count
+    threshold = sketch.guaranteed_threshold()
+    assert all(key in sketch.counters for key, n in exact.items() if n > threshold)
+
+
+def test_round_trip_keeps_counters(plays):
+    sketch = SpaceSaving(CAPACITY)
+    for play in plays:
+        sketch.update(play[2])
+    restored = SpaceSaving.from_dict(sketch.to_dict())
+    assert restored.top() == sketch.top()
+    for play in plays[:200]:
+        sketch.update(play[2])
+        restored.update(play[2])
+    assert restored.top() == sketch.top()
+
+
+def test_verify_against_database(db, plays):
+    db.add_tracks(plays)
+    result = heavy_hitters.verify(db, n=10)
+    assert result['within_bounds']
+    assert result['guaranteed_threshold'] == pytest.approx(len(plays) / CAPACITY)
+    tracked = HeavyHitters.load(db).tracks.counters
+    heavy = [row[0] for row in db.get_track_frequencies() if row[3] > result['guaranteed_threshold']]
+    assert heavy and all(track_id in tracked for track_id in heavy)
+
+
+def test_incremental_refresh_matches_one_pass(db, plays):
+    for start in range(0, len(plays), 700):
+        db.add_tracks(plays[start:start + 700])
+        heavy_hitters.refresh(db)
+    one_pass = HeavyHitters()
+    one_pass.sync(db)
+    persisted = HeavyHitters.load(db)
+    assert persisted.last_id == one_pass.last_id
+    assert persisted.top_tracks() == one_pass.top_tracks()
+    assert persisted.top_artists() == one_pass.top_artists()
+
+
+def test_rebuild_rollups_resets_the_sketch(db, plays):
+    db.add_tracks(plays)
+    heavy_hitters.refresh(db)
+    with db.get_connection() as conn:
+        conn.execute('DELETE FROM tracks WHERE id % 2 = 0')
+    db.rebuild_rollups()
+    assert HeavyHitters.load(db).last_id == 0
+    assert heavy_hitters.verify(db)['within_bounds']
@@ -0,0 +1,67 @@
+# migrate_to_local_time.Rebaser: rows whose new time is still held by another
+# moving row are parked and land correctly; real collisions are found before
+# anything moves.
+
+from datetime import datetime, timedelta
+
+from conftest import query
+from database import data_generation
+from migrate_to_local_time import OPEN_START, Rebaser, local_keys, offset_changes, parse_zone
+
+PLAYS = 'SELECT CAST(date_played AS TEXT), CAST(time_played AS TEXT), track_id FROM tracks'
+
+
+def plan(db, to: str, batch: int = 2) -> Rebaser:
+    rb = Rebaser(db, batch)
+    first, last = rb.cur.execute('SELECT MIN(date_played), MAX(date_played) FROM tracks').fetchone()
+    lo = datetime.fromisoformat(first) - timedelta(days=2)
+    hi = datetime.fromisoformat(last) + timedelta(days=2)
+    rb.create_tables(temporary=False)
+    rb.load_offsets('from', local_keys(offset_changes([(OPEN_START, parse_zone('UTC'))], lo, hi)))
+    rb.load_offsets('to', offset_changes([(OPEN_START, parse_zone(to))], lo, hi))
+    rb.build_plan()
+    return rb
+
+
+def test_chained_moves_are_parked(db):
+    track = ('t1', 'Track', 'Artist', None)
+    db.add_tracks([('2024-05-01', '10:00:00') + track, ('2024-05-01', '14:00:00') + track,
+                   ('2024-05-01', '22:30:00') + track, ('2024-05-01', '10:00:00', 't2', 'Other', 'Artist', None)])
+    rb = plan(db, '+04:00')
+    assert rb.collisions() == []
+    rb.mark_ready()
+    generation = data_generation(db.get_connection())
+    assert rb.apply() == 4
+    rb.finish()
+    assert not rb.plan_exists()
+    assert data_generation(db.get_connection()) > generation
+    assert query(db, PLAYS) == [('2024-05-01', '14:00:00', 't1'), ('2024-05-01', '14:00:00', 't2'),
+                                ('2024-05-01', '18:00:00', 't1'), ('2024-05-02', '02:30:00', 't1')]
+
+
+def test_fall_back_collision_is_reported_and_dropped(db):
+    # 00:30 and 01:30 UTC both read 02:30 in Berlin on the night clocks go back
+    track = ('t1', 'Track', 'Artist', None)
+    db.add_tracks([('2024-10-27', '00:30:00') + track, ('2024-10-27', '01:30:00') + track])
+    rb = plan(db, 'Europe/Berlin')
+    clashes = rb.collisions()
+    assert [(c[3], c[4]) for c in clashes] == [('2024-10-27', '02:30:00')]
+    assert query(db, PLAYS) == [('2024-10-27', '00:30:00', 't1'), ('2024-10-27', '01:30:00', 't1')]
+    rb.drop([c[0] for c in clashes])
+    rb.mark_ready()
+    rb.apply()
+    rb.finish()
+    assert query(db, PLAYS) == [('2024-10-27', '02:30:00', 't1')]
+
+
+def test_rollups_follow_after_rebuild(db, plays):
+    db.add_tracks(plays)
+    rb = plan(db, 'Asia/Dubai', batch=500)
+    assert rb.collisions() == []
+    rb.mark_ready()
+    rb.apply()
+    rb.finish()
+    db.rebuild_rollups()
+    assert query(db, 'SELECT hour, SUM(plays) FROM activity_cube GROUP BY hour') == query(
+        db, "SELECT CAST(SUBSTR(time_played, 1, 2) AS INTEGER), COUNT(*) FROM tracks GROUP BY 1")
+    assert query(db, 'SELECT COUNT(*) FROM tracks') == [(len(plays),)]
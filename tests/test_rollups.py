@@ -0,0 +1,63 @@
+# The rollups kept by database.refresh_rollups must always equal the GROUP BY
+# over tracks they replace, however the rows arrived.
+
+from conftest import query
+
+ACTIVITY_CUBE = '''
+    SELECT date_played, hour, dow, plays, distinct_tracks FROM activity_cube
+'''
+ACTIVITY_EXACT = '''
+    SELECT date_played, CAST(strftime('%H', time_played) AS INTEGER),
+           (CAST(strftime('%w', date_played) AS INTEGER) + 6) % 7, COUNT(*), COUNT(DISTINCT track_id)
+    FROM tracks GROUP BY 1, 2
+'''
+TRACK_DAILY = 'SELECT date_played, track_id, plays FROM track_daily'
+TRACK_DAILY_EXACT = 'SELECT date_played, track_id, COUNT(*) FROM tracks GROUP BY date_played, track_id'
+TRACK_TOTALS = 'SELECT track_id, track_name, artist_name, plays FROM track_totals'
+TRACK_TOTALS_EXACT = '''
+    SELECT track_id, MAX(track_name), MAX(artist_name), COUNT(*) FROM tracks GROUP BY track_id
+'''
+ARTISTS = 'SELECT artist_name, total_plays FROM artists'
+ARTISTS_EXACT = 'SELECT artist_name, COUNT(*) FROM tracks GROUP BY artist_name'
+
+
+def assert_rollups_exact(db):
+    assert query(db, ACTIVITY_CUBE) == query(db, ACTIVITY_EXACT)
+    assert query(db, TRACK_DAILY) == query(db, TRACK_DAILY_EXACT)
+    assert query(db, TRACK_TOTALS) == query(db, TRACK_TOTALS_EXACT)
+    assert query(db, ARTISTS) == query(db, ARTISTS_EXACT)
+
+
+def test_incremental_batches_match_group_by(db, plays):
+    for start in range(0, len(plays), 250):
+        db.add_tracks(plays[start:start + 250])
+    assert query(db, 'SELECT COUNT(*) FROM tracks') == [(len(plays),)]
+    assert_rollups_exact(db)
+
+
+def test_duplicates_and_late_rows_are_not_double_counted(db, plays):
+    recent, older = plays[1500:], plays[:1500]
+    db.add_tracks(recent)
+    # An import of older history, overlapping what is already stored
+    assert db.add_tracks(older + recent[:100]) == len(older)
+    assert_rollups_exact(db)
+
+
+def test_rebuild_matches_after_bypassing_add_tracks(db, plays):
+    db.add_tracks(plays)
+    with db.get_connection() as conn:
+        conn.execute("DELETE FROM tracks WHERE date_played = (SELECT MIN(date_played) FROM tracks)")
+        conn.execute("UPDATE tracks SET date_played = date(date_played, '+400 days') WHERE id % 7 = 0")
+    db.rebuild_rollups()
+    assert_rollups_exact(db)
+
+
+def test_writes_bump_the_data_generation(db, plays):
+    from database import data_generation
+    generation = lambda: data_generation(db.get_connection())
+    before = generation()
+    db.add_tracks(plays[:100])
+    assert generation() > before
+    before = generation()
+    db.rebuild_rollups()
+    assert generation() > before
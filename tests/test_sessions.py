@@ -0,0 +1,47 @@
+# Incremental sessionization must end where a rebuild from scratch would,
+# including when plays arrive older than the session cursor.
+
+import sessions
+from conftest import query
+
+SESSIONS = 'SELECT started_at, ended_at, plays, unique_tracks, duration_seconds FROM listening_sessions'
+STREAKS = 'SELECT track_id, kind, started_at, ended_at, plays FROM repeat_streaks'
+
+
+def snapshot(db):
+    return query(db, SESSIONS), query(db, STREAKS)
+
+
+def rebuilt(db):
+    sessions.Sessionizer(db).rebuild()
+    return snapshot(db)
+
+
+def test_batched_updates_match_rebuild(db, plays):
+    for start in range(0, len(plays), 400):
+        db.add_tracks(plays[start:start + 400])
+        sessions.update(db)
+    incremental = snapshot(db)
+    assert incremental[0] and incremental[1]
+    assert incremental == rebuilt(db)
+
+
+def test_late_plays_are_folded_in(db, plays):
+    late = plays[1200:1500]
+    db.add_tracks(plays[:1200] + plays[1500:])
+    sessions.update(db)
+    db.add_tracks(late)
+    result = sessions.update(db)
+    assert result['late'] == len(late)
+    assert snapshot(db) == rebuilt(db)
+
+
+def test_late_play_bridges_two_sessions(db):
+    track = ('t1', 'Track', 'Artist', None)
+    db.add_tracks([('2024-03-01', '10:00:00') + track, ('2024-03-01', '10:50:00') + track])
+    sessions.update(db)
+    assert len(query(db, SESSIONS)) == 2
+    db.add_tracks([('2024-03-01', '10:25:00') + track])
+    sessions.update(db)
+    assert query(db, SESSIONS) == [('2024-03-01 10:00:00', '2024-03-01 10:50:00', 3, 1, 3000)]
+    assert snapshot(db) == rebuilt(db)
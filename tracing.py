@@ -0,0 +1,147 @@
+# tracing.py
+# Opt-in timed spans over the hot paths, plus optional per-run profiling.
+#
+#   SPOTIFY_TRACE=1                      enable spans (default output: traces/trace-<pid>.jsonl)
+#   SPOTIFY_TRACE_FORMAT=chrome          write Chrome trace events instead (open in chrome://tracing or Perfetto)
+#   SPOTIFY_TRACE_FILE=path              override the output file
+#   SPOTIFY_TRACE_PROFILE=cprofile,tracemalloc
+#                                        also capture a cProfile / tracemalloc report per run
+#
+# When SPOTIFY_TRACE is unset, @traced returns the undecorated function and
+# span()/profile_run() are no-op context managers, so the cost is one flag check.
+
+import contextlib
+import functools
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+import config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ENABLED = config.TRACE_ENABLED
+
+_lock = threading.Lock()
+_local = threading.local()
+_ids = itertools.count(1)
+_file = None
+_epoch = time.perf_counter()
+
+
+def _output():
+    global _file
+    if _file is None:
+        chrome = config.TRACE_FORMAT == 'chrome'
+        path = Path(config.TRACE_FILE or Path(config.TRACE_DIR) / f"trace-{os.getpid()}.{'json' if chrome else 'jsonl'}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _file = open(path, 'a', encoding='utf-8', buffering=1)
+        if chrome and path.stat().st_size == 0:
+            # Chrome's loader accepts an unterminated array, so events can be streamed
+            _file.write('[\n')
+        logger.info(f"Tracing spans to {path}")
+    return _file
+
+
+def _emit(name: str, start: float, duration: float, span_id: int, parent: Optional[int], attrs: dict):
+    if config.TRACE_FORMAT == 'chrome':
+        event = {'name': name, 'cat': name.split('.', 1)[0], 'ph': 'X',
+                 'ts': round((start - _epoch) * 1e6, 1), 'dur': round(duration * 1e6, 1),
+                 'pid': os.getpid(), 'tid': threading.get_ident(), 'args': attrs}
+        line = json.dumps(event, default=str) + ',\n'
+    else:
+        event = {'name': name, 'id': span_id, 'parent': parent,
+                 'start': datetime.now().timestamp() - duration, 'duration_ms': round(duration * 1000, 3),
+                 'pid': os.getpid(), 'thread': threading.current_thread().name, 'attrs': attrs}
+        line = json.dumps(event, default=str) + '\n'
+    with _lock:
+        _output().write(line)
+
+
+@contextlib.contextmanager
+def span(name: str, **attrs):
+    """Time a block as a named span; nested spans record their parent"""
+    if not ENABLED:
+        yield attrs
+        return
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    span_id = next(_ids)
+    parent = stack[-1] if stack else None
+    stack.append(span_id)
+    start = time.perf_counter()
+    try:
+        yield attrs   # callers may add result attributes, e.g. attrs['rows'] = n
+    except BaseException as e:
+        attrs['error'] = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        stack.pop()
+        _emit(name, start, duration, span_id, parent, attrs)
+
+
+def traced(name: str = None) -> Callable:
+    """Decorator form of span(); returns the function untouched when tracing is off"""
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def profile_run(name: str = 'run'):
+    """Optional cProfile / tracemalloc capture around one run, written next to the trace"""
+    modes = set(config.TRACE_PROFILE) if ENABLED else set()
+    if not modes:
+        with span(name):
+            yield
+        return
+
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    out_dir = Path(config.TRACE_DIR)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    profiler = None
+    if 'cprofile' in modes:
+        import cProfile
+        profiler = cProfile.Profile()
+    if 'tracemalloc' in modes:
+        import tracemalloc
+        tracemalloc.start(25)
+
+    try:
+        if profiler:
+            profiler.enable()
+        with span(name):
+            yield
+    finally:
+        if profiler:
+            profiler.disable()
+            path = out_dir / f"{name}-{stamp}.prof"
+            profiler.dump_stats(str(path))
+            logger.info(f"cProfile written to {path} (view with: python -m pstats {path})")
+        if 'tracemalloc' in modes:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            path = out_dir / f"{name}-{stamp}.tracemalloc.txt"
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(f"current={current / 1024:.1f} KiB peak={peak / 1024:.1f} KiB\n\n")
+                for stat in snapshot.statistics('lineno')[:50]:
+                    f.write(f"{stat}\n")
+            logger.info(f"tracemalloc report written to {path}")
@@ -2,6 +2,10 @@ import logging
 import spotipy
 import requests
 import config
+import heavy_hitters
+import metrics
+import tracing
+import sessions
 from database import SpotifyDatabase
 from datetime import datetime, timezone
 
@@ -11,8 +15,8 @@ logger = logging.getLogger(__name__)
 LISTEN_THRESHOLD = 0.75
 
 
-def get_last_logged_timestamp(db):
-    """Get the most recent played_at from the DB as a UTC unix timestamp in ms."""
+def get_last_logged_local(db):
+    """Get the most recent play stored in the DB as a local-tz datetime."""
     with db.get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
@@ -24,111 +28,131 @@ def get_last_logged_timestamp(db):
         return None
 
     try:
-        # Stored as local time — convert back to UTC for the Spotify API call
-        local_dt = datetime.fromisoformat(f"{row[0]}T{row[1]}")
-        local_dt = local_dt.astimezone()           # attach local tz
-        utc_dt   = local_dt.astimezone(timezone.utc)
-        return int(utc_dt.timestamp() * 1000)      # ms unix timestamp
+        # Stored as local time — attach the local tz
+        return datetime.fromisoformat(f"{row[0]}T{row[1]}").astimezone()
     except Exception as e:
         logger.warning(f"Could not parse last stored timestamp: {e}")
         return None
 
 
+def get_last_logged_timestamp(db):
+    """Get the most recent played_at from the DB as a UTC unix timestamp in ms."""
+    local_dt = get_last_logged_local(db)
+    if local_dt is None:
+        return None
+    # Convert back to UTC for the Spotify API call
+    return int(local_dt.astimezone(timezone.utc).timestamp() * 1000)
+
+
 def to_local(played_at_str):
     """Convert a Spotify UTC ISO string to the OS local timezone datetime."""
     utc_dt = datetime.fromisoformat(played_at_str.replace("Z", "+00:00"))
     return utc_dt.astimezone()   # converts to local tz automatically
 
 
-def get_recent_songs(sp):
-    try:
-        db = SpotifyDatabase()
-        after_ms = get_last_logged_timestamp(db)
+@tracing.traced('ingest.fetch')
+def fetch_recent_items(sp, db):
+    """
+    Fetch plays newer than the last stored one. Returns (items, last_stored_local);
+    API and network errors are logged and give no items.
+    """
+    last_stored_local = get_last_logged_local(db)
+    after_ms = int(last_stored_local.astimezone(timezone.utc).timestamp() * 1000) if last_stored_local else None
 
+    try:
         if after_ms:
             logger.info(f"Fetching tracks after last log ({datetime.fromtimestamp(after_ms/1000).strftime('%Y-%m-%d %H:%M:%S')} local time)")
             results = sp.current_user_recently_played(limit=config.LIMIT_SONGS, after=after_ms)
         else:
             logger.info("No previous data found — fetching last 50 tracks")
             results = sp.current_user_recently_played(limit=config.LIMIT_SONGS)
+    except spotipy.SpotifyException as e:
+        logger.error(f"Spotify API error: {e}")
+        return [], last_stored_local
+    except requests.exceptions.ConnectionError:
+        logger.error("Network connection error")
+        return [], last_stored_local
+
+    if not results or 'items' not in results:
+        logger.warning("No recent tracks returned from API")
+        return [], last_stored_local
+
+    items = results['items']
+    if not items:
+        logger.info("No new tracks since last log run")
+        return [], last_stored_local
+
+    logger.info(f"Fetched {len(items)} new tracks from Spotify API")
+    metrics.RUN_ROWS.observe(len(items), stage='fetched')
+    return items, last_stored_local
+
+
+@tracing.traced('ingest.qualify')
+def qualify_items(items, last_stored_local):
+    """Keep plays listened to for at least LISTEN_THRESHOLD of their duration"""
+    # Parse — API returns newest first, convert to local time immediately
+    parsed = []
+    for item in items:
+        track     = item['track']
+        local_dt  = to_local(item['played_at'])
+        parsed.append({
+            'local_dt':    local_dt,
+            'duration_ms': int(float(track['duration_ms'])),
+            'track_id':    track['id'],
+            'track_name':  track['name'],
+            'artist_name': track['artists'][0]['name'],
+            'artist_id':   track['artists'][0].get('id'),
+        })
+
+    # Log what we got
+    for p in parsed:
+        logger.info(f"  {p['track_name']} | {p['local_dt'].strftime('%Y-%m-%d %H:%M:%S %Z')} | {p['duration_ms']/1000:.1f}s")
+
+    # last_stored_local is used to evaluate the final item
+    qualified = []
+    for i, item in enumerate(parsed):
+        duration_ms  = item['duration_ms']
+        threshold_ms = duration_ms * LISTEN_THRESHOLD
+
+        if i < len(parsed) - 1:
+            listened_ms = (item['local_dt'] - parsed[i + 1]['local_dt']).total_seconds() * 1000
+        else:
+            if last_stored_local:
+                listened_ms = (item['local_dt'] - last_stored_local).total_seconds() * 1000
+                logger.info(f"Last item '{item['track_name']}': gap from DB = {listened_ms/1000:.1f}s, threshold = {threshold_ms/1000:.1f}s")
+            else:
+                logger.info(f"Last item '{item['track_name']}': no DB reference — including by default")
+                listened_ms = threshold_ms
 
-        if not results or 'items' not in results:
-            logger.warning("No recent tracks returned from API")
-            return []
+        passed = listened_ms >= threshold_ms
+        logger.info(
+            f"'{item['track_name']}': listened {listened_ms/1000:.1f}s / "
+            f"needed {threshold_ms/1000:.1f}s — {'✅ PASS' if passed else '❌ SKIP'}"
+        )
+
+        if passed:
+            qualified.append((
+                item['local_dt'].strftime('%Y-%m-%d'),
+                item['local_dt'].strftime('%H:%M:%S'),
+                item['track_id'],
+                item['track_name'],
+                item['artist_name'],
+                item['artist_id'],
+            ))
 
-        items = results['items']
+    logger.info(f"{len(qualified)} of {len(items)} tracks passed the threshold")
+    metrics.RUN_ROWS.observe(len(qualified), stage='qualified')
+    return qualified
+
+
+@tracing.traced('ingest.get_recent_songs')
+def get_recent_songs(sp, db=None):
+    try:
+        db = db or SpotifyDatabase()
+        items, last_stored_local = fetch_recent_items(sp, db)
         if not items:
-            logger.info("No new tracks since last log run")
             return []
-
-        logger.info(f"Fetched {len(items)} new tracks from Spotify API")
-
-        # Parse — API returns newest first, convert to local time immediately
-        parsed = []
-        for item in items:
-            track     = item['track']
-            local_dt  = to_local(item['played_at'])
-            parsed.append({
-                'local_dt':    local_dt,
-                'duration_ms': int(float(track['duration_ms'])),
-                'track_id':    track['id'],
-                'track_name':  track['name'],
-                'artist_name': track['artists'][0]['name'],
-            })
-
-        # Log what we got
-        for p in parsed:
-            logger.info(f"  {p['track_name']} | {p['local_dt'].strftime('%Y-%m-%d %H:%M:%S %Z')} | {p['duration_ms']/1000:.1f}s")
-
-        # Get last stored local datetime for evaluating the final item
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT date_played, time_played FROM tracks ORDER BY date_played DESC, time_played DESC LIMIT 1"
-            )
-            last_row = cursor.fetchone()
-
-
-        last_stored_local = None
-        if last_row:
-            try:
-                last_stored_local = datetime.fromisoformat(f"{last_row[0]}T{last_row[1]}")
-                last_stored_local = last_stored_local.astimezone()
-            except Exception:
-                pass
-
-        qualified = []
-        for i, item in enumerate(parsed):
-            duration_ms  = item['duration_ms']
-            threshold_ms = duration_ms * LISTEN_THRESHOLD
-
-            if i < len(parsed) - 1:
-                listened_ms = (item['local_dt'] - parsed[i + 1]['local_dt']).total_seconds() * 1000
-            else:
-                if last_stored_local:
-                    listened_ms = (item['local_dt'] - last_stored_local).total_seconds() * 1000
-                    logger.info(f"Last item '{item['track_name']}': gap from DB = {listened_ms/1000:.1f}s, threshold = {threshold_ms/1000:.1f}s")
-                else:
-                    logger.info(f"Last item '{item['track_name']}': no DB reference — including by default")
-                    listened_ms = threshold_ms
-
-            passed = listened_ms >= threshold_ms
-            logger.info(
-                f"'{item['track_name']}': listened {listened_ms/1000:.1f}s / "
-                f"needed {threshold_ms/1000:.1f}s — {'✅ PASS' if passed else '❌ SKIP'}"
-            )
-
-            if passed:
-                qualified.append((
-                    item['local_dt'].strftime('%Y-%m-%d'),
-                    item['local_dt'].strftime('%H:%M:%S'),
-                    item['track_id'],
-                    item['track_name'],
-                    item['artist_name'],
-                ))
-
-        logger.info(f"{len(qualified)} of {len(items)} tracks passed the threshold")
-        return qualified
+        return qualify_items(items, last_stored_local)
 
     except spotipy.SpotifyException as e:
         logger.error(f"Spotify API error: {e}")
@@ -141,11 +165,29 @@ def get_recent_songs(sp):
         return []
 
 
-def log_songs(sp):
-    tracks = get_recent_songs(sp)
-    if not tracks:
-        return False
-    db = SpotifyDatabase()
+@tracing.traced('ingest.persist')
+def persist_tracks(db, tracks):
+    """Insert qualified plays and update the derived sketch/session tables"""
     inserted = db.add_tracks(tracks)
     logger.info(f"Logged {inserted} new tracks")
-    return True
\ No newline at end of file
+    metrics.RUN_ROWS.observe(inserted, stage='inserted')
+    if inserted:
+        try:
+            heavy_hitters.refresh(db)
+        except Exception as e:
+            logger.warning(f"Could not update heavy-hitters sketch: {e}")
+        try:
+            sessions.update(db)
+        except Exception as e:
+            logger.warning(f"Could not update listening sessions: {e}")
+    return inserted
+
+
+@tracing.traced('ingest.log_songs')
+def log_songs(sp, db=None):
+    db = db or SpotifyDatabase()
+    tracks = get_recent_songs(sp, db)
+    if not tracks:
+        return False
+    persist_tracks(db, tracks)
+    return True
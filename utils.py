@@ -1,8 +1,6 @@
+import heapq
+
 
-'''
-from main import authenticate
-sp = authenticate()
-'''
 # playlist id from name 
 #playlist_id = get_playlist_id_by_name("Test Playlist") 
 
@@ -16,10 +14,15 @@ def get_playlist_id_by_name(sp,name):
 '''
 input - dictionary containing the track details with its corresponding frequency 
 output - sorted list of the track details in the descending order of frequency 
+         (only the `top` largest entries when top is given)
 '''
 
-def sort_freq(freq_dict,cond=0):
-    sorted_dict = dict(sorted(freq_dict.items(), key=lambda kv: (kv[1], kv[0]),reverse=True))
+def sort_freq(freq_dict,cond=0,top=None):
+    if top is not None:
+        # Partial selection — avoids sorting the whole dict when only the head is needed
+        sorted_dict = dict(heapq.nlargest(top, freq_dict.items(), key=lambda kv: (kv[1], kv[0])))
+    else:
+        sorted_dict = dict(sorted(freq_dict.items(), key=lambda kv: (kv[1], kv[0]),reverse=True))
     if cond == 1:
         return(list(sorted_dict.keys()))
     else:
@@ -0,0 +1,88 @@
+# virtual_list.py
+# Windowed list/grid rendering for the dashboard.
+# The rows are serialized once as compact JSON into a single components.html
+# iframe; a few lines of JS draw only the rows inside the scroll viewport (plus
+# a small overscan) and images load lazily, so a rerun costs one element and
+# O(visible rows) DOM work no matter how long the list is.
+#
+# Row dicts use short keys to keep the payload small:
+#   n  rank / number column (optional)     i  image URL (optional)
+#   t  title                               s  subtitle
+#   v  value on the right (optional)       sel  highlight this row
+
+import json
+from typing import Dict, List
+
+import streamlit.components.v1 as components
+
+_TEMPLATE = """
+<style>
+  html, body { margin:0; padding:0; background:transparent; font-family:'Inter',sans-serif; }
+  #vp { position:relative; height:%(height)dpx; overflow-y:auto; background:%(card)s; border:1px solid %(border)s;
+        border-radius:14px; box-sizing:border-box; }
+  #sp { position:relative; width:100%%; }
+  .r { position:absolute; left:0; box-sizing:border-box; display:flex; align-items:center; gap:0.75rem;
+       padding:0 0.7rem; border-radius:8px; height:%(row)dpx; }
+  .r:hover { background:%(card2)s; }
+  .r.sel { background:%(sel_bg)s; border:1px solid %(sel_border)s; }
+  .n { color:%(muted)s; font-size:0.78rem; width:26px; text-align:right; flex-shrink:0; font-family:'Space Grotesk',sans-serif; }
+  .im { width:%(img)dpx; height:%(img)dpx; border-radius:%(radius)s; object-fit:cover; flex-shrink:0; background:%(card2)s;
+        display:flex; align-items:center; justify-content:center; font-size:0.9rem; }
+  .tx { flex:1; min-width:0; }
+  .t { color:%(text)s; font-size:0.86rem; font-weight:500; white-space:nowrap; overflow:hidden; text-overflow:ellipsis; }
+  .s { color:%(sub)s; font-size:0.73rem; margin-top:1px; white-space:nowrap; overflow:hidden; text-overflow:ellipsis; }
+  .v { color:%(accent)s; font-size:0.78rem; font-weight:600; flex-shrink:0; font-family:'Space Grotesk',sans-serif; }
+</style>
+<div id="vp"><div id="sp"></div></div>
+<script>
+const rows = %(rows)s, cols = %(cols)d, rowH = %(row)d, placeholder = %(placeholder)s, overscan = 6;
+const vp = document.getElementById('vp'), sp = document.getElementById('sp');
+const lines = Math.ceil(rows.length / cols);
+sp.style.height = (lines * rowH) + 'px';
+let first = -1, last = -1;
+function el(tag, cls, text) { const e = document.createElement(tag); e.className = cls; if (text != null) e.textContent = text; return e; }
+function draw(idx) {
+  const d = rows[idx], line = Math.floor(idx / cols), col = idx %% cols;
+  const r = el('div', d.sel ? 'r sel' : 'r');
+  r.style.top = (line * rowH) + 'px';
+  r.style.left = (col * 100 / cols) + '%%';
+  r.style.width = 'calc(' + (100 / cols) + '%% - 4px)';
+  if (d.n != null) r.appendChild(el('span', 'n', d.n));
+  if (d.i) { const im = el('img', 'im'); im.loading = 'lazy'; im.src = d.i; r.appendChild(im); }
+  else if (placeholder) r.appendChild(el('div', 'im', placeholder));
+  const tx = el('div', 'tx'); tx.appendChild(el('div', 't', d.t)); tx.appendChild(el('div', 's', d.s)); r.appendChild(tx);
+  if (d.v != null) r.appendChild(el('span', 'v', d.v));
+  return r;
+}
+function render() {
+  const a = Math.max(0, Math.floor(vp.scrollTop / rowH) - overscan);
+  const b = Math.min(lines, Math.ceil((vp.scrollTop + vp.clientHeight) / rowH) + overscan);
+  if (a === first && b === last) return;
+  first = a; last = b;
+  const frag = document.createDocumentFragment();
+  for (let i = a * cols; i < Math.min(rows.length, b * cols); i++) frag.appendChild(draw(i));
+  sp.replaceChildren(frag);
+}
+vp.addEventListener('scroll', () => requestAnimationFrame(render), { passive: true });
+render();
+</script>
+"""
+
+
+def render(rows: List[Dict], palette: Dict[str, str], height: int = 600, row_height: int = 50,
+           columns: int = 1, round_images: bool = False, placeholder: str = '🎵', accent: str = None):
+    """Draw rows as one windowed, scrollable list (columns > 1 for a card grid)"""
+    # Compact JSON; "</" is escaped so a track name can't close the script tag
+    payload = json.dumps(rows, separators=(',', ':'), ensure_ascii=False).replace('</', '<\\/')
+    lines = -(-len(rows) // max(columns, 1))
+    # Shrink short lists instead of leaving an empty scroll area
+    height = min(height, lines * row_height + 4) if rows else row_height
+    html = _TEMPLATE % {
+        'rows': payload, 'cols': max(columns, 1), 'row': row_height, 'height': height,
+        'img': 40 if round_images else 34, 'radius': '50%' if round_images else '6px',
+        'placeholder': json.dumps(placeholder), 'accent': accent or palette['maroon3'],
+        'card': palette['card'], 'card2': palette['card2'], 'border': palette['border'],
+        'sel_bg': palette['maroon_dim'], 'sel_border': palette['maroon'],
+        'text': palette['text'], 'sub': palette['sub'], 'muted': palette['muted'],
+    }
+    components.html(html, height=height + 2, scrolling=False)